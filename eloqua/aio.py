@@ -0,0 +1,471 @@
+import asyncio
+import logging
+import math
+import time
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+
+from .eloqua import Asset, CustomObjectModel, DataResponse, EloquaConnection, DEFAULT_POOL_MAXSIZE, DEFAULT_TIMEOUT, \
+    MAX_PAGE_SIZE, BASE_URL_CACHE, JSON_HEADERS
+from .codec import dumps, response_json
+from .paths import *
+from .errors import *
+from .retry import DEFAULT_RETRY_POLICY
+from .metrics import RequestEvent
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+logger = logging.getLogger("Eloqua")
+
+# Most requests allowed in flight at once on one AsyncEloquaConnection
+DEFAULT_MAX_IN_FLIGHT = 100
+
+
+# noinspection PyPep8Naming
+class AsyncEloquaConnection(object):
+    """
+    Asyncio version of EloquaConnection. Requires the aiohttp package.
+
+    It uses the same Asset classes, CustomObjectModel models and DataResponse as EloquaConnection and raises the same
+    errors. Every API method is a coroutine:
+
+        async with AsyncEloquaConnection(COMPANY, USERNAME, PASSWORD) as elq:
+            first_dog_owner = await elq.get(DogOwner, '1')
+
+            async for dog_owner in elq.iter_list(DogOwner, {"search": "Breed1='Corgi'"}):
+                print(dog_owner.DogName1)
+
+    At most `max_in_flight` requests are sent at the same time, the others wait for their turn.
+    """
+
+    def __init__(self, company, username, password, base_url=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 limit_per_host=DEFAULT_POOL_MAXSIZE, timeout=DEFAULT_TIMEOUT, session=None,
+                 retry_policy=DEFAULT_RETRY_POLICY, base_url_cache=BASE_URL_CACHE, login_url=DEFAULT_LOGIN_URL,
+                 hooks=None):
+        """
+        Initializes the connection using a company, username and password with API access
+
+        Nothing is sent until the first request, which also fetches the base url if none is provided and it is not in
+        the base url cache. See EloquaConnection.
+
+        :param company: Company
+        :param username: Username
+        :param password: Password
+        :param base_url: (optional) Base URL if you have it already
+        :param max_in_flight: (optional) Maximum number of requests sent at the same time
+        :param limit_per_host: (optional) Maximum number of connections open to one host
+        :param timeout: (optional) Default timeout for every request. Seconds or a (connect, read) tuple
+        :param session: (optional) An `aiohttp.ClientSession` to use instead of creating one. It is not closed by
+                close()
+        :param retry_policy: (optional) RetryPolicy for throttled and failed requests. None disables retries
+        :param base_url_cache: (optional) TTLCache of base urls by user. None always fetches it from the login url
+        :param login_url: (optional) Login url to fetch the base url from. Default is provided in paths.py
+        :param hooks: (optional) list of RequestHook called around each request. See eloqua.metrics
+        """
+        if aiohttp is None:
+            raise EloquaInvalidUseageException("AsyncEloquaConnection requires aiohttp. Install it with "
+                                               "`pip install aiohttp`")
+        self.username = '%s\\%s' % (company, username)
+        self.password = password
+        self.auth = aiohttp.BasicAuth(self.username, self.password)
+        self.base_url = base_url
+        self.base_url_cache = base_url_cache
+        self.login_url = login_url
+        self._base_url_given = bool(base_url)
+        self.max_in_flight = max_in_flight
+        self.limit_per_host = limit_per_host
+        if isinstance(timeout, tuple):
+            self.timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        else:
+            self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retry_policy = retry_policy
+        self.session = session
+        self._owns_session = session is None
+        self._semaphore = None
+        self.hooks = list(hooks or [])
+
+    def add_hook(self, hook):
+        """ Adds a RequestHook called around each request. See eloqua.metrics """
+        self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook):
+        """ Removes a RequestHook """
+        self.hooks = [other for other in self.hooks if other is not hook]
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def connect(self):
+        """ Opens the connection pool and fetches the base url if it is not known yet """
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host),
+                                                 timeout=self.timeout)
+        if self._semaphore is None:
+            self._semaphore = asyncio.BoundedSemaphore(self.max_in_flight)
+        if not self.base_url:
+            self.base_url = await self.resolve_base_url()
+
+    async def close(self):
+        """ Closes the pooled connections held by this connection """
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def resolve_base_url(self, refresh=False):
+        """
+        Looks the base url up in the base url cache, or fetches it from the login url and caches it
+
+        :param refresh: (optional) Ignore the cached base url and fetch it again
+
+        :return: Returns the base url of the instance
+        """
+        if self.base_url_cache is not None and not refresh:
+            base_url = self.base_url_cache.get(self.username)
+            if base_url:
+                return base_url
+        base_url = await self.get_base_url(self.login_url)
+        if self.base_url_cache is not None:
+            self.base_url_cache.set(self.username, base_url)
+        return base_url
+
+    async def get_base_url(self, login_url=DEFAULT_LOGIN_URL):
+        """
+        Gets the base_url of the instance
+
+        :param login_url: Login url to use. Default is provided in paths.py
+        :return: Returns the base url of the instance
+        """
+        async with self.session.get(login_url, auth=self.auth, headers={"accept": 'application/json'}) as response:
+            try:
+                resp_json = await response.json(content_type=None)
+                return resp_json['urls']['base']
+            except TypeError:
+                raise EloquaConnectionException('Could not authenticate with eloqua. Please check credentials')
+
+    @staticmethod
+    def _to_response(client_response, content):
+        """ Copies an aiohttp response into a requests Response so the models and errors can use it """
+        response = Response()
+        response.status_code = client_response.status
+        response.reason = client_response.reason
+        response.url = str(client_response.url)
+        response.headers = CaseInsensitiveDict(client_response.headers)
+        response.encoding = client_response.charset
+        response._content = content
+        return response
+
+    async def request(self, path, http_method, data=None, retry_post=None, template=None):
+        """
+        Does a raw eloqua request given a path and payload.
+
+        Throttled and transiently failing requests are retried following the retry_policy of the connection. The
+        number of requests sent is kept in the `attempts` attribute of the response, or of the raised error.
+
+        The hooks of the connection are called around the request, see EloquaConnection.request(). after_request is
+        called once the response is received, so the events only time the network.
+
+        :param path: API path. Ex: "/api/REST/2.0/assets/forms"
+        :param http_method: Method to use. Ex: "POST", "GET", "PUT". Case does not matter
+        :param data: Data to use in the request, parameters for get request, json for post
+        :param retry_post: (optional) Retry this request even if it is a POST. Overrides the retry policy setting
+        :param template: (optional) Path template the path was formatted from, to group the metrics of an endpoint
+
+        :return: Returns a requests Response object holding the response
+        """
+        method = http_method.lower()
+        if method in ('get', 'delete'):
+            kwargs = {'params': {key: str(value) for key, value in (data or {}).items() if value is not None}}
+        elif method in ('post', 'put'):
+            kwargs = {'data': dumps(data) if data is not None else None, 'headers': JSON_HEADERS}
+        else:
+            raise EloquaInvalidUseageException("Invalid request type %s" % http_method)
+
+        event = None
+        hooks = self.hooks
+        if hooks:
+            event = RequestEvent(method, path, template, len(kwargs.get('data') or b""), hooks=hooks)
+            for hook in hooks:
+                hook.before_request(event)
+            network_started = time.perf_counter()
+
+        if self._semaphore is None or self.session is None or not self.base_url:
+            try:
+                await self.connect()
+            except (EloquaException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                EloquaConnection._fail_event(event, e)
+                raise
+        base_url = self.base_url
+        retry_policy = self.retry_policy
+        if retry_policy is not None and not retry_policy.allows(method, retry_post):
+            retry_policy = None
+
+        attempt = 0
+        started = time.time()
+        base_url_refreshed = False
+        while True:
+            attempt += 1
+            logger.debug("Request (%s) (%s) %s" % (method, path, "with data" if data else "without data"))
+            try:
+                async with self._semaphore:
+                    async with self.session.request(method.upper(), base_url + path, auth=self.auth,
+                                                    **kwargs) as client_response:
+                        content = await client_response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                delay = retry_policy.delay(attempt, started) if retry_policy else None
+                if delay is None:
+                    e.attempts = attempt
+                    if event is not None:
+                        event.attempts = attempt
+                        event.network_time = time.perf_counter() - network_started
+                        EloquaConnection._fail_event(event, e)
+                    raise
+                logger.warning("Retrying (%s) (%s) in %.1fs after attempt %s failed: %s" % (
+                    method, path, delay, attempt, e))
+                await asyncio.sleep(delay)
+                continue
+
+            response = self._to_response(client_response, content)
+            if retry_policy and retry_policy.retries_status(response.status_code):
+                delay = retry_policy.delay(attempt, started, response)
+                if delay is not None:
+                    logger.warning("Retrying (%s) (%s) in %.1fs after attempt %s got status %s" % (
+                        method, path, delay, attempt, response.status_code))
+                    await asyncio.sleep(delay)
+                    continue
+            if response.status_code == 401 and not self._base_url_given and not base_url_refreshed:
+                # The base url may be stale and point to another pod since the instance moved
+                logger.warning("Request rejected on base url %s, fetching the base url again" % base_url)
+                base_url_refreshed = True
+                self.base_url = await self.resolve_base_url(refresh=True)
+                if self.base_url != base_url:
+                    base_url = self.base_url
+                    continue
+            break
+
+        response.attempts = attempt
+        if event is not None:
+            event.attempts = attempt
+            event.status = response.status_code
+            event.bytes_in = len(content)
+            event.network_time = time.perf_counter() - network_started
+            response._eloqua_event = event
+        try:
+            EloquaConnection.check_response(response)
+        except EloquaRequestError as e:
+            e.attempts = attempt
+            EloquaConnection._fail_event(event, e)
+            raise
+        EloquaConnection._finish_event(event)
+        return response
+
+    # ------------ API Methods ------------
+
+    async def get(self, objectClass, data_id, params=None):
+        """
+        Gets the object from eloqua using the objectClass as the type of object and the data id as the instance
+
+        :param objectClass: An Asset class, CustomObjectModel etc
+        :param data_id: Id string "501" for example
+        :param params: (optional) additional parameters for the API request
+
+        :return: An instance of the objectClass provided
+        """
+        params = dict(params or {})
+        if issubclass(objectClass, Asset):
+            resp = await self.request(objectClass.get_path.format(id=data_id), "GET", params,
+                                      template=objectClass.get_path)
+        elif issubclass(objectClass, CustomObjectModel):
+            params['depth'] = 'complete'
+            resp = await self.request(objectClass.get_path.format(parent_id=objectClass.PARENT_ID, id=data_id), "GET",
+                                      params, template=objectClass.get_path)
+        else:
+            raise EloquaInvalidUseageException("%s is not a valid class to use with this method" % objectClass)
+
+        return objectClass(resp)
+
+    async def get_list(self, objectClass, params=None, fetch_all=False):
+        """
+        Gets a list of Assets using the provided parameters for the API request
+
+        With `fetch_all` every page is fetched: the remaining pages are requested concurrently once the first page
+        tells how many there are. A failed page is stored in `DataResponse.errors` by page number.
+
+        :param objectClass: An Asset class, CustomObjectModel etc
+        :param params: (optional) additional parameters for the API request
+        :param fetch_all: (optional) fetch every page instead of only the requested one
+
+        :return: A DataResponse object
+        """
+        if fetch_all:
+            return await self._get_all_pages(objectClass, params)
+
+        if issubclass(objectClass, Asset):
+            resp = await self.request(objectClass.get_list_path, "GET", params, template=objectClass.get_list_path)
+        elif issubclass(objectClass, CustomObjectModel):
+            resp = await self.request(objectClass.get_list_path.format(parent_id=objectClass.PARENT_ID), "GET",
+                                      params, template=objectClass.get_list_path)
+        else:
+            raise EloquaInvalidUseageException("%s is not a valid class to use with this method" % objectClass)
+
+        payload = response_json(resp)
+        data = objectClass.from_list(payload)
+        return DataResponse(data=data, eloqua_response=payload)
+
+    async def _get_all_pages(self, objectClass, params):
+        """ Fetches the first page, then the remaining pages concurrently. See get_list() """
+        params = dict(params or {})
+        params.setdefault('count', MAX_PAGE_SIZE)
+        first_page = int(params.get('page', 1))
+
+        first = await self.get_list(objectClass, params)
+        page_size = first.page_size or int(params['count'])
+        last_page = max(first_page, int(math.ceil(float(first.total or 0) / page_size)))
+
+        pages = list(range(first_page + 1, last_page + 1))
+        results = await asyncio.gather(*[self.get_list(objectClass, dict(params, page=page)) for page in pages],
+                                       return_exceptions=True)
+        data = list(first.data or [])
+        errors = {}
+        for page, result in zip(pages, results):
+            if isinstance(result, Exception):
+                logger.error("Could not fetch page %s of %s: %s" % (page, objectClass.__name__, result))
+                errors[page] = result
+            else:
+                data.extend(result.data or [])
+
+        data_response = DataResponse(data=data)
+        data_response.total = first.total
+        data_response.page = first_page
+        data_response.page_size = page_size
+        data_response.errors = errors
+        return data_response
+
+    async def iter_list(self, objectClass, params=None, page_size=MAX_PAGE_SIZE, prefetch=2):
+        """
+        Iterates over every object matching the params, fetching the next pages while the current one is consumed.
+        At most `prefetch` pages are held waiting. Custom object records are listed at complete depth unless params
+        set a depth. See EloquaConnection.iter_list()
+
+        :param objectClass: An Asset class, CustomObjectModel etc
+        :param params: (optional) additional parameters for the API request. `page` sets the first page to fetch
+        :param page_size: (optional) records per page, 1000 at most
+        :param prefetch: (optional) number of pages to fetch ahead
+
+        :return: An async generator of instances of the objectClass provided
+        """
+        params = dict(params or {})
+        params['count'] = min(page_size, MAX_PAGE_SIZE)
+        if issubclass(objectClass, CustomObjectModel):
+            params.setdefault('depth', 'complete')
+        pages = asyncio.Queue(maxsize=max(prefetch, 1))
+        done = object()
+
+        async def fetcher():
+            page = int(params.get('page', 1))
+            try:
+                while True:
+                    data_response = await self.get_list(objectClass, dict(params, page=page))
+                    await pages.put(data_response)
+                    data = data_response.data or []
+                    # Eloqua may answer with smaller pages than requested, pages are numbered in its page size
+                    served_page_size = data_response.page_size or params['count']
+                    if not data:
+                        break
+                    if data_response.total is not None:
+                        if page * served_page_size >= data_response.total:
+                            break
+                    elif len(data) < served_page_size:
+                        break
+                    page += 1
+            except Exception as e:
+                await pages.put(e)
+            await pages.put(done)
+
+        task = asyncio.ensure_future(fetcher())
+        try:
+            while True:
+                item = await pages.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                for eloqua_object in item.data or []:
+                    yield eloqua_object
+        finally:
+            task.cancel()
+
+    async def update(self, eloqua_object):
+        """
+        Updates an eloqua object. Only the fields changed since it was read from Eloqua are sent, and no request is
+        made when nothing changed
+
+        :param eloqua_object: An instance of an Asset class or data object
+
+        :return: Returns the response from eloqua, or None when nothing changed
+        :raises EloquaInvalidUseageException: for an asset read at a lower depth than complete
+        """
+        if isinstance(eloqua_object, (Asset, CustomObjectModel)) and not eloqua_object.has_changes():
+            logger.debug("Skipped the update of %s, nothing changed" % eloqua_object)
+            return None
+        EloquaConnection._check_update_depth(eloqua_object)
+        if isinstance(eloqua_object, Asset):
+            resp = await self.request(eloqua_object.update_path.format(id=eloqua_object.id), "PUT",
+                                      data=eloqua_object.to_update_json(), template=eloqua_object.update_path)
+        elif isinstance(eloqua_object, CustomObjectModel):
+            resp = await self.request(
+                eloqua_object.update_path.format(parent_id=eloqua_object.PARENT_ID, id=eloqua_object.id), "PUT",
+                data=eloqua_object.to_update_json(), template=eloqua_object.update_path)
+        else:
+            raise EloquaInvalidUseageException("%s is not a valid class to use with this method" %
+                                               eloqua_object.__class__)
+
+        eloqua_object.mark_clean()
+        return resp
+
+    async def delete(self, eloqua_object):
+        """
+        Deletes an eloqua object
+
+        :param eloqua_object: An instance of an Asset class
+
+        :return: Returns the response from eloqua
+        """
+        if isinstance(eloqua_object, Asset):
+            resp = await self.request(eloqua_object.delete_path.format(id=eloqua_object.id), "DELETE",
+                                      template=eloqua_object.delete_path)
+        elif isinstance(eloqua_object, CustomObjectModel):
+            resp = await self.request(eloqua_object.delete_path.format(parent_id=eloqua_object.PARENT_ID,
+                                                                       id=eloqua_object.id), "DELETE",
+                                      template=eloqua_object.delete_path)
+        else:
+            raise EloquaInvalidUseageException("%s is not a valid class to use with this method" %
+                                               eloqua_object.__class__)
+        return resp
+
+    async def create(self, eloqua_object):
+        """
+        Creates an eloqua object
+
+        :param eloqua_object: An instance of an Eloqua Object like CustomObjectModel or Asset etc
+
+        :return: Returns the created object
+        """
+        if isinstance(eloqua_object, Asset):
+            resp = await self.request(eloqua_object.create_path, "POST", eloqua_object.to_create_json(),
+                                      template=eloqua_object.create_path)
+        elif isinstance(eloqua_object, CustomObjectModel):
+            path = eloqua_object.create_path.format(parent_id=eloqua_object.PARENT_ID)
+            resp = await self.request(path, "POST", eloqua_object.to_create_json(), template=eloqua_object.create_path)
+        else:
+            raise EloquaInvalidUseageException("%s is not a valid class to use with this method" %
+                                               eloqua_object.__class__)
+
+        return eloqua_object.__class__(response_json(resp))
@@ -0,0 +1,195 @@
+import logging
+import time
+
+from .eloqua import CustomObjectModel
+from .codec import response_json
+from .paths import *
+from .errors import *
+
+logger = logging.getLogger("Eloqua")
+
+# Largest page the Bulk API returns from a sync
+MAX_BULK_PAGE_SIZE = 50000
+
+# Eloqua markup used to export the record fields of a custom object. %s is the custom object id
+BULK_FIELD_STATEMENT = "{{CustomObject[%s].Field[%s]}}"
+BULK_META_FIELD_STATEMENTS = {
+    "id":        "{{CustomObject[%s].Id}}",
+    "createdAt": "{{CustomObject[%s].CreatedAt}}",
+    "updatedAt": "{{CustomObject[%s].UpdatedAt}}",
+}
+
+SYNC_DONE_STATUSES = ("success", "warning")
+SYNC_FAILED_STATUSES = ("error",)
+
+
+class CustomObjectExport(object):
+    """
+    Bulk API export of the records of a custom object, described by a CustomObjectModel subclass
+
+    The export definition is built from the model's ID_FIELD_MAP. Starting the export creates the definition and a sync,
+    then the sync is polled until Eloqua has staged the data. The records are streamed back page by page:
+
+        export = CustomObjectExport(elq, DogOwner, filter="'{{CustomObject[497].Field[6041]}}' = 'Corgi'")
+        export.start()
+        export.wait()
+        for dog_owner in export.iter_records():
+            print(dog_owner.DogName1)
+        export.delete()
+
+    export_custom_object_data() does all of the above in one call.
+    """
+
+    def __init__(self, connection, customObjectModel, filter=None, name=None):
+        """
+        :param connection: EloquaConnection to use
+        :param customObjectModel: CustomObjectModel subclass of the custom object to export
+        :param filter: (optional) Eloqua Bulk API filter expression
+        :param name: (optional) Name of the export definition. Defaults to the class name
+        """
+        if not issubclass(customObjectModel, CustomObjectModel):
+            raise EloquaInvalidUseageException("customObjectModel must be a subclass of CustomObjectModel")
+        self.connection = connection
+        self.customObjectModel = customObjectModel
+        self.filter = filter
+        self.name = name or "%s export" % customObjectModel.__name__
+        self.export_uri = None
+        self.sync_uri = None
+        self.status = None
+
+    def definition(self):
+        """ Returns the export definition sent to the Bulk API """
+        parent_id = self.customObjectModel.PARENT_ID
+        fields = {}
+        for key, statement in BULK_META_FIELD_STATEMENTS.items():
+            fields[key] = statement % parent_id
+        for field_id, field_name in self.customObjectModel.ID_FIELD_MAP.items():
+            fields[field_name] = BULK_FIELD_STATEMENT % (parent_id, field_id)
+        definition = {
+            "name":   self.name,
+            "fields": fields,
+        }
+        if self.filter:
+            definition["filter"] = self.filter
+        return definition
+
+    def start(self):
+        """ Creates the export definition and starts a sync for it. Deletes the definition if the sync can not start """
+        resp = self.connection.request(
+            BULK_CUSTOM_OBJECT_EXPORT_CREATE_PATH.format(parent_id=self.customObjectModel.PARENT_ID), "POST",
+            self.definition())
+        self.export_uri = response_json(resp)['uri']
+        try:
+            resp = self.connection.request(BULK_SYNC_CREATE_PATH, "POST", {"syncedInstanceUri": self.export_uri})
+            sync = response_json(resp)
+        except Exception:
+            # A failed cleanup must not hide why the sync could not start
+            try:
+                self.delete()
+            except Exception as e:
+                logger.warning("Could not delete export definition %s: %s" % (self.export_uri, e))
+            raise
+        self.sync_uri = sync['uri']
+        self.status = sync.get('status')
+        logger.debug("Started bulk sync %s for %s" % (self.sync_uri, self.export_uri))
+
+    def wait(self, poll_interval=1, max_poll_interval=30, timeout=None):
+        """
+        Polls the sync until it is done. The poll interval doubles after each poll up to max_poll_interval.
+
+        :param poll_interval: (optional) Seconds to wait before the first poll
+        :param max_poll_interval: (optional) Longest wait between two polls
+        :param timeout: (optional) Seconds after which to give up
+
+        :return: Returns the final status of the sync
+        """
+        if not self.sync_uri:
+            raise EloquaInvalidUseageException("The export has not been started. Call start() first")
+        started = time.time()
+        while True:
+            resp = self.connection.request(BULK_SYNC_GET_PATH.format(uri=self.sync_uri), "GET")
+            self.status = response_json(resp).get('status')
+            if self.status in SYNC_DONE_STATUSES:
+                if self.status == "warning":
+                    logger.warning("Bulk sync %s finished with warnings" % self.sync_uri)
+                return self.status
+            if self.status in SYNC_FAILED_STATUSES:
+                raise EloquaBulkSyncError(self.sync_uri, self.status)
+            if timeout is not None and time.time() - started + poll_interval > timeout:
+                raise EloquaBulkSyncError(self.sync_uri, self.status, "Sync did not finish within %s seconds" % timeout)
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, max_poll_interval)
+
+    def iter_items(self, page_size=MAX_BULK_PAGE_SIZE):
+        """
+        Iterates over the exported records as dicts keyed by field name, one page of the sync at a time
+
+        :param page_size: (optional) records per page, 50000 at most
+        :return: A generator of dicts
+        """
+        if self.status not in SYNC_DONE_STATUSES:
+            raise EloquaInvalidUseageException("The sync is not done. Call wait() first")
+        offset = 0
+        while True:
+            resp = self.connection.request(BULK_SYNC_DATA_PATH.format(uri=self.sync_uri), "GET", {
+                "offset": offset,
+                "limit":  page_size
+            })
+            page = response_json(resp)
+            items = page.get('items') or []
+            for item in items:
+                yield item
+            if not page.get('hasMore') or not items:
+                return
+            offset += len(items)
+
+    def iter_records(self, page_size=MAX_BULK_PAGE_SIZE):
+        """
+        Iterates over the exported records as instances of the CustomObjectModel
+
+        :param page_size: (optional) records per page, 50000 at most
+        :return: A generator of CustomObjectModel instances
+        """
+        field_ids = list(self.customObjectModel.ID_FIELD_MAP.items())
+        for item in self.iter_items(page_size=page_size):
+            element = {key: item.get(key) for key in BULK_META_FIELD_STATEMENTS}
+            element['fieldValues'] = [{"id": field_id, "value": item.get(field_name)}
+                                      for field_id, field_name in field_ids]
+            yield self.customObjectModel(element)
+
+    def delete(self):
+        """ Deletes the export definition from Eloqua """
+        if self.export_uri:
+            self.connection.request(BULK_EXPORT_DELETE_PATH.format(uri=self.export_uri), "DELETE")
+            self.export_uri = None
+
+
+def export_custom_object_data(connection, customObjectModel, filter=None, raw=False, page_size=MAX_BULK_PAGE_SIZE,
+                              timeout=None):
+    """
+    Exports the records of a custom object through the Bulk API. The export definition is deleted when done.
+
+        for dog_owner in export_custom_object_data(elq, DogOwner):
+            print(dog_owner.DogName1)
+
+    :param connection: EloquaConnection to use
+    :param customObjectModel: CustomObjectModel subclass of the custom object to export
+    :param filter: (optional) Eloqua Bulk API filter expression
+    :param raw: (optional) yield dicts keyed by field name instead of model instances
+    :param page_size: (optional) records per page, 50000 at most
+    :param timeout: (optional) Seconds to wait for the sync before giving up
+
+    :return: A generator of CustomObjectModel instances, or dicts with raw
+    """
+    export = CustomObjectExport(connection, customObjectModel, filter=filter)
+    try:
+        export.start()
+        export.wait(timeout=timeout)
+        if raw:
+            for item in export.iter_items(page_size=page_size):
+                yield item
+        else:
+            for record in export.iter_records(page_size=page_size):
+                yield record
+    finally:
+        export.delete()
@@ -0,0 +1,306 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from .codec import loads
+
+logger = logging.getLogger("Eloqua")
+
+
+class TTLCache(object):
+    """
+    Thread safe key value cache where entries expire `ttl` seconds after they are set
+
+    With a `max_size` the least recently used entries are dropped once the cache holds more entries than that.
+
+    With a `path` the entries are also saved to that JSON file, so they survive restarts and are shared by processes
+    using the same file. Keys must be strings and values JSON serializable in that case.
+
+        cache = TTLCache(ttl=24 * 3600, path="~/.eloqua_cache.json")
+        cache.set("key", "value")
+        cache.get("key")
+    """
+
+    def __init__(self, ttl=None, path=None, max_size=None):
+        """
+        :param ttl: (optional) Seconds an entry stays valid. None keeps entries until they are deleted
+        :param path: (optional) JSON file the entries are saved to and loaded from
+        :param max_size: (optional) Most entries kept. None does not limit the number of entries
+        """
+        self.ttl = ttl
+        self.path = os.path.expanduser(path) if path else None
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        if self.path:
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """ Returns the value stored for the key, or default if there is none or it expired """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores a value for the key
+
+        :param key: Key
+        :param value: Value
+        :param ttl: (optional) Seconds the entry stays valid instead of the cache ttl
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl if ttl is not None else None)
+            self._entries.move_to_end(key)
+            self._evict()
+            self._save()
+
+    def delete(self, key):
+        """ Removes the entry for the key if there is one """
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def delete_prefix(self, prefix):
+        """
+        Removes every entry whose key starts with prefix
+
+        :return: Number of entries removed
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+            if keys:
+                self._save()
+            return len(keys)
+
+    def clear(self):
+        """ Removes every entry """
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+    def _evict(self):
+        """ Drops the least recently used entries above max_size """
+        if self.max_size is not None:
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _load(self):
+        """ Loads the entries saved to the cache file that did not expire """
+        try:
+            with open(self.path) as cache_file:
+                saved = json.load(cache_file)
+        except (IOError, ValueError):
+            return
+        now = time.time()
+        for key, (value, expires) in saved.items():
+            if expires is None or expires > now:
+                self._entries[key] = (value, expires)
+        self._evict()
+
+    def _save(self):
+        """ Writes the entries to the cache file, replacing it at once so readers never see a partial file """
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path) or "."
+        temp_path = None
+        try:
+            handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(handle, "w") as temp_file:
+                json.dump({key: list(entry) for key, entry in self._entries.items()}, temp_file)
+            os.replace(temp_path, self.path)
+        except (IOError, OSError, TypeError, ValueError) as e:
+            logger.warning("Could not save the cache to %s: %s" % (self.path, e))
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+class SQLiteCache(object):
+    """
+    Key value cache stored in a SQLite database file, with the same interface as TTLCache
+
+    Unlike a TTLCache with a path, an entry is written on its own instead of rewriting the whole file, so it suits large
+    caches. Values must be JSON serializable.
+    """
+
+    def __init__(self, path, ttl=None, max_size=None):
+        """
+        :param path: SQLite database file
+        :param ttl: (optional) Seconds an entry stays valid. None keeps entries until they are deleted
+        :param max_size: (optional) Most entries kept, the least recently used are dropped first
+        """
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires REAL, used REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache (used)")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, key, default=None):
+        """ Returns the value stored for the key, or default if there is none or it expired """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return default
+            self._db.execute("UPDATE cache SET used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores a value for the key
+
+        :param key: Key
+        :param value: Value
+        :param ttl: (optional) Seconds the entry stays valid instead of the cache ttl
+        """
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO cache (key, value, expires, used) VALUES (?, ?, ?, ?)",
+                             (key, json.dumps(value), now + ttl if ttl is not None else None, now))
+            if self.max_size is not None:
+                self._db.execute("DELETE FROM cache WHERE key IN "
+                                 "(SELECT key FROM cache ORDER BY used DESC LIMIT -1 OFFSET ?)", (self.max_size,))
+
+    def delete(self, key):
+        """ Removes the entry for the key if there is one """
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def delete_prefix(self, prefix):
+        """
+        Removes every entry whose key starts with prefix
+
+        :return: Number of entries removed
+        """
+        with self._lock:
+            return self._db.execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)).rowcount
+
+    def clear(self):
+        """ Removes every entry """
+        with self._lock:
+            self._db.execute("DELETE FROM cache")
+
+    def close(self):
+        """ Closes the database """
+        with self._lock:
+            self._db.close()
+
+
+class ResponseCache(object):
+    """
+    Read-through cache of GET responses used by EloquaConnection.get() and get_list()
+
+    Entries are keyed on the connection, its user and base url, on the request path, which holds the path template and
+    ids, and on the request params, so connections to several instances can share one cache. Writes made through the
+    connection (create, update, delete) drop the cached responses of the object written and of the list of its class.
+    The response body is stored as text and decoded on every hit, so callers never share a payload.
+
+        elq = EloquaConnection(COMPANY, USERNAME, PASSWORD, response_cache=ResponseCache(max_size=1000, ttl=300))
+        elq.get(Email, "101")  # request
+        elq.get(Email, "101")  # cache hit
+        elq.response_cache.stats()
+
+    Changes made outside of the connection are only seen once the entries expire.
+    """
+
+    def __init__(self, max_size=1024, ttl=300, path=None, backend=None):
+        """
+        :param max_size: (optional) Most responses kept, the least recently used are dropped first
+        :param ttl: (optional) Seconds a response stays valid
+        :param path: (optional) SQLite file to keep the responses in, instead of memory
+        :param backend: (optional) A TTLCache, SQLiteCache or object with the same interface to store the responses in.
+                max_size, ttl and path are ignored when it is given
+        """
+        if backend is None:
+            if path:
+                backend = SQLiteCache(path, ttl=ttl, max_size=max_size)
+            else:
+                backend = TTLCache(ttl=ttl, max_size=max_size)
+        self.backend = backend
+        self.invalidations = 0
+
+    @staticmethod
+    def key(path, params=None, scope=""):
+        """ Returns the cache key of a request """
+        return "%s|%s?%s" % (scope, path, json.dumps(params or {}, sort_keys=True, default=str))
+
+    def get(self, path, params=None, scope=""):
+        """
+        Returns the decoded body cached for a request
+
+        :param path: API path of the request with its ids
+        :param params: (optional) parameters of the request
+        :param scope: (optional) identity of the connection that made the request, like "company\\user@base_url"
+        :return: The decoded body or None
+        """
+        content = self.backend.get(self.key(path, params, scope))
+        return loads(content) if content is not None else None
+
+    def set(self, path, params, content, scope=""):
+        """
+        Caches the body of a response
+
+        :param path: API path of the request with its ids
+        :param params: parameters of the request
+        :param content: Body of the response, bytes or str
+        :param scope: (optional) identity of the connection that made the request
+        """
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+        self.backend.set(self.key(path, params, scope), content)
+
+    def invalidate(self, path, scope=""):
+        """ Drops every cached response of the path in the scope, whatever its params """
+        removed = self.backend.delete_prefix("%s|%s?" % (scope, path))
+        self.invalidations += removed
+        return removed
+
+    def clear(self):
+        """ Drops every cached response """
+        self.backend.clear()
+
+    def stats(self):
+        """ Returns a dict of hits, misses, hit_rate, size and invalidations """
+        lookups = self.backend.hits + self.backend.misses
+        return {
+            "hits":          self.backend.hits,
+            "misses":        self.backend.misses,
+            "hit_rate":      float(self.backend.hits) / lookups if lookups else 0.0,
+            "size":          len(self.backend),
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,98 @@
+import json
+import time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class JsonCodec(object):
+    """
+    A JSON implementation used to decode Eloqua responses and encode request bodies
+
+    `loads` takes bytes or str, `dumps` may return bytes or str.
+    """
+
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return "<JsonCodec %s>" % self.name
+
+
+CODECS = {
+    "json": JsonCodec("json", json.loads, lambda obj: json.dumps(obj).encode("utf-8")),
+}
+if ujson is not None:
+    CODECS["ujson"] = JsonCodec("ujson", ujson.loads, lambda obj: ujson.dumps(obj).encode("utf-8"))
+if orjson is not None:
+    CODECS["orjson"] = JsonCodec("orjson", orjson.loads, orjson.dumps)
+
+# The fastest installed codec is used by default
+_codec = CODECS.get("orjson") or CODECS.get("ujson") or CODECS["json"]
+
+
+def set_json_codec(codec):
+    """
+    Sets the JSON codec used by the library
+
+        set_json_codec("json")
+
+    :param codec: Name of an installed codec ("json", "ujson" or "orjson") or a JsonCodec
+    """
+    global _codec
+    if isinstance(codec, JsonCodec):
+        _codec = codec
+    elif codec in CODECS:
+        _codec = CODECS[codec]
+    else:
+        raise ValueError("Unknown or not installed JSON codec %s. Available: %s" % (codec, ", ".join(CODECS)))
+
+
+def get_json_codec():
+    """ Returns the JsonCodec in use """
+    return _codec
+
+
+def loads(data):
+    """ Decodes JSON bytes or str with the codec in use """
+    return _codec.loads(data)
+
+
+def dumps(obj):
+    """ Encodes an object to JSON bytes with the codec in use """
+    data = _codec.dumps(obj)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return data
+
+
+def response_json(response):
+    """
+    Decodes the body of an HTTP Response once. The decoded body is kept on the response, so the models, DataResponse
+    and callers sharing a response do not decode it again.
+
+    :param response: HTTP Response object
+    :return: The decoded body, or None if the body is empty
+    """
+    try:
+        return response._eloqua_json
+    except AttributeError:
+        pass
+    event = getattr(response, "_eloqua_event", None)
+    if event is None:
+        payload = loads(response.content) if response.content else None
+    else:
+        started = time.perf_counter()
+        payload = loads(response.content) if response.content else None
+        event.decode_time += time.perf_counter() - started
+    response._eloqua_json = payload
+    return payload
@@ -0,0 +1,153 @@
+import math
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Columns read from the system fields of every record, and their types
+META_COLUMNS = ("id", "name", "createdAt", "updatedAt")
+META_COLUMN_TYPES = {
+    "id":        "integer",
+    "createdAt": "date",
+    "updatedAt": "date",
+}
+
+# Eloqua data types stored in typed columns. Other types are kept as lists of strings
+NUMBER_TYPES = ("number", "numeric")
+DATE_TYPES = ("date",)
+
+NAN = float("nan")
+# numpy stores NaT as the smallest int64
+NAT = -2 ** 63
+
+
+def column_types(objectClass):
+    """
+    Returns the column names of an Asset class or CustomObjectModel and their type: "integer", "number", "date" or
+    "text". Custom object fields are typed from the FIELD_TYPES of the model.
+
+    :param objectClass: An Asset class, CustomObjectModel etc
+    :return: A dict of column name to type, in column order
+    """
+    types = {}
+    for name in META_COLUMNS:
+        types[name] = META_COLUMN_TYPES.get(name, "text")
+    field_types = getattr(objectClass, "FIELD_TYPES", None) or {}
+    for name in getattr(objectClass, "FIELDS", None) or []:
+        if name in types:
+            continue
+        data_type = field_types.get(name)
+        if data_type in NUMBER_TYPES:
+            types[name] = "number"
+        elif data_type in DATE_TYPES:
+            types[name] = "date"
+        else:
+            types[name] = "text"
+    return types
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def to_column(values, column_type):
+    """
+    Converts a list of raw values to a column of the type
+
+    Numbers are float64 with NaN for missing values, dates are datetime64[s] with NaT (or float seconds since the epoch
+    with NaN without numpy) and integers int64. Uses numpy arrays when numpy is installed, `array.array` otherwise.
+    Text columns stay lists.
+
+    :param values: list of raw values, as sent by Eloqua
+    :param column_type: "integer", "number", "date" or "text"
+    :return: The column
+    """
+    if column_type == "text":
+        return values
+    floats = [_to_float(value) for value in values]
+    if column_type == "integer":
+        if any(math.isnan(value) for value in floats):
+            return numpy.array(floats) if numpy is not None else array('d', floats)
+        ints = [int(value) for value in floats]
+        return numpy.array(ints, dtype="int64") if numpy is not None else array('q', ints)
+    if column_type == "date" and numpy is not None:
+        seconds = [NAT if math.isnan(value) else int(value) for value in floats]
+        return numpy.array(seconds, dtype="int64").view("datetime64[s]")
+    return numpy.array(floats, dtype="float64") if numpy is not None else array('d', floats)
+
+
+def columns_from_payload(objectClass, eloqua_response):
+    """
+    Builds one column per field from the decoded response of a list request, without creating model instances
+
+    :param objectClass: An Asset class, CustomObjectModel etc
+    :param eloqua_response: The decoded json of the list request
+    :return: A dict of column name to column
+    """
+    types = column_types(objectClass)
+    raw = dict((name, []) for name in types)
+    elements = eloqua_response.get('elements') or []
+    for name in META_COLUMNS:
+        raw[name] = [element.get(name) for element in elements]
+
+    id_field_map = getattr(objectClass, "ID_FIELD_MAP", None)
+    if id_field_map:
+        field_columns = [(field_id, raw[field_name]) for field_id, field_name in id_field_map.items()
+                         if field_name not in META_COLUMNS]
+        for element in elements:
+            values = dict((field['id'], field.get('value')) for field in element.get('fieldValues', ()))
+            for field_id, column in field_columns:
+                column.append(values.get(field_id))
+
+    return dict((name, to_column(raw[name], types[name])) for name in types)
+
+
+def columns_from_objects(objectClass, eloqua_objects):
+    """
+    Builds one column per field from model instances
+
+    :param objectClass: The class of the instances
+    :param eloqua_objects: An iterable of Asset or CustomObjectModel instances
+    :return: A dict of column name to column
+    """
+    types = column_types(objectClass)
+    raw = dict((name, []) for name in types)
+    for eloqua_object in eloqua_objects:
+        for name, column in raw.items():
+            column.append(getattr(eloqua_object, name, None))
+    return dict((name, to_column(raw[name], types[name])) for name in types)
+
+
+def concat_columns(pages):
+    """
+    Joins the columns of several pages, in order
+
+    :param pages: A list of dicts of column name to column, all with the same columns
+    :return: A dict of column name to column
+    """
+    if not pages:
+        return {}
+    columns = {}
+    for name, first in pages[0].items():
+        parts = [page[name] for page in pages]
+        if numpy is not None and isinstance(first, numpy.ndarray):
+            columns[name] = numpy.concatenate(parts)
+        elif len(set(getattr(part, "typecode", None) for part in parts)) > 1:
+            # An integer column is float64 on the pages where a value is missing, so the joined column is too
+            column = array('d')
+            for part in parts:
+                column.extend(array('d', part))
+            columns[name] = column
+        else:
+            column = first[:0]
+            for part in parts:
+                column.extend(part)
+            columns[name] = column
+    return columns
@@ -1,17 +1,75 @@
 import json
+import math
+from functools import lru_cache
+import operator
+import queue
+import re
+import threading
+import time
 import requests
 from requests import Response
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from .paths import *
 from .errors import *
+from .retry import DEFAULT_RETRY_POLICY
+from .cache import TTLCache
+from .columns import columns_from_payload, columns_from_objects, concat_columns
+from .views import RecordView
+from .codec import dumps, response_json
+from .metrics import RequestEvent
 
 logger = logging.getLogger("Eloqua")
 
+# Transport defaults. The pool is kept per host, so pool_maxsize is the number of keep-alive connections held open to
+# the Eloqua pod. Set it at least as high as the number of threads sharing one connection.
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_TIMEOUT = (10, 120)
+
+# Base urls resolved through the login url, shared by every connection of the process. Pods rarely change
+DEFAULT_BASE_URL_TTL = 24 * 3600
+BASE_URL_CACHE = TTLCache(ttl=DEFAULT_BASE_URL_TTL)
+
+# Custom object schemas used to build models at runtime, see EloquaConnection.model_for()
+DEFAULT_SCHEMA_TTL = 3600
+DEFAULT_SCHEMA_CACHE_SIZE = 256
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Largest page the Eloqua REST API returns
+MAX_PAGE_SIZE = 1000
+
+# Attributes Eloqua returns at every depth. Projections on these only are fetched with depth=minimal
+MINIMAL_DEPTH_FIELDS = frozenset(("type", "id", "name", "depth", "folderId", "createdAt", "createdBy", "updatedAt",
+                                  "updatedBy", "currentStatus", "permissions"))
+
+# System fields of custom object records besides MINIMAL_DEPTH_FIELDS
+CUSTOM_OBJECT_DATA_SYSTEM_FIELDS = frozenset(("description", "accountId", "contactId", "isMapped", "uniqueCode",
+                                              "customObjectRecordStatus"))
+
+# Search for the records of a custom object with a value in a field, used by upsert() when the key index is not loaded.
+# Eloqua searches have no escape for quotes, so key values with one can not be searched for
+KEY_SEARCH = "%s='%s'"
+
 
 class EloquaObject(object):
     """ Base object for Assets, Data and all things Eloqua"""
+    __slots__ = ()
     id = None
 
+    # Values of the object when it was read from Eloqua, to find the fields changed since. None when it was not
+    _original = None
+
+    def changed_fields(self):
+        """ Returns a dict of the fields changed since the object was read from Eloqua, and their new value """
+        return {}
+
+    def has_changes(self):
+        """ Returns True if a field changed since the object was read from Eloqua, or it was not read from Eloqua """
+        return bool(self.changed_fields())
+
     def __str__(self):
         """Default str method"""
         if hasattr(self, "name"):
@@ -49,6 +107,10 @@ class Asset(EloquaObject):
     get_path = None
     get_list_path = None
 
+    # Attributes only returned at complete depth, heavier ones like the html of an email. None when not known, then
+    # every attribute outside MINIMAL_DEPTH_FIELDS is taken as needing complete depth. See depth_for()
+    COMPLETE_DEPTH_FIELDS = None
+
     # Predefined System Fields for Eloqua Objects
     id = None
     name = None
@@ -60,12 +122,51 @@ class Asset(EloquaObject):
 
     raw_data = None
 
+    @classmethod
+    def depth_for(cls, fields):
+        """
+        Returns the smallest depth Eloqua returns these attributes at: "minimal", "partial" or "complete"
+
+        Eloqua replaces the whole asset on update, so only update assets read at complete depth.
+
+        :param fields: Attribute names
+        """
+        fields = set(fields)
+        if fields <= MINIMAL_DEPTH_FIELDS:
+            return "minimal"
+        if cls.COMPLETE_DEPTH_FIELDS is None or fields & set(cls.COMPLETE_DEPTH_FIELDS):
+            return "complete"
+        return "partial"
+
+    def _attribute_values(self):
+        """ Returns the attributes set on the instance, which are compared with raw_data to find changes """
+        return dict((key, value) for key, value in vars(self).items()
+                    if not key.startswith("_") and key not in ("raw_data", "depth"))
+
+    def changed_fields(self):
+        """
+        Returns a dict of the attributes that differ from the asset read from Eloqua, and their new value. Every
+        attribute that is set counts as changed when the asset was not read from Eloqua.
+        """
+        values = self._attribute_values()
+        if self._original is None:
+            return dict((key, value) for key, value in values.items() if value is not None)
+        return dict((key, value) for key, value in values.items() if value != self._original.get(key))
+
+    def mark_clean(self):
+        """ Takes the current values as the values read from Eloqua, after they were saved """
+        self.raw_data = self.to_update_json()
+        self._original = dict(self.raw_data)
+
     # Override this functionality
     def to_update_json(self):
-        rdata = self.raw_data
-        for attribute in ['name', 'description']:
-            if getattr(self, attribute, None):
-                rdata[attribute] = getattr(self, attribute)
+        """
+        Returns the asset read from Eloqua with the changed attributes. Eloqua replaces the whole asset on update, so
+        the unchanged values are sent too. Cleared values are sent as "".
+        """
+        rdata = dict(self.raw_data or {})
+        for attribute, value in self.changed_fields().items():
+            rdata[attribute] = "" if value is None else value
         return rdata
 
     # Override this functionality
@@ -78,7 +179,7 @@ class Asset(EloquaObject):
 
     def __init__(self, raw_data=None):
         if isinstance(raw_data, Response):
-            raw_data = raw_data.json()
+            raw_data = response_json(raw_data)
         self.raw_data = raw_data
         if raw_data:
             self.id = raw_data.get('id')
@@ -88,6 +189,7 @@ class Asset(EloquaObject):
             self.updatedAt = raw_data.get('updatedAt')
             self.updatedBy = raw_data.get('updatedBy')
             self.depth = raw_data.get('depth')
+            self._original = dict(raw_data)
 
     @classmethod
     def from_list(cls, from_eloqua_response=None):
@@ -100,7 +202,7 @@ class Asset(EloquaObject):
 
         if from_eloqua_response:
             if isinstance(from_eloqua_response, Response):
-                data = from_eloqua_response.json()
+                data = response_json(from_eloqua_response)
             else:
                 data = from_eloqua_response
 
@@ -117,6 +219,8 @@ class Email(Asset):
     update_path = EMAIL_UPDATE_PATH
     get_path = EMAIL_GET_PATH
     get_list_path = EMAIL_GET_LIST_PATH
+    COMPLETE_DEPTH_FIELDS = ("htmlContent", "plainText", "contentSections", "dynamicContents", "forms", "hyperlinks",
+                             "images", "files", "layout", "style")
 
 
 class LandingPage(Asset):
@@ -126,6 +230,8 @@ class LandingPage(Asset):
     update_path = LANDING_PAGE_UPDATE_PATH
     get_path = LANDING_PAGE_GET_PATH
     get_list_path = LANDING_PAGE_GET_LIST_PATH
+    COMPLETE_DEPTH_FIELDS = ("htmlContent", "contentSections", "dynamicContents", "forms", "hyperlinks", "images",
+                             "files", "layout", "style")
 
 
 class Form(Asset):
@@ -135,6 +241,7 @@ class Form(Asset):
     update_path = FORM_UPDATE_PATH
     get_path = FORM_GET_PATH
     get_list_path = FORM_GET_LIST_PATH
+    COMPLETE_DEPTH_FIELDS = ("elements", "processingSteps", "html", "style", "customCSS")
 
 
 class CustomObject(Asset):
@@ -145,6 +252,7 @@ class CustomObject(Asset):
     update_path = CUSTOM_OBJECT_UPDATE_PATH
     get_path = CUSTOM_OBJECT_GET_PATH
     get_list_path = CUSTOM_OBJECT_GET_LIST_PATH
+    COMPLETE_DEPTH_FIELDS = ("fields",)
 
 
 class CustomObjectModel(EloquaObject):
@@ -190,12 +298,19 @@ class CustomObjectModel(EloquaObject):
     get_path = CUSTOM_OBJECT_DATA_GET_PATH
     get_list_path = CUSTOM_OBJECT_DATA_GET_LIST_PATH
 
+    # Subclasses without __slots__ keep their attributes in a __dict__. See CompactCustomObjectModel
+    __slots__ = ()
+
     NAME = None
     PARENT_ID = None
     FIELDS = None
     ID_FIELD_MAP = None
     META_FIELDS = None
+    # Optional map of field name to Eloqua data type ("text", "number", "date", ...) used for typed columns
+    FIELD_TYPES = None
     RAW_DATA = None
+    # Keep the values read from Eloqua so update() only sends the changed fields
+    TRACK_CHANGES = True
 
     # Extra Default Fields
     accountId = None
@@ -210,82 +325,278 @@ class CustomObjectModel(EloquaObject):
         else:
             return "%s %s" % (self.CDO_NAME, str(self.PARENT_ID))
 
-    def __init__(self, from_eloqua_response=None):
+    def __init__(self, from_eloqua_response=None, fields=None):
         """
         Initialize from an eloqua response
         :param from_eloqua_response: Eloqua response data
+        :param fields: (optional) tuple of the only field names to read from the response. The others stay None
         """
         if from_eloqua_response:
             if isinstance(from_eloqua_response, Response):
-                data = from_eloqua_response.json()
+                data = response_json(from_eloqua_response)
             else:
                 data = from_eloqua_response
             self.RAW_DATA = data
-            for field in data['fieldValues']:
-                field_id = field['id']
-                self.__setattr__(self.ID_FIELD_MAP[field_id], field.get("value", None))
+            if fields is None:
+                for field in data.get('fieldValues', ()):
+                    field_id = field['id']
+                    self.__setattr__(self.ID_FIELD_MAP[field_id], field.get("value", None))
+            else:
+                field_map = _projected_field_map(self.__class__, fields)
+                for field in data.get('fieldValues', ()):
+                    field_name = field_map.get(field['id'])
+                    if field_name is not None:
+                        self.__setattr__(field_name, field.get("value", None))
             for meta_field in data.keys():
                 if meta_field != "fieldValues":
                     self.__setattr__(meta_field, data[meta_field])
+            if self.TRACK_CHANGES:
+                self._original = self._snapshot()
 
     @classmethod
-    def from_list(cls, from_eloqua_response=None):
+    def from_list(cls, from_eloqua_response=None, fields=None):
         """
         Returns a list of CustomObjectModel based on a response from Eloqua API
         :param from_eloqua_response: The response from eloqua API list custom objects
+        :param fields: (optional) the only field names to read from the response. The others stay None
         :return:
         """
         if from_eloqua_response:
             if isinstance(from_eloqua_response, Response):
-                data = from_eloqua_response.json()
+                data = response_json(from_eloqua_response)
             else:
                 data = from_eloqua_response
 
+            if fields is not None:
+                fields = tuple(fields)
             resp_list = []
             for element in data['elements']:
-                resp_list.append(cls(from_eloqua_response=element))
+                resp_list.append(cls(from_eloqua_response=element, fields=fields))
             return resp_list
 
+    @classmethod
+    def depth_for(cls, fields):
+        """
+        Returns the smallest depth Eloqua returns these fields at: "minimal" for system fields like id, name and
+        updatedAt, "complete" as soon as a custom object field is needed
+
+        :param fields: Field names
+        :raises EloquaInvalidUseageException: for names that are neither fields of the model nor system fields
+        """
+        fields = set(fields)
+        unknown = fields - set(cls.ID_FIELD_MAP.values()) - MINIMAL_DEPTH_FIELDS - CUSTOM_OBJECT_DATA_SYSTEM_FIELDS
+        if unknown:
+            raise EloquaInvalidUseageException("%s has no field %s" % (cls.__name__, ", ".join(sorted(unknown))))
+        return "minimal" if fields <= MINIMAL_DEPTH_FIELDS else "complete"
+
+    def _values(self):
+        """ Returns a dict of the field values, name and description of the record """
+        values = dict((field_name, getattr(self, field_name, None)) for field_name in self.ID_FIELD_MAP.values())
+        values["name"] = getattr(self, "name", None)
+        values["description"] = getattr(self, "description", None)
+        return values
+
+    def _snapshot(self):
+        """ Returns the values kept to find the changed fields later """
+        return self._values()
+
+    def changed_fields(self):
+        """
+        Returns a dict of the fields, name and description changed since the record was read from Eloqua, and their
+        new value. Every field that is not None counts as changed when the record was not read from Eloqua, or the
+        model does not TRACK_CHANGES.
+        """
+        values = self._values()
+        if self._original is None:
+            return dict((name, value) for name, value in values.items() if value is not None)
+        return dict((name, value) for name, value in values.items() if value != self._original.get(name))
+
+    def mark_clean(self):
+        """ Takes the current values as the values read from Eloqua, after they were saved """
+        if self.TRACK_CHANGES:
+            self._original = self._snapshot()
+
+    def _field_values_json(self, values):
+        """ Returns the fieldValues for the fields in values. None clears a field and is sent as "" """
+        return [{"id": field_id, "value": "" if values[field_name] is None else values[field_name]}
+                for field_id, field_name in self.ID_FIELD_MAP.items() if field_name in values]
+
     def to_update_json(self):
-        """ Returns an object ready for use with the Eloqua API """
-
-        fields_data = []
-        for field_id, field_name in self.ID_FIELD_MAP.items():
-            if getattr(self, field_name, None):
-                fields_data.append({
-                    "id":    field_id,
-                    "value": getattr(self, field_name)
-                })
+        """ Returns an object ready for use with the Eloqua API, with the changed fields only """
+        changed = self.changed_fields()
         robj = {
             "id":          self.id,
             "type":        "CustomObjectData",
-            "description": getattr(self, "description", ""),
             "name":        self.name,
-            "fieldValues": fields_data,
+            "fieldValues": self._field_values_json(changed),
         }
+        if "description" in changed:
+            robj["description"] = changed["description"] or ""
 
         return robj
 
     def to_create_json(self):
-        """ Returns an object ready to create with the Eloqua API """
-
-        fields_data = []
-        for field_id, field_name in self.ID_FIELD_MAP.items():
-            if getattr(self, field_name, None):
-                fields_data.append({
-                    "id":    field_id,
-                    "value": getattr(self, field_name)
-                })
+        """ Returns an object ready to create with the Eloqua API, with every field that is not None """
+        values = dict((name, value) for name, value in self._values().items() if value is not None)
         robj = {
-            "fieldValues": fields_data
+            "fieldValues": self._field_values_json(values)
         }
         for attribute in ["name", "description"]:
-            if getattr(self, attribute, None):
-                robj[attribute] = getattr(self, attribute)
+            if attribute in values:
+                robj[attribute] = values[attribute]
 
         return robj
 
 
+class CompactCustomObjectModel(CustomObjectModel):
+    """
+    Custom Object Model Class storing its values in __slots__
+
+    Instances have no __dict__, only one slot per field of the custom object and per system field in SYSTEM_SLOTS.
+    Field values are set through slot setters looked up by field id, and with KEEP_RAW_DATA = False the parsed
+    response is not kept, so a record takes several times less memory and hydrates faster than with CustomObjectModel.
+    Generate a compact model with
+
+        print (elq.generate_custom_object_code("Dog_Owner_0003", class_name="DogOwner", compact=True))
+
+    which yields:
+
+        class DogOwner(CompactCustomObjectModel):
+            CDO_NAME = "Dog_Owner_0003"
+            PARENT_ID = "501"
+            FIELDS = ["DogName1", "Breed1", "DateOfOwnership1"]
+            ID_FIELD_MAP = {"123": "DogName1", "124": "Breed1", "125": "DateOfOwnership1"}
+            META_FIELDS = [...]
+            KEEP_RAW_DATA = False
+            __slots__ = ("DogName1", "Breed1", "DateOfOwnership1")
+
+    or build one at runtime with elq.model_for(name="Dog_Owner_0003", compact=True).
+
+    Fields that are not set read as None. Keys of the response that have no slot are only kept in RAW_DATA.
+    """
+    SYSTEM_SLOTS = ("id", "name", "type", "description", "folderId", "createdAt", "createdBy", "updatedAt",
+                    "updatedBy", "depth", "accountId", "contactId", "isMapped", "uniqueCode",
+                    "customObjectRecordStatus", "RAW_DATA", "_original")
+    __slots__ = SYSTEM_SLOTS
+
+    KEEP_RAW_DATA = True
+
+    # Computed for each subclass by __init_subclass__
+    _FIELD_SETTERS = None
+    _META_SETTERS = None
+    _FIELD_IDS = ()
+    _SLOT_NAMES = frozenset(SYSTEM_SLOTS)
+    _TRACKED_NAMES = ()
+    _get_field_values = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if not cls.ID_FIELD_MAP:
+            return
+        field_items = list(cls.ID_FIELD_MAP.items())
+        cls._FIELD_SETTERS = {field_id: getattr(cls, field_name).__set__ for field_id, field_name in field_items}
+        cls._META_SETTERS = {name: getattr(cls, name).__set__ for name in cls.SYSTEM_SLOTS
+                             if name not in ("RAW_DATA", "_original")}
+        cls._FIELD_IDS = tuple(field_id for field_id, field_name in field_items)
+        cls._SLOT_NAMES = frozenset(cls.SYSTEM_SLOTS) | frozenset(field_name for field_id, field_name in field_items)
+        cls._TRACKED_NAMES = tuple(field_name for field_id, field_name in field_items) + ("name", "description")
+        getter = operator.attrgetter(*[field_name for field_id, field_name in field_items])
+        if len(field_items) == 1:
+            # A plain function would be bound as a method, attrgetter is not
+            cls._get_field_values = staticmethod(lambda record: (getter(record),))
+        else:
+            cls._get_field_values = getter
+
+    @classmethod
+    def slots_for(cls, fields):
+        """ Returns the __slots__ a subclass needs for these field names """
+        return tuple(field_name for field_name in fields if field_name not in cls.SYSTEM_SLOTS)
+
+    def __getattr__(self, name):
+        # Only called for slots that were never set
+        if name in self._SLOT_NAMES:
+            return None
+        raise AttributeError("%s has no attribute %s" % (self.__class__.__name__, name))
+
+    def __init__(self, from_eloqua_response=None, fields=None):
+        """
+        Initialize from an eloqua response
+        :param from_eloqua_response: Eloqua response data
+        :param fields: (optional) tuple of the only field names to read from the response. The others stay None
+        """
+        if from_eloqua_response:
+            if isinstance(from_eloqua_response, Response):
+                data = response_json(from_eloqua_response)
+            else:
+                data = from_eloqua_response
+            if self.KEEP_RAW_DATA:
+                self.RAW_DATA = data
+            field_setters = self._FIELD_SETTERS if fields is None else _projected_field_setters(self.__class__, fields)
+            for field in data.get('fieldValues', ()):
+                setter = field_setters.get(field['id'])
+                if setter is not None:
+                    setter(self, field.get("value"))
+            meta_setters = self._META_SETTERS
+            for meta_field, value in data.items():
+                setter = meta_setters.get(meta_field)
+                if setter is not None:
+                    setter(self, value)
+            if self.TRACK_CHANGES:
+                self._original = self._snapshot()
+
+    def _snapshot(self):
+        """ Returns the values kept to find the changed fields later, as a tuple in _TRACKED_NAMES order """
+        return self._get_field_values(self) + (self.name, self.description)
+
+    def _values(self):
+        return dict(zip(self._TRACKED_NAMES, self._snapshot()))
+
+    def changed_fields(self):
+        values = self._snapshot()
+        if self._original is None:
+            return dict((name, value) for name, value in zip(self._TRACKED_NAMES, values) if value is not None)
+        return dict((name, value) for name, value, original in zip(self._TRACKED_NAMES, values, self._original)
+                    if value != original)
+
+
+@lru_cache(maxsize=1024)
+def _projected_field_map(customObjectModel, fields):
+    """ Returns the entries of the ID_FIELD_MAP of the model for a tuple of field names """
+    return dict((field_id, field_name) for field_id, field_name in customObjectModel.ID_FIELD_MAP.items()
+                if field_name in fields)
+
+
+@lru_cache(maxsize=1024)
+def _projected_field_setters(customObjectModel, fields):
+    """ Returns the _FIELD_SETTERS of a CompactCustomObjectModel for a tuple of field names """
+    return dict((field_id, customObjectModel._FIELD_SETTERS[field_id])
+                for field_id in _projected_field_map(customObjectModel, fields))
+
+
+class BatchResult(object):
+    """
+    Result for one object of a batch operation like EloquaConnection.create_many()
+
+    `eloqua_object` is the object that was submitted. `result` holds what the single operation returns (the created
+    object, or the response from eloqua) and `error` holds the exception when it failed.
+    """
+    eloqua_object = None
+    result = None
+    error = None
+
+    def __init__(self, eloqua_object, result=None, error=None):
+        self.eloqua_object = eloqua_object
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return "<BatchResult %s %s>" % (self.eloqua_object, "ok" if self.ok else self.error.__class__.__name__)
+
+
 class DataResponse(object):
     """
     Response of CustomObjectData
@@ -293,17 +604,27 @@ class DataResponse(object):
     `data` is a list of CustomObjectData
 
     The other info is gathered from the eloqua api response on init
+
+    `errors` maps page numbers to the exception that page failed with when several pages were fetched at once
+
+    `columns` holds one column per field instead of `data` when the list was fetched with columnar=True
+
+    `data` holds RecordView instead of model instances when the list was fetched with lazy=True
     """
     data = None
     page_size = None
     page = None
     total = None
+    errors = None
+    columns = None
 
-    def __init__(self, data=None, eloqua_response=None):
+    def __init__(self, data=None, eloqua_response=None, columns=None):
         self.data = data
+        self.columns = columns
+        self.errors = {}
         if eloqua_response:
             if isinstance(eloqua_response, Response):
-                elq_data = eloqua_response.json()
+                elq_data = response_json(eloqua_response)
             else:
                 elq_data = eloqua_response
 
@@ -311,41 +632,178 @@ class DataResponse(object):
             self.page = elq_data.get('page')
             self.page_size = elq_data.get('pageSize')
 
+    def to_columns(self):
+        """
+        Returns the records as one column per field: a dict of field name to column. Numbers and dates are numpy
+        arrays when numpy is installed (`array.array` otherwise), text fields are lists. See eloqua.columns
+
+            columns = elq.get_list(DogOwner, {"count": 1000}).to_columns()
+            columns["AgeAtStartOfOwnership1"].mean()
+
+        :return: A dict of column name to column
+        """
+        if self.columns is not None:
+            return self.columns
+        if not self.data:
+            return {}
+        first = self.data[0]
+        return columns_from_objects(first.model if isinstance(first, RecordView) else first.__class__, self.data)
+
 
 # noinspection PyPep8Naming
 class EloquaConnection(object):
     """Manages connections to Eloqua initialized with credentials."""
 
-    def __init__(self, company, username, password, base_url=None):
+    def __init__(self, company, username, password, base_url=None, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False, timeout=DEFAULT_TIMEOUT, session=None,
+                 retry_policy=DEFAULT_RETRY_POLICY, base_url_cache=BASE_URL_CACHE, login_url=DEFAULT_LOGIN_URL,
+                 schema_cache=None, response_cache=None, hooks=None, limiter=None):
         """
         Initializes the connection using a company, username and password with API access
 
+        Without a base_url, the base url of the instance is looked up in base_url_cache, or fetched from the login url
+        on the first request and then cached. When Eloqua rejects a request made on a cached base url with a 401, the
+        base url is fetched again and the request is retried once. To share base urls between processes and restarts,
+        use a cache saved to disk:
+
+            elq = EloquaConnection(COMPANY, USERNAME, PASSWORD,
+                                   base_url_cache=TTLCache(ttl=24 * 3600, path="~/.eloqua_base_urls.json"))
+
+        Every request made through the connection goes through one pooled `requests.Session`, so TCP and TLS
+        connections to the Eloqua pod are kept alive and reused. The connection can be shared between threads.
+        Call close() when done, or use the connection as a context manager:
+
+            with EloquaConnection(COMPANY, USERNAME, PASSWORD) as elq:
+                elq.get(Email, "101")
+
         :param company: Company
         :param username: Username
         :param password: Password
-        :param base_url: Base URL if you have it already. Without it, init method will fetch it when you initialize the
-                connection.
+        :param base_url: Base URL if you have it already. Without it, it is fetched on the first request
+        :param pool_connections: (optional) Number of per host connection pools to keep
+        :param pool_maxsize: (optional) Maximum number of keep-alive connections per host
+        :param pool_block: (optional) Block when all connections of a host are in use instead of opening extra ones
+        :param timeout: (optional) Default timeout for every request. Seconds or a (connect, read) tuple
+        :param session: (optional) A `requests.Session` to use instead of creating one. It is not closed by close()
+        :param retry_policy: (optional) RetryPolicy for throttled and failed requests. None disables retries
+        :param base_url_cache: (optional) TTLCache of base urls by user. None always fetches it from the login url
+        :param login_url: (optional) Login url to fetch the base url from. Default is provided in paths.py
+        :param schema_cache: (optional) TTLCache for custom object schemas used by model_for(). Defaults to an in
+                memory cache of this connection
+        :param response_cache: (optional) ResponseCache that get() and get_list() read through. See eloqua.cache
+        :param hooks: (optional) list of RequestHook called around each request, like a MetricsCollector. See
+                eloqua.metrics
+        :param limiter: (optional) context manager held while each attempt of a request is sent, like the
+                TenantLimiter of eloqua.registry capping the concurrency and rate of a tenant
         """
-        self.username = '%s\%s' % (company, username)
+        self.username = '%s\\%s' % (company, username)
         self.password = password
         self.auth = requests.auth.HTTPBasicAuth(self.username, self.password)
-        if not base_url:
-            self.base_url = self.get_base_url(self.auth)
+        self.timeout = timeout
+        self.retry_policy = retry_policy
+        if session is None:
+            self.session = self.create_session(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                               pool_block=pool_block)
+            self._owns_session = True
         else:
-            self.base_url = base_url
+            self.session = session
+            self._owns_session = False
+        self.base_url_cache = base_url_cache
+        self.login_url = login_url
+        self._base_url = base_url or None
+        self._base_url_given = bool(base_url)
+        self._base_url_lock = threading.Lock()
+        if schema_cache is None:
+            schema_cache = TTLCache(ttl=DEFAULT_SCHEMA_TTL, max_size=DEFAULT_SCHEMA_CACHE_SIZE)
+        self.schema_cache = schema_cache
+        self.response_cache = response_cache
+        self._key_indexes = {}
+        self._key_indexes_lock = threading.Lock()
+        self.hooks = list(hooks or [])
+        self.limiter = limiter
+        self._models = {}
+        self._models_lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        """ Base url of the instance, fetched on first use when it was not provided """
+        if self._base_url is None:
+            with self._base_url_lock:
+                if self._base_url is None:
+                    self._base_url = self.resolve_base_url()
+        return self._base_url
+
+    @base_url.setter
+    def base_url(self, base_url):
+        self._base_url = base_url or None
+        self._base_url_given = bool(base_url)
+
+    @property
+    def cache_scope(self):
+        """ Identity of the connection in the keys of a shared ResponseCache: its user and base url """
+        return "%s@%s" % (self.username, self.base_url)
+
+    def resolve_base_url(self, refresh=False):
+        """
+        Looks the base url up in the base url cache, or fetches it from the login url and caches it
+
+        :param refresh: (optional) Ignore the cached base url and fetch it again
+
+        :return: Returns the base url of the instance
+        """
+        if self.base_url_cache is not None and not refresh:
+            base_url = self.base_url_cache.get(self.username)
+            if base_url:
+                return base_url
+        base_url = self.get_base_url(self.auth, login_url=self.login_url, session=self.session, timeout=self.timeout)
+        if self.base_url_cache is not None:
+            self.base_url_cache.set(self.username, base_url)
+        return base_url
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """ Closes the pooled connections held by this connection """
+        if self._owns_session:
+            self.session.close()
+
+    @staticmethod
+    def create_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False):
+        """
+        Creates a `requests.Session` with a keep-alive connection pool mounted for http and https
+
+        :param pool_connections: Number of per host connection pools to keep
+        :param pool_maxsize: Maximum number of keep-alive connections per host
+        :param pool_block: Block when all connections of a host are in use instead of opening extra ones
+
+        :return: A `requests.Session`
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                                pool_block=pool_block)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
 
     @staticmethod
-    def get_base_url(auth, login_url=DEFAULT_LOGIN_URL):
+    def get_base_url(auth, login_url=DEFAULT_LOGIN_URL, session=None, timeout=DEFAULT_TIMEOUT):
         """
         Gets the base_url if there is none defined
 
         :param auth: Authentication object
         :param login_url: Login url to use. Default is provided in paths.py
+        :param session: (optional) `requests.Session` to send the request with
+        :param timeout: (optional) Timeout for the login request
         :return: Returns the base url of the instance
         """
-        response = requests.get(
+        response = (session or requests).get(
             login_url,
             auth=auth,
+            timeout=timeout,
             headers={
                 "accept": 'application/json'
             })
@@ -357,31 +815,15 @@ class EloquaConnection(object):
         except TypeError:
             raise EloquaConnectionException('Could not authenticate with eloqua. Please check credentials')
 
-    def request(self, path, http_method, data=None):
+    @staticmethod
+    def check_response(response):
         """
-        Does a raw eloqua request given a path and payload.
-
-        :param path: API path. Ex: "/api/REST/2.0/assets/forms"
-        :param http_method: Method to use. Ex: "POST", "GET", "PUT". Case does not matter
-        :param data: Data to use in the request, parameters for get request, json for post
+        Raises the matching error if the response from Eloqua is not successful
 
-        :return: Returns the HTTP Response object from the request
+        :param response: HTTP Response object from an Eloqua request
 
+        :return: Returns the response if it is successful
         """
-        """"""
-        url = self.base_url + path
-        logger.debug("Request (%s) (%s) %s" % (http_method.lower(), path, "with data" if data else "without data"))
-        if http_method.lower() == 'get':
-            response = requests.get(url, auth=self.auth, params=data)
-        elif http_method.lower() == 'post':
-            response = requests.post(url, auth=self.auth, json=data)
-        elif http_method.lower() == 'put':
-            response = requests.put(url, auth=self.auth, json=data)
-        elif http_method.lower() == 'delete':
-            response = requests.delete(url, auth=self.auth, params=data)
-        else:
-            raise EloquaInvalidUseageException("Invalid request type %s" % http_method)
-
         if response.status_code == 404:
             raise EloquaRequestErrorNotFound(response)
         elif response.status_code == 400:
@@ -399,54 +841,333 @@ class EloquaConnection(object):
             raise EloquaRequestError(response)
         return response
 
-    def generate_custom_object_code(self, custom_object_name=None, custom_object_id=None, class_name=None):
+    def add_hook(self, hook):
+        """ Adds a RequestHook called around each request. See eloqua.metrics """
+        self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook):
+        """ Removes a RequestHook """
+        self.hooks = [other for other in self.hooks if other is not hook]
+
+    @staticmethod
+    def _finish_event(event, hydrate_started=None):
+        """
+        Calls the after_request hooks for a request made with finish=False
+
+        :param event: The RequestEvent of the request, None when no hook was called
+        :param hydrate_started: (optional) time.perf_counter() before the models were built, to time hydration
+        """
+        if event is None:
+            return
+        if hydrate_started is not None:
+            event.hydrate_time += time.perf_counter() - hydrate_started
+        for hook in event.hooks:
+            hook.after_request(event)
+
+    @staticmethod
+    def _fail_event(event, error):
+        if event is None:
+            return
+        event.error = error
+        for hook in event.hooks:
+            hook.request_failed(event)
+
+    def request(self, path, http_method, data=None, retry_post=None, template=None, finish=True):
+        """
+        Does a raw eloqua request given a path and payload.
+
+        Throttled and transiently failing requests are retried following the retry_policy of the connection. The
+        number of requests sent is kept in the `attempts` attribute of the response, or of the raised error.
+
+        The hooks of the connection get a RequestEvent for the request, also kept in the `_eloqua_event` attribute
+        of the response so the time spent decoding it is added to it.
+
+        :param path: API path. Ex: "/api/REST/2.0/assets/forms"
+        :param http_method: Method to use. Ex: "POST", "GET", "PUT". Case does not matter
+        :param data: Data to use in the request, parameters for get request, json for post
+        :param retry_post: (optional) Retry this request even if it is a POST. Overrides the retry policy setting
+        :param template: (optional) Path template the path was formatted from, like CUSTOM_OBJECT_DATA_GET_PATH, to
+                group the metrics of an endpoint. Defaults to the path with its numeric ids replaced by {id}
+        :param finish: (optional) call the after_request hooks once the response is received. With False the caller
+                calls _finish_event() once it decoded the response and built the models
+
+        :return: Returns the HTTP Response object from the request
+
+        """
+        method = http_method.lower()
+        if method not in ('get', 'post', 'put', 'delete'):
+            raise EloquaInvalidUseageException("Invalid request type %s" % http_method)
+
+        # The body is encoded once, not on every attempt
+        body = self._encode(data) if method in ('post', 'put') else data
+
+        event = None
+        hooks = self.hooks
+        if hooks:
+            event = RequestEvent(method, path, template, len(body) if method in ('post', 'put') and body else 0,
+                                 hooks=hooks)
+            for hook in hooks:
+                hook.before_request(event)
+            network_started = time.perf_counter()
+
+        try:
+            base_url = self.base_url
+        except (EloquaException, requests.RequestException) as e:
+            self._fail_event(event, e)
+            raise
+        retry_policy = self.retry_policy
+        if retry_policy is not None and not retry_policy.allows(method, retry_post):
+            retry_policy = None
+
+        attempt = 0
+        started = time.time()
+        base_url_refreshed = False
+        while True:
+            attempt += 1
+            logger.debug("Request (%s) (%s) %s" % (method, path, "with data" if data else "without data"))
+            try:
+                response = self._send(method, base_url + path, body)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                delay = retry_policy.delay(attempt, started) if retry_policy else None
+                if delay is None:
+                    e.attempts = attempt
+                    if event is not None:
+                        event.attempts = attempt
+                        event.network_time = time.perf_counter() - network_started
+                        self._fail_event(event, e)
+                    raise
+                logger.warning("Retrying (%s) (%s) in %.1fs after attempt %s failed: %s" % (
+                    method, path, delay, attempt, e))
+                time.sleep(delay)
+                continue
+
+            if retry_policy and retry_policy.retries_status(response.status_code):
+                delay = retry_policy.delay(attempt, started, response)
+                if delay is not None:
+                    logger.warning("Retrying (%s) (%s) in %.1fs after attempt %s got status %s" % (
+                        method, path, delay, attempt, response.status_code))
+                    time.sleep(delay)
+                    continue
+            if response.status_code == 401 and not self._base_url_given and not base_url_refreshed:
+                # The base url may be stale and point to another pod since the instance moved
+                logger.warning("Request rejected on base url %s, fetching the base url again" % base_url)
+                base_url_refreshed = True
+                with self._base_url_lock:
+                    self._base_url = self.resolve_base_url(refresh=True)
+                if self._base_url != base_url:
+                    base_url = self._base_url
+                    continue
+            break
+
+        response.attempts = attempt
+        if event is not None:
+            event.attempts = attempt
+            event.status = response.status_code
+            event.bytes_in = len(response.content)
+            event.network_time = time.perf_counter() - network_started
+            response._eloqua_event = event
+        try:
+            self.check_response(response)
+        except EloquaRequestError as e:
+            e.attempts = attempt
+            self._fail_event(event, e)
+            raise
+        if finish:
+            self._finish_event(event)
+        return response
+
+    @staticmethod
+    def _encode(data):
+        """ Encodes a request body with the JSON codec in use, see eloqua.codec """
+        return dumps(data) if data is not None else None
+
+    def _send(self, method, url, data):
+        """
+        Sends one request through the pooled session, holding the limiter of the connection if it has one. data is
+        the encoded body for post and put
+        """
+        if self.limiter is not None:
+            with self.limiter:
+                return self._session_send(method, url, data)
+        return self._session_send(method, url, data)
+
+    def _session_send(self, method, url, data):
+        if method == 'get':
+            return self.session.get(url, auth=self.auth, params=data, timeout=self.timeout)
+        elif method == 'post':
+            return self.session.post(url, auth=self.auth, data=data, headers=JSON_HEADERS, timeout=self.timeout)
+        elif method == 'put':
+            return self.session.put(url, auth=self.auth, data=data, headers=JSON_HEADERS, timeout=self.timeout)
+        elif method == 'delete':
+            return self.session.delete(url, auth=self.auth, params=data, timeout=self.timeout)
+
+    def generate_custom_object_code(self, custom_object_name=None, custom_object_id=None, class_name=None,
+                                    compact=False, keep_raw_data=True):
         """
         Generates the custom object class code given the name or id of the custom object and an optional class name
 
         :param custom_object_name: Name of the custom object to search for
         :param custom_object_id: Id of the custom object
         :param class_name: (optional) class name. Default will be the custom object name
+        :param compact: (optional) generate a CompactCustomObjectModel storing its values in __slots__
+        :param keep_raw_data: (optional) with compact, keep the parsed response in RAW_DATA
 
         :return: code as a string for the custom object
         """
+        schema = self.get_custom_object_schema(custom_object_name, custom_object_id)
+        if compact:
+            return self._generate_compact_custom_object_class_code(schema, class_name=class_name,
+                                                                   keep_raw_data=keep_raw_data)
+        code = self._generate_custom_object_class_code(schema, class_name=class_name)
+        return code
+
+    def get_custom_object_schema(self, custom_object_name=None, custom_object_id=None, refresh=False):
+        """
+        Gets the description of a custom object and its fields, from the schema cache when it is there
+
+        :param custom_object_name: Name of the custom object to search for
+        :param custom_object_id: Id of the custom object
+        :param refresh: (optional) Ignore the cached schema and fetch it again
+
+        :return: The custom object as returned by eloqua, a dict
+        """
         if custom_object_id:
-            custom_object = self.get(CustomObject, asset_id=custom_object_id)
+            key = "id:%s" % custom_object_id
+        elif custom_object_name:
+            key = "name:%s" % custom_object_name
         else:
-            custom_objects_with_name = self.get_list(CustomObject, {
-                "search": "name=%s" % custom_object_name,
-                "depth":  "complete"
-            })
-            custom_object = custom_objects_with_name.data[0]
+            raise EloquaInvalidUseageException("A custom object name or id is required")
 
-        code = self._generate_custom_object_class_code(custom_object.raw_data, class_name=class_name)
-        return code
+        schema = None if refresh else self.schema_cache.get(key)
+        if schema is None:
+            if custom_object_id:
+                schema = self.get(CustomObject, custom_object_id, {"depth": "complete"}).raw_data
+            else:
+                custom_objects_with_name = self.get_list(CustomObject, {
+                    "search": "name=%s" % custom_object_name,
+                    "depth":  "complete"
+                }).data
+                if not custom_objects_with_name:
+                    raise EloquaInvalidUseageException("No custom object is named %s" % custom_object_name)
+                exact_matches = [custom_object for custom_object in custom_objects_with_name
+                                 if custom_object.name == custom_object_name]
+                schema = (exact_matches or custom_objects_with_name)[0].raw_data
+            self._cache_schema(schema)
+        return schema
+
+    def _cache_schema(self, schema):
+        """ Stores a custom object schema in the schema cache by id and by name """
+        self.schema_cache.set("id:%s" % schema['id'], schema)
+        self.schema_cache.set("name:%s" % schema['name'], schema)
+
+    def model_for(self, name=None, id=None, class_name=None, refresh=False, compact=False, keep_raw_data=True):
+        """
+        Builds the CustomObjectModel subclass of a custom object at runtime, from its current schema.
+
+        It is the same class generate_custom_object_code() writes out, without having to keep generated code in sync
+        with the custom object. Schemas come from the schema cache, and the class is built once per schema:
+
+            DogOwner = elq.model_for(name="Dog_Owner_0003", class_name="DogOwner")
+            first_dog_owner = elq.get(DogOwner, '1')
+
+        :param name: Name of the custom object
+        :param id: Id of the custom object
+        :param class_name: (optional) class name. Default will be the custom object name
+        :param refresh: (optional) Ignore the cached schema and fetch it again
+        :param compact: (optional) build a CompactCustomObjectModel storing its values in __slots__
+        :param keep_raw_data: (optional) with compact, keep the parsed response in RAW_DATA
+
+        :return: A CustomObjectModel subclass
+        """
+        schema = self.get_custom_object_schema(name, id, refresh=refresh)
+        attributes = self._custom_object_class_attributes(schema)
+        if not class_name:
+            class_name = re.sub(r'\W', '_', attributes['CDO_NAME'])
+            if class_name[0].isdigit():
+                class_name = "_" + class_name
+
+        key = (attributes['PARENT_ID'], class_name, compact, keep_raw_data)
+        with self._models_lock:
+            model = self._models.get(key)
+            if model is None or model.ID_FIELD_MAP != attributes['ID_FIELD_MAP']:
+                if compact:
+                    attributes['KEEP_RAW_DATA'] = keep_raw_data
+                    attributes['__slots__'] = CompactCustomObjectModel.slots_for(attributes['FIELDS'])
+                    model = type(class_name, (CompactCustomObjectModel,), attributes)
+                else:
+                    for field_name in attributes['FIELDS']:
+                        attributes[field_name] = None
+                    model = type(class_name, (CustomObjectModel,), attributes)
+                self._models[key] = model
+        return model
+
+    def warm_models(self, names=None, workers=8):
+        """
+        Fetches the schemas of all the custom objects of the instance in a few concurrent requests and fills the schema
+        cache, so the following model_for() calls do not need a request each.
+
+        :param names: (optional) Only cache and build models for the custom objects with these names
+        :param workers: (optional) number of threads fetching pages of custom objects
+
+        :return: A dict of custom object name to CustomObjectModel subclass
+        """
+        custom_objects = self.get_list(CustomObject, {"depth": "complete"}, fetch_all=True, workers=workers)
+        if custom_objects.errors:
+            logger.warning("Could not fetch every custom object schema, %s pages failed" % len(custom_objects.errors))
+        models = {}
+        for custom_object in custom_objects.data:
+            if names is not None and custom_object.name not in names:
+                continue
+            self._cache_schema(custom_object.raw_data)
+            models[custom_object.name] = self.model_for(id=custom_object.id)
+        return models
 
     @classmethod
-    def _generate_custom_object_class_code(cls, eloqua_response, class_name=None):
+    def _custom_object_class_attributes(cls, eloqua_response):
         """
-        Generates the custom object class code given a custom object and a class name
+        Returns the class attributes of the CustomObjectModel subclass for a custom object
         :param eloqua_response: Json response from eloqua for the custom object
-        :param class_name: (optional) class name
 
-        :return: the code for a python class for the Custom Object
+        :return: A dict of CDO_NAME, PARENT_ID, FIELDS, ID_FIELD_MAP, FIELD_TYPES and META_FIELDS
         """
-
-        field_to_id_map = {}
+        fields = []
         id_to_field_map = {}
+        field_types = {}
         meta_fields = []
         for field in eloqua_response.keys():
             if field != "fields":
                 meta_fields.append(field)
         for field in eloqua_response["fields"]:
-            field_to_id_map[field["internalName"]] = field["id"]
+            if field["internalName"] not in fields:
+                fields.append(field["internalName"])
             id_to_field_map[field["id"]] = field["internalName"]
+            if field.get("dataType"):
+                field_types[field["internalName"]] = field["dataType"]
+
+        return {
+            "CDO_NAME":     eloqua_response['name'],
+            "PARENT_ID":    str(eloqua_response['id']),
+            "FIELDS":       fields,
+            "ID_FIELD_MAP": id_to_field_map,
+            "FIELD_TYPES":  field_types,
+            "META_FIELDS":  meta_fields,
+        }
+
+    @classmethod
+    def _generate_custom_object_class_code(cls, eloqua_response, class_name=None):
+        """
+        Generates the custom object class code given a custom object and a class name
+        :param eloqua_response: Json response from eloqua for the custom object
+        :param class_name: (optional) class name
 
-        object_name = eloqua_response['name']
+        :return: the code for a python class for the Custom Object
+        """
+        attributes = cls._custom_object_class_attributes(eloqua_response)
         if not class_name:
-            class_name = object_name
+            class_name = attributes['CDO_NAME']
 
         printable_fields_list = ""
-        for field_name in field_to_id_map.keys():
+        for field_name in attributes['FIELDS']:
             printable_fields_list += "\t%s = None\n" % field_name
 
         rstring = """class %s(%s):
@@ -454,26 +1175,71 @@ class EloquaConnection(object):
 \tPARENT_ID = "%s"
 \tFIELDS = %s
 \tID_FIELD_MAP = %s
+\tFIELD_TYPES = %s
 \tMETA_FIELDS = %s 
 %s
     """ % (
             class_name, CustomObjectModel.__name__,
-            object_name,
-            eloqua_response['id'],
-            "[%s]" % ", ".join('"%s"' % x for x in field_to_id_map.keys()),
-            json.dumps(id_to_field_map),
-            json.dumps(meta_fields),
+            attributes['CDO_NAME'],
+            attributes['PARENT_ID'],
+            "[%s]" % ", ".join('"%s"' % x for x in attributes['FIELDS']),
+            json.dumps(attributes['ID_FIELD_MAP']),
+            json.dumps(attributes['FIELD_TYPES']),
+            json.dumps(attributes['META_FIELDS']),
             printable_fields_list)
 
         return rstring
 
-    def get_custom_object_data(self, customObjectModel, record_id=None, query_params=None):
+    @classmethod
+    def _generate_compact_custom_object_class_code(cls, eloqua_response, class_name=None, keep_raw_data=True):
+        """
+        Generates the compact custom object class code given a custom object and a class name
+        :param eloqua_response: Json response from eloqua for the custom object
+        :param class_name: (optional) class name
+        :param keep_raw_data: (optional) keep the parsed response in RAW_DATA
+
+        :return: the code for a python class for the Custom Object
+        """
+        attributes = cls._custom_object_class_attributes(eloqua_response)
+        if not class_name:
+            class_name = attributes['CDO_NAME']
+
+        rstring = """class %s(%s):
+\tCDO_NAME = "%s"
+\tPARENT_ID = "%s"
+\tFIELDS = %s
+\tID_FIELD_MAP = %s
+\tFIELD_TYPES = %s
+\tMETA_FIELDS = %s
+\tKEEP_RAW_DATA = %s
+\t__slots__ = (%s)
+    """ % (
+            class_name, CompactCustomObjectModel.__name__,
+            attributes['CDO_NAME'],
+            attributes['PARENT_ID'],
+            "[%s]" % ", ".join('"%s"' % x for x in attributes['FIELDS']),
+            json.dumps(attributes['ID_FIELD_MAP']),
+            json.dumps(attributes['FIELD_TYPES']),
+            json.dumps(attributes['META_FIELDS']),
+            keep_raw_data,
+            "".join('"%s", ' % x for x in CompactCustomObjectModel.slots_for(attributes['FIELDS'])))
+
+        return rstring
+
+    def get_custom_object_data(self, customObjectModel, record_id=None, query_params=None, columnar=False, lazy=False,
+                               fields=None):
         """
         Fetches CDO records from eloqua provided a description of that data object. Can fetch 1 record if record id
         is provided.
         :param customObjectModel: CustomObjectModel for the object to be fetched (REQUIRED)
         :param record_id: single record id for single requests
-        :param query_params: parameters included in a multi search request for example {"search" : "name=John", "count": 1}
+        :param query_params: parameters included in a multi search request
+                for example {"search" : "name=John", "count": 1}
+        :param columnar: (optional) for multiple records, fill DataResponse.columns instead of building model instances
+        :param lazy: (optional) for multiple records, fill DataResponse.data with RecordView of the response instead of
+                model instances. See eloqua.views
+        :param fields: (optional) names of the only fields needed. Fetched at minimal depth when they are all system
+                fields like id and updatedAt, and only those fields of the records are read
 
         :return: The custom object data object or list of objects
         """
@@ -484,79 +1250,396 @@ class EloquaConnection(object):
             if query_params:
                 logger.warning("calling EloquaConnection.get_custom_object_data() with a record_id and query params "
                                "only returns the record with the record Id. IT DOES NOT USE THE QUERY PARAMS")
-            resp = self.request(CUSTOM_OBJECT_DATA_GET_PATH.format(
-                parent_id=customObjectModel.PARENT_ID, id=record_id), "GET")
-            return customObjectModel(resp)
+            params, fields = self._projection(customObjectModel, None, fields)
+            payload, event = self._get_payload(CUSTOM_OBJECT_DATA_GET_PATH.format(
+                parent_id=customObjectModel.PARENT_ID, id=record_id), params, template=CUSTOM_OBJECT_DATA_GET_PATH)
+            hydrate_started = time.perf_counter()
+            try:
+                record = customObjectModel(payload) if fields is None else customObjectModel(payload, fields=fields)
+            except Exception as e:
+                self._fail_event(event, e)
+                raise
+            self._finish_event(event, hydrate_started)
+            return record
         else:
-            resp = self.request(CUSTOM_OBJECT_DATA_GET_LIST_PATH.format(
-                parent_id=customObjectModel.PARENT_ID), "GET", data=query_params)
-            data = customObjectModel.from_list(resp)
-            data_response = DataResponse(data=data, eloqua_response=resp)
+            query_params, fields = self._projection(customObjectModel, query_params, fields)
+            payload, event = self._get_payload(CUSTOM_OBJECT_DATA_GET_LIST_PATH.format(
+                parent_id=customObjectModel.PARENT_ID), query_params, template=CUSTOM_OBJECT_DATA_GET_LIST_PATH)
+            hydrate_started = time.perf_counter()
+            try:
+                if columnar:
+                    data_response = DataResponse(eloqua_response=payload,
+                                                 columns=columns_from_payload(customObjectModel, payload))
+                elif lazy:
+                    data_response = DataResponse(data=RecordView.from_list(customObjectModel, payload),
+                                                 eloqua_response=payload)
+                else:
+                    data = customObjectModel.from_list(payload, fields=fields)
+                    data_response = DataResponse(data=data, eloqua_response=payload)
+            except Exception as e:
+                self._fail_event(event, e)
+                raise
+            self._finish_event(event, hydrate_started)
             return data_response
 
+    def _get_payload(self, path, params=None, template=None):
+        """
+        GETs a path and returns the decoded body, reading through the response cache when the connection has one
+
+        The after_request hooks are not called yet, call _finish_event() with the event once the models are built, or
+        _fail_event() if building them raises. request_failed is called here if the body can not be decoded.
+
+        :param path: API path with its ids
+        :param params: (optional) parameters for the API request
+        :param template: (optional) Path template the path was formatted from. See request()
+
+        :return: The decoded body and the RequestEvent of the request, None if no request was made or no hook is set
+        """
+        if self.response_cache is not None:
+            payload = self.response_cache.get(path, params, self.cache_scope)
+            if payload is not None:
+                return payload, None
+        resp = self.request(path, "GET", params, template=template, finish=False)
+        event = getattr(resp, "_eloqua_event", None)
+        try:
+            payload = response_json(resp)
+        except Exception as e:
+            self._fail_event(event, e)
+            raise
+        if self.response_cache is not None:
+            self.response_cache.set(path, params, resp.content, self.cache_scope)
+        return payload, event
+
+    def _invalidate(self, eloqua_object):
+        """ Drops the cached responses of an object and of the list of its class after a write """
+        if self.response_cache is None or not isinstance(eloqua_object, (Asset, CustomObjectModel)):
+            return
+        ids = {"parent_id": eloqua_object.PARENT_ID} if isinstance(eloqua_object, CustomObjectModel) else {}
+        if eloqua_object.id:
+            self.response_cache.invalidate(eloqua_object.get_path.format(id=eloqua_object.id, **ids), self.cache_scope)
+        self.response_cache.invalidate(eloqua_object.get_list_path.format(**ids), self.cache_scope)
+
+    def _index_keys(self, eloqua_object, deleted=False):
+        """ Keeps the key indexes of upsert() current after a write """
+        if not self._key_indexes or not isinstance(eloqua_object, CustomObjectModel):
+            return
+        parent_id = str(eloqua_object.PARENT_ID)
+        for (index_parent_id, key), index in list(self._key_indexes.items()):
+            if index_parent_id != parent_id:
+                continue
+            if deleted:
+                index.discard_id(eloqua_object.id)
+            else:
+                index.set(getattr(eloqua_object, key, None), eloqua_object.id)
+
+    @staticmethod
+    def _projection(objectClass, params, fields):
+        """
+        Returns the params of a request projected on fields, with the smallest depth unless params set one, and the
+        fields as a tuple. Without fields, returns the params and None
+        """
+        if fields is None:
+            return params, None
+        fields = tuple(fields)
+        params = dict(params or {})
+        params.setdefault('depth', objectClass.depth_for(fields))
+        return params, fields
+
+    @staticmethod
+    def _hydrate_list(objectClass, payload, fields, params=None):
+        """
+        Builds the instances of a decoded list response, reading only the fields of custom object records. Assets keep
+        the depth they were listed at, minimal unless params set one, when the response does not tell
+        """
+        if fields is not None and issubclass(objectClass, CustomObjectModel):
+            return objectClass.from_list(payload, fields=fields)
+        data = objectClass.from_list(payload)
+        if issubclass(objectClass, Asset):
+            depth = (params or {}).get('depth', 'minimal')
+            for asset in data:
+                if asset.depth is None:
+                    asset.depth = depth
+        return data
+
+    @staticmethod
+    def _check_update_depth(eloqua_object):
+        """
+        Refuses to update an asset read at a lower depth than complete. Eloqua replaces the whole asset with what is
+        sent, so the attributes left out of a lower depth, like the html of an email, would be erased
+        """
+        if isinstance(eloqua_object, Asset) and eloqua_object.depth not in (None, "complete"):
+            raise EloquaInvalidUseageException(
+                "%s %s was read at %s depth, updating it would erase the attributes it was read without. Get it at "
+                "complete depth to update it" % (eloqua_object.__class__.__name__, eloqua_object.id,
+                                                 eloqua_object.depth))
+
     # ------------ API Methods ------------
 
-    def get(self, objectClass, data_id, params={}):
+    def get(self, objectClass, data_id, params=None, fields=None):
         """
         Gets the object from eloqua using the objectClass as the type of object and the data id as the instance
         Includes the params in the request
 
+        With `fields`, the object is fetched at the smallest depth that has them, and only those fields of a custom
+        object record are read. The other fields stay None and are not sent by update():
+
+            owner = elq.get(DogOwner, "1", fields=["Breed1"])
+
         :param objectClass: An Asset class, CustomObjectModel etc
         :param data_id: Id string "501" for example
         :param params: (optional) additional parameters for the API request
+        :param fields: (optional) names of the only attributes needed
 
         :return: An instance of the objectClass provided
         """
 
         if issubclass(objectClass, Asset):
-            resp = self.request(objectClass.get_path.format(id=data_id), "GET", params)
+            params, fields = self._projection(objectClass, params, fields)
+            payload, event = self._get_payload(objectClass.get_path.format(id=data_id), params,
+                                               template=objectClass.get_path)
         elif issubclass(objectClass, CustomObjectModel):
-            params['depth'] = 'complete'
-            resp = self.request(objectClass.get_path.format(parent_id=objectClass.PARENT_ID, id=data_id), "GET", params)
+            params = dict(params or {}, depth=objectClass.depth_for(fields) if fields is not None else 'complete')
+            payload, event = self._get_payload(objectClass.get_path.format(parent_id=objectClass.PARENT_ID,
+                                                                           id=data_id),
+                                               params, template=objectClass.get_path)
         else:
             raise EloquaInvalidUseageException("%s is not a valid class to use with this method" % objectClass)
 
-        return objectClass(resp)
-
-    def get_list(self, objectClass, params=None):
+        hydrate_started = time.perf_counter()
+        try:
+            if fields is not None and issubclass(objectClass, CustomObjectModel):
+                eloqua_object = objectClass(payload, fields=tuple(fields))
+            else:
+                eloqua_object = objectClass(payload)
+                if issubclass(objectClass, Asset) and eloqua_object.depth is None:
+                    # Eloqua tells the depth in the response, the depth asked for stands in when it does not
+                    eloqua_object.depth = (params or {}).get('depth')
+        except Exception as e:
+            self._fail_event(event, e)
+            raise
+        self._finish_event(event, hydrate_started)
+        return eloqua_object
+
+    def get_list(self, objectClass, params=None, fetch_all=False, workers=8, page_retries=2, columnar=False,
+                 lazy=False, fields=None):
         """
         Gets a list of Assets using the provided parameters for the API request
 
+        With `fetch_all` every page is fetched: the first page tells how many there are, then the remaining pages are
+        requested concurrently by a pool of `workers` threads and merged in page order. A page that still fails after
+        `page_retries` retries is left out and its exception is stored in `DataResponse.errors` by page number.
+
+            all_dog_owners = elq.get_list(DogOwner, fetch_all=True, workers=8)
+
         :param objectClass: An Asset class, CustomObjectModel etc
         :param params: (optional) additional parameters for the API request
+        :param fetch_all: (optional) fetch every page instead of only the requested one
+        :param workers: (optional) number of threads fetching pages when fetch_all is set
+        :param page_retries: (optional) times a failed page is retried when fetch_all is set
+        :param columnar: (optional) fill DataResponse.columns, one column per field, instead of building instances of
+                the objectClass. See DataResponse.to_columns()
+        :param lazy: (optional) fill DataResponse.data with a RecordView of each element of the response instead of
+                instances of the objectClass. Fields are only read when used. See eloqua.views
+        :param fields: (optional) names of the only attributes needed. The list is fetched at the smallest depth that
+                has them, unless params set a depth, and only those fields of custom object records are read:
+
+                    emails = elq.get_list(Email, fields=["id", "name", "updatedAt"])   # depth=minimal
 
         :return: A DataResponse object
         """
+        if fetch_all:
+            return self._get_all_pages(objectClass, params, workers, page_retries, columnar, lazy, fields)
 
+        params, fields = self._projection(objectClass, params, fields)
         if issubclass(objectClass, Asset):
-            resp = self.request(objectClass.get_list_path, "GET", params)
+            payload, event = self._get_payload(objectClass.get_list_path, params, template=objectClass.get_list_path)
         elif issubclass(objectClass, CustomObjectModel):
-            resp = self.request(objectClass.get_list_path.format(parent_id=objectClass.PARENT_ID), "GET", params)
+            payload, event = self._get_payload(objectClass.get_list_path.format(parent_id=objectClass.PARENT_ID),
+                                               params, template=objectClass.get_list_path)
         else:
             raise EloquaInvalidUseageException("%s is not a valid class to use with this method" % objectClass)
 
-        data = objectClass.from_list(resp)
-        return DataResponse(data=data, eloqua_response=resp)
+        hydrate_started = time.perf_counter()
+        try:
+            if columnar:
+                data_response = DataResponse(eloqua_response=payload,
+                                             columns=columns_from_payload(objectClass, payload))
+            elif lazy:
+                data_response = DataResponse(data=RecordView.from_list(objectClass, payload), eloqua_response=payload)
+            else:
+                data = self._hydrate_list(objectClass, payload, fields, params)
+                data_response = DataResponse(data=data, eloqua_response=payload)
+        except Exception as e:
+            self._fail_event(event, e)
+            raise
+        self._finish_event(event, hydrate_started)
+        return data_response
+
+    def _get_all_pages(self, objectClass, params, workers, page_retries, columnar=False, lazy=False, fields=None):
+        """ Fetches the first page, then the remaining pages concurrently. See get_list() """
+        params = dict(params or {})
+        params.setdefault('count', MAX_PAGE_SIZE)
+        first_page = int(params.get('page', 1))
+
+        first = self.get_list(objectClass, params, columnar=columnar, lazy=lazy, fields=fields)
+        page_size = first.page_size or int(params['count'])
+        last_page = max(first_page, int(math.ceil(float(first.total or 0) / page_size)))
+
+        def fetch_page(page):
+            page_params = dict(params, page=page)
+            for attempt in range(page_retries + 1):
+                try:
+                    return self.get_list(objectClass, page_params, columnar=columnar, lazy=lazy, fields=fields)
+                except (EloquaRequestError, requests.RequestException) as e:
+                    if attempt == page_retries:
+                        raise
+                    logger.warning("Retrying page %s of %s after error: %s" % (page, objectClass.__name__, e))
+
+        data = list(first.data or [])
+        columns = [first.columns]
+        errors = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [(page, executor.submit(fetch_page, page)) for page in range(first_page + 1, last_page + 1)]
+            for page, future in futures:
+                try:
+                    page_response = future.result()
+                except (EloquaRequestError, requests.RequestException) as e:
+                    logger.error("Could not fetch page %s of %s: %s" % (page, objectClass.__name__, e))
+                    errors[page] = e
+                    continue
+                if columnar:
+                    columns.append(page_response.columns)
+                else:
+                    data.extend(page_response.data or [])
+
+        if columnar:
+            data_response = DataResponse(columns=concat_columns(columns))
+        else:
+            data_response = DataResponse(data=data)
+        data_response.total = first.total
+        data_response.page = first_page
+        data_response.page_size = page_size
+        data_response.errors = errors
+        return data_response
+
+    def iter_list(self, objectClass, params=None, page_size=MAX_PAGE_SIZE, prefetch=2, lazy=False, fields=None):
+        """
+        Iterates over every object matching the params, one object at a time, fetching page after page.
+
+        The next pages are fetched in a background thread while the current one is consumed. At most `prefetch` pages
+        are held waiting, so memory stays bounded no matter how many records there are.
+
+            for dog_owner in elq.iter_list(DogOwner, {"search": "Breed1='Corgi'"}):
+                print(dog_owner.DogName1)
+
+        Custom object records are listed at complete depth unless params set a depth or fields are given, as lower
+        depths leave out their fieldValues.
+
+        :param objectClass: An Asset class, CustomObjectModel etc
+        :param params: (optional) additional parameters for the API request. `page` sets the first page to fetch
+        :param page_size: (optional) records per page, 1000 at most
+        :param prefetch: (optional) number of pages to fetch ahead. 0 fetches a page only when the last one is used up
+        :param lazy: (optional) yield a RecordView of each element instead of instances of the objectClass
+        :param fields: (optional) names of the only attributes needed. See get_list()
+
+        :return: A generator of instances of the objectClass provided
+        """
+        params = dict(params or {})
+        params['count'] = min(page_size, MAX_PAGE_SIZE)
+        if fields is None and issubclass(objectClass, CustomObjectModel):
+            params.setdefault('depth', 'complete')
+        first_page = int(params.get('page', 1))
+
+        def fetch_pages():
+            page = first_page
+            while True:
+                params['page'] = page
+                data_response = self.get_list(objectClass, params, lazy=lazy, fields=fields)
+                yield data_response
+                data = data_response.data or []
+                # Eloqua may answer with smaller pages than requested, pages are numbered in its page size
+                served_page_size = data_response.page_size or params['count']
+                if not data:
+                    return
+                if data_response.total is not None:
+                    if page * served_page_size >= data_response.total:
+                        return
+                elif len(data) < served_page_size:
+                    return
+                page += 1
+
+        if prefetch < 1:
+            for data_response in fetch_pages():
+                for eloqua_object in data_response.data or []:
+                    yield eloqua_object
+            return
+
+        pages = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def fetcher():
+            try:
+                for data_response in fetch_pages():
+                    if not put(data_response):
+                        return
+            except Exception as e:
+                put(e)
+            put(done)
+
+        thread = threading.Thread(target=fetcher, name="EloquaPageFetcher", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                for eloqua_object in item.data or []:
+                    yield eloqua_object
+        finally:
+            stop.set()
 
     def update(self, eloqua_object):
         """
-        Updates an eloqua object
+        Updates an eloqua object. Only the fields changed since it was read from Eloqua are sent, and no request is
+        made when nothing changed
 
         :param eloqua_object: An instance of an Asset class or data object
 
-        :return: Returns the response from eloqua
+        :return: Returns the response from eloqua, or None when nothing changed
+        :raises EloquaInvalidUseageException: for an asset read at a lower depth than complete
         """
-        if isinstance(eloqua_object, Asset):
-            resp = self.request(eloqua_object.update_path.format(id=eloqua_object.id), "PUT",
-                                data=eloqua_object.to_update_json())
-        elif isinstance(eloqua_object, CustomObjectModel):
-            resp = self.request(
-                eloqua_object.update_path.format(parent_id=eloqua_object.PARENT_ID, id=eloqua_object.id), "PUT",
-                data=eloqua_object.to_update_json())
-        else:
-            raise EloquaInvalidUseageException("%s is not a valid class to use with this method" %
-                                               eloqua_object.__class__)
+        if isinstance(eloqua_object, (Asset, CustomObjectModel)) and not eloqua_object.has_changes():
+            logger.debug("Skipped the update of %s, nothing changed" % eloqua_object)
+            return None
+        self._check_update_depth(eloqua_object)
+        try:
+            if isinstance(eloqua_object, Asset):
+                resp = self.request(eloqua_object.update_path.format(id=eloqua_object.id), "PUT",
+                                    data=eloqua_object.to_update_json(), template=eloqua_object.update_path)
+            elif isinstance(eloqua_object, CustomObjectModel):
+                resp = self.request(
+                    eloqua_object.update_path.format(parent_id=eloqua_object.PARENT_ID, id=eloqua_object.id), "PUT",
+                    data=eloqua_object.to_update_json(), template=eloqua_object.update_path)
+            else:
+                raise EloquaInvalidUseageException("%s is not a valid class to use with this method" %
+                                                   eloqua_object.__class__)
+        finally:
+            self._invalidate(eloqua_object)
 
+        eloqua_object.mark_clean()
+        self._index_keys(eloqua_object)
         return resp
 
     def delete(self, eloqua_object):
@@ -567,11 +1650,20 @@ class EloquaConnection(object):
 
         :return: Returns the response from eloqua
         """
-        if isinstance(eloqua_object, Asset):
-            resp = self.request(eloqua_object.delete_path.format(id=eloqua_object.id), "DELETE")
-        elif isinstance(eloqua_object, CustomObjectModel):
-            resp = self.request(eloqua_object.delete_path.format(parent_id=eloqua_object.PARENT_ID,
-                                                                 id=eloqua_object.id), "DELETE")
+        try:
+            if isinstance(eloqua_object, Asset):
+                resp = self.request(eloqua_object.delete_path.format(id=eloqua_object.id), "DELETE",
+                                    template=eloqua_object.delete_path)
+            elif isinstance(eloqua_object, CustomObjectModel):
+                resp = self.request(eloqua_object.delete_path.format(parent_id=eloqua_object.PARENT_ID,
+                                                                     id=eloqua_object.id), "DELETE",
+                                    template=eloqua_object.delete_path)
+            else:
+                raise EloquaInvalidUseageException("%s is not a valid class to use with this method" %
+                                                   eloqua_object.__class__)
+        finally:
+            self._invalidate(eloqua_object)
+        self._index_keys(eloqua_object, deleted=True)
         return resp
 
     def create(self, eloqua_object):
@@ -582,11 +1674,203 @@ class EloquaConnection(object):
 
         :return: Returns the response from eloqua
         """
-        if isinstance(eloqua_object, Asset):
-            resp = self.request(eloqua_object.create_path, "POST", eloqua_object.to_create_json())
-        elif isinstance(eloqua_object, CustomObjectModel):
-            path = eloqua_object.create_path.format(parent_id=eloqua_object.PARENT_ID)
-            data = eloqua_object.to_create_json()
-            resp = self.request(path, "POST", data)
+        try:
+            if isinstance(eloqua_object, Asset):
+                resp = self.request(eloqua_object.create_path, "POST", eloqua_object.to_create_json(),
+                                    template=eloqua_object.create_path, finish=False)
+            elif isinstance(eloqua_object, CustomObjectModel):
+                path = eloqua_object.create_path.format(parent_id=eloqua_object.PARENT_ID)
+                data = eloqua_object.to_create_json()
+                resp = self.request(path, "POST", data, template=eloqua_object.create_path, finish=False)
+            else:
+                raise EloquaInvalidUseageException("%s is not a valid class to use with this method" %
+                                                   eloqua_object.__class__)
+        finally:
+            self._invalidate(eloqua_object)
+
+        event = getattr(resp, "_eloqua_event", None)
+        try:
+            payload = response_json(resp)
+            hydrate_started = time.perf_counter()
+            created = eloqua_object.__class__(payload)
+        except Exception as e:
+            self._fail_event(event, e)
+            raise
+        self._finish_event(event, hydrate_started)
+        self._index_keys(created)
+        return created
+
+    def key_index(self, customObjectModel, key, preload=True):
+        """
+        Returns the KeyIndex of a key field of a custom object used by upsert(), creating it the first time.
+
+        With preload, every record of the custom object is read once to fill the index, then the writes made through
+        the connection keep it current. Records created outside of the connection after that are not seen by upsert(),
+        call key_index(...).complete = False or create a new connection to search for unknown keys again.
+
+        :param customObjectModel: CustomObjectModel subclass of the custom object
+        :param key: Name of the key field
+        :param preload: (optional) load the keys of every record the first time
+        :return: A KeyIndex
+        """
+        # eloqua.index imports this module
+        from .index import KeyIndex
+
+        if key not in (customObjectModel.ID_FIELD_MAP or {}).values():
+            raise EloquaInvalidUseageException("%s is not a field of %s" % (key, customObjectModel.__name__))
+        index_key = (str(customObjectModel.PARENT_ID), key)
+        with self._key_indexes_lock:
+            index = self._key_indexes.get(index_key)
+            if index is None:
+                index = self._key_indexes[index_key] = KeyIndex(key)
+        if preload and not index.complete:
+            with index.load_lock:
+                if not index.complete:
+                    # Projected on the key, so the list is read at complete depth: lower depths have no fieldValues
+                    index.add_records(self.iter_list(customObjectModel, fields=("id", key)))
+                    index.complete = True
+                    logger.debug("Loaded %s keys %s of %s" % (len(index), key, customObjectModel.__name__))
+        return index
+
+    def upsert(self, eloqua_object, key, preload=True):
+        """
+        Updates the record of the custom object with the same value in the key field, or creates it if there is none.
+
+        The record id is looked up in the key index of the connection (see key_index()), so an upsert is a single PUT
+        or POST. Without preload, keys missing from the index are searched for first, which fails for key values with
+        a quote.
+
+            elq.upsert(dog_owner, key="Email1")
+
+        :param eloqua_object: CustomObjectModel instance with a value in the key field
+        :param key: Name of the key field
+        :param preload: (optional) load the keys of every record the first time, instead of searching for each key
+
+        :return: The created record, or eloqua_object with the id of the record it updated
+        """
+        if not isinstance(eloqua_object, CustomObjectModel):
+            raise EloquaInvalidUseageException("%s is not a valid class to use with this method" %
+                                               eloqua_object.__class__)
+        value = getattr(eloqua_object, key, None)
+        if value is None or value == "":
+            raise EloquaInvalidUseageException("%s has no value for the key %s" % (eloqua_object, key))
+        customObjectModel = eloqua_object.__class__
+        index = self.key_index(customObjectModel, key, preload=preload)
+        with index.lock(value):
+            record_id = index.get(value)
+            if record_id is None and not index.complete:
+                if "'" in str(value):
+                    raise EloquaInvalidUseageException("The key value %r has a quote and can not be searched for. "
+                                                       "Upsert with preload" % value)
+                found = self.get_list(customObjectModel, {"search": KEY_SEARCH % (key, value), "count": 1})
+                if found.data:
+                    record_id = found.data[0].id
+                    index.set(value, record_id)
+            if record_id is not None:
+                eloqua_object.id = record_id
+                try:
+                    self.update(eloqua_object)
+                    return eloqua_object
+                except EloquaRequestErrorNotFound:
+                    # Deleted outside of the connection
+                    index.discard(value)
+            return self.create(eloqua_object)
+
+    # ------------ Batch API Methods ------------
+
+    def create_many(self, eloqua_objects, workers=8, ordered=True):
+        """
+        Creates many eloqua objects concurrently. See _run_batch()
 
-        return eloqua_object.__class__(resp.json())
+        :param eloqua_objects: An iterable of Eloqua Objects like CustomObjectModel or Asset etc
+        :param workers: (optional) number of objects sent at the same time
+        :param ordered: (optional) return results in input order instead of completion order
+
+        :return: A list of BatchResult with the created objects as result
+        """
+        return self._run_batch(self.create, eloqua_objects, workers, ordered)
+
+    def update_many(self, eloqua_objects, workers=8, ordered=True):
+        """
+        Updates many eloqua objects concurrently. See _run_batch()
+
+        :param eloqua_objects: An iterable of Eloqua Objects like CustomObjectModel or Asset etc
+        :param workers: (optional) number of objects sent at the same time
+        :param ordered: (optional) return results in input order instead of completion order
+
+        :return: A list of BatchResult with the responses from eloqua as result, None for objects that did not change
+        """
+        return self._run_batch(self.update, eloqua_objects, workers, ordered)
+
+    def upsert_many(self, eloqua_objects, key, workers=8, ordered=True, preload=True):
+        """
+        Upserts many custom object records concurrently. See upsert() and _run_batch()
+
+        :param eloqua_objects: An iterable of CustomObjectModel instances
+        :param key: Name of the key field
+        :param workers: (optional) number of objects sent at the same time
+        :param ordered: (optional) return results in input order instead of completion order
+        :param preload: (optional) load the keys of every record first, instead of searching for each key
+
+        :return: A list of BatchResult with the created or updated records as result
+        """
+        return self._run_batch(lambda eloqua_object: self.upsert(eloqua_object, key, preload), eloqua_objects,
+                               workers, ordered)
+
+    def delete_many(self, eloqua_objects, workers=8, ordered=True):
+        """
+        Deletes many eloqua objects concurrently. See _run_batch()
+
+        :param eloqua_objects: An iterable of Eloqua Objects like CustomObjectModel or Asset etc
+        :param workers: (optional) number of objects sent at the same time
+        :param ordered: (optional) return results in input order instead of completion order
+
+        :return: A list of BatchResult with the responses from eloqua as result
+        """
+        return self._run_batch(self.delete, eloqua_objects, workers, ordered)
+
+    def _run_batch(self, operation, eloqua_objects, workers, ordered):
+        """
+        Runs a single object operation over many objects with a pool of `workers` threads sharing this connection.
+
+        A failing object does not stop the batch, whatever it raises is kept on its BatchResult:
+
+            results = elq.create_many(dog_owners, workers=8)
+            failed = [result for result in results if not result.ok]
+
+        The input is consumed lazily and at most twice `workers` objects wait in the pool, so generators of any size
+        can be passed. Keep `workers` at or below the pool_maxsize of the connection.
+
+        :param operation: Bound method taking one object, like self.create
+        :param eloqua_objects: An iterable of objects
+        :param workers: Number of objects sent at the same time
+        :param ordered: Return results in input order instead of completion order
+
+        :return: A list of BatchResult
+        """
+        def run(eloqua_object):
+            try:
+                return BatchResult(eloqua_object, result=operation(eloqua_object))
+            except Exception as e:
+                return BatchResult(eloqua_object, error=e)
+
+        max_pending = workers * 2
+        results = []
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            if ordered:
+                pending = deque()
+                for eloqua_object in eloqua_objects:
+                    pending.append(executor.submit(run, eloqua_object))
+                    if len(pending) >= max_pending:
+                        results.append(pending.popleft().result())
+                while pending:
+                    results.append(pending.popleft().result())
+            else:
+                pending = set()
+                for eloqua_object in eloqua_objects:
+                    pending.add(executor.submit(run, eloqua_object))
+                    if len(pending) >= max_pending:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        results.extend(future.result() for future in done)
+                results.extend(future.result() for future in as_completed(pending))
+        return results
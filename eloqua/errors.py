@@ -14,7 +14,8 @@ class EloquaInvalidUseageException(EloquaException):
 
 
 class EloquaRequestError(EloquaException):
-    """ Error from Eloqua API request """
+    """ Error from Eloqua API request. `attempts` is the number of requests sent, retries included """
+    attempts = 1
 
     def __init__(self, resp, msg=None):
         self.url = resp.url
@@ -39,3 +40,15 @@ class EloquaRequestErrorNotFound(EloquaRequestError):
 
     def __str__(self):
         return '%s %s : %s' % (self.url, self.error_code, self.msg)
+
+
+class EloquaBulkSyncError(EloquaException):
+    """ Bulk API sync that failed or did not finish in time """
+
+    def __init__(self, uri, status, msg=None):
+        self.uri = uri
+        self.status = status
+        self.msg = msg or "Sync ended with status %s" % status
+
+    def __str__(self):
+        return '%s %s : %s' % (self.uri, self.status, self.msg)
@@ -0,0 +1,300 @@
+import io
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import queue
+import time
+
+from .eloqua import CustomObjectModel, EloquaConnection, MAX_PAGE_SIZE
+from .codec import dumps, response_json
+from .columns import column_types
+from .paths import *
+from .errors import *
+
+logger = logging.getLogger("Eloqua")
+
+# Eloqua search terms bounding a partition. The first is the lowest value included, the second the first value left out
+RANGE_SEARCH_LOW = "%s>='%d'"
+RANGE_SEARCH_HIGH = "%s<'%d'"
+
+PARTITION_FILE_NAME = "part-%05d.ndjson"
+
+# Fields a custom object can be partitioned on
+PARTITION_FIELDS = ("id", "updatedAt")
+
+
+class Partition(object):
+    """ A range of the values of the partition field: `low` is included, `high` is not. None leaves it open """
+
+    def __init__(self, index, field, low=None, high=None, search=None):
+        self.index = index
+        self.field = field
+        self.low = low
+        self.high = high
+        self.search = search
+
+    def params(self):
+        """ Returns the params of the list requests of the partition """
+        terms = [self.search] if self.search else []
+        if self.low is not None:
+            terms.append(RANGE_SEARCH_LOW % (self.field, self.low))
+        if self.high is not None:
+            terms.append(RANGE_SEARCH_HIGH % (self.field, self.high))
+        params = {"depth": "complete"}
+        if terms:
+            params["search"] = " AND ".join(terms)
+        return params
+
+    def __repr__(self):
+        return "<Partition %s %s [%s, %s)>" % (self.index, self.field, self.low, self.high)
+
+
+# Queue of the worker processes, set by _init_worker
+_records_queue = None
+
+
+def _init_worker(records_queue):
+    global _records_queue
+    _records_queue = records_queue
+
+
+def _export_partition(settings, customObjectModel, partition, page_size, output_path, raw, chunk_size):
+    """
+    Runs in a worker process. Fetches and hydrates the records of a partition, then writes them to output_path or puts
+    them on the queue in chunks, followed by (partition index, None)
+
+    :return: Number of records exported
+    """
+    connection = EloquaConnection(**settings)
+    columns = list(column_types(customObjectModel))
+    count = 0
+    try:
+        records = connection.iter_list(customObjectModel, partition.params(), page_size=page_size)
+        if output_path is not None:
+            with io.open(output_path, "wb") as output_file:
+                for record in records:
+                    output_file.write(dumps(dict((name, getattr(record, name, None)) for name in columns)) + b"\n")
+                    count += 1
+            return count
+        chunk = []
+        for record in records:
+            chunk.append(dict((name, getattr(record, name, None)) for name in columns) if raw else record)
+            if len(chunk) >= chunk_size:
+                _records_queue.put((partition.index, chunk))
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            _records_queue.put((partition.index, chunk))
+            count += len(chunk)
+        _records_queue.put((partition.index, None))
+        return count
+    finally:
+        connection.close()
+
+
+class PartitionedExport(object):
+    """
+    Export of a custom object split into partitions by ranges of `id` (or `updatedAt`), each one fetched and hydrated
+    by its own worker process with its own connection
+
+    One page loop is held to one core for hydration. Here each process pages through its partition with
+    EloquaConnection.iter_list(), so the work spreads over the cores and the connections:
+
+        export = PartitionedExport(elq, DogOwner, processes=8)
+        export.write("/data/dog_owners")        # one NDJSON file per partition
+        for dog_owner in export.iter_records():  # or one stream of DogOwner instances
+            print(dog_owner.DogName1)
+
+    The partitions are sized from a probe: the number of records and the lowest and highest ids, read from the first
+    and last records of the default order with minimal depth. The first and last partitions are left open, so every
+    record is exported even when the probe is off, unless low and high are given. Partitioning on `updatedAt` needs
+    the `low` bound.
+
+    Within a partition the pages are fetched one after the other, the next one while the current one is hydrated, so
+    at most `processes` requests are in flight and the speed-up is bounded by the number of processes, not by the
+    number of partitions. More partitions than processes only even out the work, as a process that is done with its
+    partition takes the next one.
+
+    The worker processes import the model by name, so it must be defined in a module: the classes built at runtime by
+    EloquaConnection.model_for() can not be used. Use generate_custom_object_code() to write the model to a module.
+    Writing files is the fastest, as the records never leave the worker processes. iter_records() sends them to this
+    process, in an order that mixes the partitions.
+    """
+
+    def __init__(self, connection, customObjectModel, processes=None, partitions=None, partition_size=20000,
+                 field="id", low=None, high=None, search=None, page_size=MAX_PAGE_SIZE, start_method=None):
+        """
+        :param connection: EloquaConnection to use for the probe, and whose credentials the workers use
+        :param customObjectModel: CustomObjectModel subclass of the custom object to export, defined in a module
+        :param processes: (optional) number of worker processes. Defaults to the number of cores
+        :param partitions: (optional) number of partitions. Defaults to one per partition_size records, and at least
+                one per process
+        :param partition_size: (optional) records per partition when partitions is not given
+        :param field: (optional) "id" or "updatedAt"
+        :param low: (optional) lowest value of the field to export. Probed for ids
+        :param high: (optional) highest value of the field to export. Probed for ids, the current time for updatedAt
+        :param search: (optional) Eloqua search the records must also match, like "Breed1='Corgi'"
+        :param page_size: (optional) records per request, 1000 at most
+        :param start_method: (optional) multiprocessing start method, like "spawn". Defaults to the platform's
+        """
+        if not issubclass(customObjectModel, CustomObjectModel):
+            raise EloquaInvalidUseageException("customObjectModel must be a subclass of CustomObjectModel")
+        if field not in PARTITION_FIELDS:
+            raise EloquaInvalidUseageException("field must be one of %s" % ", ".join(PARTITION_FIELDS))
+        if field == "updatedAt" and low is None:
+            raise EloquaInvalidUseageException("low is needed to partition on updatedAt")
+        try:
+            pickle.dumps(customObjectModel)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            raise EloquaInvalidUseageException(
+                "%s can not be imported by the worker processes. Define it in a module, see "
+                "EloquaConnection.generate_custom_object_code()" % customObjectModel.__name__)
+        self.connection = connection
+        self.customObjectModel = customObjectModel
+        self.processes = processes or os.cpu_count() or 1
+        self.partitions = partitions
+        self.partition_size = partition_size
+        self.field = field
+        self.low = low
+        self.high = high
+        self.search = search
+        self.page_size = page_size
+        self.context = multiprocessing.get_context(start_method)
+
+    def _settings(self):
+        """ Returns the arguments of the EloquaConnection of each worker process """
+        company, username = self.connection.username.split("\\", 1)
+        return {
+            "company":      company,
+            "username":     username,
+            "password":     self.connection.password,
+            # Resolved once here, so the workers do not each ask the login url
+            "base_url":     self.connection.base_url,
+            "timeout":      self.connection.timeout,
+            "retry_policy": self.connection.retry_policy,
+        }
+
+    def _probe_page(self, page):
+        path = CUSTOM_OBJECT_DATA_GET_LIST_PATH.format(parent_id=self.customObjectModel.PARENT_ID)
+        params = {"depth": "minimal", "count": 1, "page": page}
+        if self.search:
+            params["search"] = self.search
+        return response_json(self.connection.request(path, "GET", params, template=CUSTOM_OBJECT_DATA_GET_LIST_PATH))
+
+    def probe(self):
+        """
+        Counts the records to export and, for id partitions, finds the lowest and highest ids
+
+        :return: A dict of total, low and high
+        """
+        first = self._probe_page(1)
+        total = first.get("total") or 0
+        low, high = self.low, self.high
+        if self.field == "id" and total:
+            if low is None:
+                low = int(first["elements"][0]["id"])
+            if high is None:
+                last = self._probe_page(total) if total > 1 else first
+                elements = last.get("elements") or first["elements"]
+                high = int(elements[-1]["id"])
+        if self.field == "updatedAt" and high is None:
+            high = int(time.time())
+        return {"total": total, "low": low, "high": high}
+
+    def plan(self):
+        """ Probes the custom object and returns the list of Partition to export """
+        probe = self.probe()
+        total, low, high = probe["total"], probe["low"], probe["high"]
+        count = 1
+        if total and low is not None and high is not None and high > low:
+            count = self.partitions or max(self.processes, int(math.ceil(total / float(self.partition_size))))
+            count = min(count, high - low + 1)
+        step = (high - low + 1) / float(count) if count > 1 else 0
+        # The first and last partitions are left open unless low and high were given, in case the probe is off
+        bounds = [self.low] + [int(low + step * index) for index in range(1, count)] + [
+            self.high + 1 if self.high is not None else None]
+        partitions = [Partition(index, self.field, bounds[index], bounds[index + 1], self.search)
+                      for index in range(count)]
+        logger.debug("Exporting %s records of %s in %s partitions" % (total, self.customObjectModel.__name__, count))
+        return partitions
+
+    def write(self, directory, partitions=None):
+        """
+        Exports each partition to an NDJSON file of the directory, one object of column name to value per record
+
+        :param directory: Directory of the files. Created if missing
+        :param partitions: (optional) list of Partition to export. Defaults to plan()
+        :return: A list of dicts of partition, path and records, in partition order
+        """
+        directory = os.path.expanduser(directory)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        partitions = self.plan() if partitions is None else partitions
+        settings = self._settings()
+        with self.context.Pool(min(self.processes, len(partitions))) as pool:
+            results = []
+            for partition in partitions:
+                path = os.path.join(directory, PARTITION_FILE_NAME % partition.index)
+                results.append((partition, path, pool.apply_async(_export_partition, (
+                    settings, self.customObjectModel, partition, self.page_size, path, False, 0))))
+            exported = [{"partition": partition, "path": path, "records": result.get()}
+                        for partition, path, result in results]
+        return exported
+
+    def iter_records(self, partitions=None, raw=False, chunk_size=500, max_chunks=None):
+        """
+        Exports the partitions into one stream
+
+        :param partitions: (optional) list of Partition to export. Defaults to plan()
+        :param raw: (optional) yield dicts of column name to value instead of model instances, cheaper to pass between
+                processes
+        :param chunk_size: (optional) records sent by a worker at once
+        :param max_chunks: (optional) chunks waiting to be consumed before the workers wait. Defaults to two per process
+        :return: A generator of CustomObjectModel instances, or dicts with raw
+        """
+        partitions = self.plan() if partitions is None else partitions
+        settings = self._settings()
+        processes = min(self.processes, len(partitions))
+        records_queue = self.context.Queue(maxsize=max_chunks or processes * 2)
+        pool = self.context.Pool(processes, initializer=_init_worker, initargs=(records_queue,))
+        try:
+            results = [pool.apply_async(_export_partition, (
+                settings, self.customObjectModel, partition, self.page_size, None, raw, chunk_size))
+                for partition in partitions]
+            pool.close()
+            remaining = len(partitions)
+            while remaining:
+                try:
+                    index, chunk = records_queue.get(timeout=0.5)
+                except queue.Empty:
+                    for result in results:
+                        if result.ready() and not result.successful():
+                            # Raises the exception of the worker
+                            result.get()
+                    continue
+                if chunk is None:
+                    remaining -= 1
+                    continue
+                for record in chunk:
+                    yield record
+            pool.join()
+        finally:
+            pool.terminate()
+
+
+def export_partitioned(connection, customObjectModel, directory=None, **kwargs):
+    """
+    Exports a custom object with worker processes. See PartitionedExport for the arguments
+
+        for dog_owner in export_partitioned(elq, DogOwner, processes=8):
+            print(dog_owner.DogName1)
+
+    :param directory: (optional) Directory to write one NDJSON file per partition to, instead of returning a stream
+    :return: A generator of CustomObjectModel instances, or the list of files written when directory is given
+    """
+    export = PartitionedExport(connection, customObjectModel, **kwargs)
+    if directory is not None:
+        return export.write(directory)
+    return export.iter_records()
@@ -0,0 +1,399 @@
+import calendar
+import csv
+import datetime
+import io
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .eloqua import CustomObjectModel
+from .codec import dumps, loads
+from .errors import *
+
+logger = logging.getLogger("Eloqua")
+
+FORMATS = {
+    ".csv":    "csv",
+    ".ndjson": "ndjson",
+    ".jsonl":  "ndjson",
+}
+
+# Columns added to the rows of the reject file
+REJECT_LINE_COLUMN = "_line"
+REJECT_ERROR_COLUMN = "_error"
+
+# Dates written as 8 digits, like "20190627", which would otherwise be read as timestamps of 1970
+COMPACT_DATE_FORMAT = "%Y%m%d"
+
+
+def to_timestamp(value, date_format=None):
+    """
+    Converts a date to the integer unix timestamp Eloqua expects
+
+    Accepts numbers (taken as timestamps already), datetime and date objects, ISO 8601 strings like "2019-06-27" or
+    "2019-06-27T14:01:42+02:00", compact dates like "20190627" and, with date_format, strings parsed by
+    datetime.strptime. Other strings of digits are taken as timestamps. Dates without a timezone are taken as UTC.
+
+    :param value: The date
+    :param date_format: (optional) strptime format of date strings
+    :return: An int, or None if value is empty
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            return calendar.timegm(value.timetuple())
+        return int(value.timestamp())
+    if isinstance(value, datetime.date):
+        return calendar.timegm(value.timetuple())
+    if isinstance(value, (int, float)):
+        return int(value)
+    value = str(value).strip()
+    if len(value) == 8 and value.isdigit():
+        return to_timestamp(datetime.datetime.strptime(value, date_format or COMPACT_DATE_FORMAT))
+    try:
+        return int(float(value))
+    except ValueError:
+        pass
+    if date_format:
+        return to_timestamp(datetime.datetime.strptime(value, date_format))
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return to_timestamp(datetime.datetime.fromisoformat(value))
+
+
+def _to_number(value, date_format=None):
+    if value is None or value == "":
+        return None
+    float(value)
+    return str(value).strip()
+
+
+def _to_text(value, date_format=None):
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+CONVERTERS = {
+    "date":    to_timestamp,
+    "number":  _to_number,
+    "numeric": _to_number,
+}
+
+
+class CustomObjectImport(object):
+    """
+    Streaming import of a CSV or NDJSON file into a custom object, described by a CustomObjectModel subclass
+
+    Columns are mapped to the fields of the model by field name or by field id (the keys of ID_FIELD_MAP), or with
+    column_map. Other columns are ignored. Values are converted from the FIELD_TYPES of the model: dates to unix
+    timestamps, numbers checked. The file is read in chunks of chunk_size rows, each chunk is created with
+    EloquaConnection.create_many(), and up to chunks_in_flight chunks are sent at the same time, so memory does not
+    grow with the size of the file:
+
+        importer = CustomObjectImport(elq, DogOwner, "owners.csv", checkpoint_path="owners.checkpoint",
+                                      reject_path="owners.rejects.csv")
+        print(importer.run())   # {'rows': 120000, 'imported': 119990, 'rejected': 10}
+
+    Rows that can not be converted or that Eloqua refuses go to the reject file, in the format of the input, with their
+    line number and error in the `_line` and `_error` columns.
+
+    The checkpoint records how many rows were done, advanced as chunks finish in file order. When run() is called again
+    after a crash, the rows before the checkpoint are skipped and new rejects are appended to the reject file, leaving
+    out the lines it already has. The rows of the chunks that were in flight when the crash happened are sent again:
+    with a `key` field they are upserted on it (see EloquaConnection.upsert()) and update the records created before
+    the crash, without it some of them may be created twice. A finished import keeps its checkpoint and does nothing
+    when run again, unless restart=True.
+    """
+
+    def __init__(self, connection, customObjectModel, path, format=None, column_map=None, chunk_size=1000,
+                 workers=8, checkpoint_path=None, reject_path=None, date_format=None, encoding="utf-8",
+                 delimiter=",", chunks_in_flight=2, key=None):
+        """
+        :param connection: EloquaConnection to use
+        :param customObjectModel: CustomObjectModel subclass of the custom object to import into
+        :param path: CSV or NDJSON file
+        :param format: (optional) "csv" or "ndjson". Defaults to the file extension
+        :param column_map: (optional) dict of column name to field name, for columns named differently from the fields
+        :param chunk_size: (optional) rows read and sent per chunk
+        :param workers: (optional) number of records sent at the same time
+        :param checkpoint_path: (optional) file recording the progress of the import, to resume it
+        :param reject_path: (optional) file receiving the rows that failed. Defaults to no reject file
+        :param date_format: (optional) strptime format of the dates of the file, when they are not ISO 8601
+        :param encoding: (optional) encoding of the files
+        :param delimiter: (optional) delimiter of the CSV files
+        :param chunks_in_flight: (optional) number of chunks sent at the same time, each by `workers` threads
+        :param key: (optional) name of a field identifying the records, to upsert the rows instead of creating them
+        """
+        if not issubclass(customObjectModel, CustomObjectModel):
+            raise EloquaInvalidUseageException("customObjectModel must be a subclass of CustomObjectModel")
+        self.format = format or FORMATS.get(os.path.splitext(path)[1].lower())
+        if self.format not in ("csv", "ndjson"):
+            raise EloquaInvalidUseageException("Unknown format of %s. Use format='csv' or format='ndjson'" % path)
+        self.connection = connection
+        self.customObjectModel = customObjectModel
+        self.path = os.path.expanduser(path)
+        self.column_map = column_map or {}
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.checkpoint_path = os.path.expanduser(checkpoint_path) if checkpoint_path else None
+        self.reject_path = os.path.expanduser(reject_path) if reject_path else None
+        self.date_format = date_format
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.chunks_in_flight = max(chunks_in_flight, 1)
+        self.key = key
+        self.field_types = customObjectModel.FIELD_TYPES or {}
+        # Column name of the file to field name of the model, None for the columns ignored
+        self._columns = {}
+        self._header = None
+
+    # ------------ Reading ------------
+
+    def _field_names(self):
+        names = {}
+        for field_id, field_name in (self.customObjectModel.ID_FIELD_MAP or {}).items():
+            names[field_id] = field_name
+            names[field_name] = field_name
+        return names
+
+    def _map_columns(self, columns):
+        """ Maps new column names of the file to the field names of the model, None for the columns ignored """
+        field_names = self._field_names()
+        ignored = []
+        for column in columns:
+            field_name = self.column_map.get(column) or field_names.get(column)
+            self._columns[column] = field_name
+            if field_name is None and column is not None:
+                ignored.append(column)
+        if ignored:
+            logger.warning("Ignoring columns of %s that are not fields of %s: %s" % (
+                self.path, self.customObjectModel.__name__, ", ".join(str(column) for column in ignored)))
+
+    def rows(self):
+        """
+        Yields the line number and the row of each record of the file, as a dict of column name to value. NDJSON lines
+        that are not valid JSON are yielded as strings
+        """
+        with io.open(self.path, encoding=self.encoding, newline="") as input_file:
+            if self.format == "csv":
+                reader = csv.DictReader(input_file, delimiter=self.delimiter)
+                self._header = reader.fieldnames or []
+                for row in reader:
+                    yield reader.line_num, row
+            else:
+                for line_number, line in enumerate(input_file, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield line_number, loads(line)
+                    except ValueError:
+                        yield line_number, line.rstrip("\r\n")
+
+    def to_record(self, row):
+        """
+        Builds a model instance from a row of the file
+
+        :param row: dict of column name to value
+        :return: A CustomObjectModel instance
+        :raises ValueError: when the row is not a JSON object or a value can not be converted to the type of its field
+        """
+        if not isinstance(row, dict):
+            raise ValueError("Not a JSON object")
+        new_columns = [column for column in row if column not in self._columns]
+        if new_columns:
+            self._map_columns(new_columns)
+        record = self.customObjectModel()
+        for column, value in row.items():
+            field_name = self._columns[column]
+            if field_name is None:
+                continue
+            convert = CONVERTERS.get(self.field_types.get(field_name), _to_text)
+            try:
+                value = convert(value, self.date_format)
+            except (TypeError, ValueError):
+                raise ValueError("%s: %r is not a valid %s" % (column, value, self.field_types.get(field_name)))
+            if value is not None and value != "":
+                setattr(record, field_name, value)
+        return record
+
+    # ------------ Checkpoint and rejects ------------
+
+    def checkpoint(self):
+        """ Returns the saved progress: a dict of rows, imported, rejected and done, or None """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        with io.open(self.checkpoint_path, "rb") as checkpoint_file:
+            checkpoint = loads(checkpoint_file.read())
+        if checkpoint.get("path") != os.path.abspath(self.path):
+            raise EloquaInvalidUseageException("%s is the checkpoint of %s, not of %s" % (
+                self.checkpoint_path, checkpoint.get("path"), self.path))
+        return checkpoint
+
+    def _save_checkpoint(self, stats, done=False):
+        if not self.checkpoint_path:
+            return
+        checkpoint = dict(stats, path=os.path.abspath(self.path), done=done)
+        temporary_path = self.checkpoint_path + ".tmp"
+        with io.open(temporary_path, "wb") as checkpoint_file:
+            checkpoint_file.write(dumps(checkpoint))
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        # Replaced in one step, so a crash leaves the previous or the new checkpoint, never half of one
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def _open_rejects(self, append):
+        if not self.reject_path:
+            return None, None
+        reject_file = io.open(self.reject_path, "a" if append else "w", encoding=self.encoding, newline="")
+        if self.format != "csv":
+            return reject_file, None
+        writer = csv.DictWriter(reject_file, list(self._header or []) + [REJECT_LINE_COLUMN, REJECT_ERROR_COLUMN],
+                                delimiter=self.delimiter, extrasaction="ignore")
+        if not append or reject_file.tell() == 0:
+            writer.writeheader()
+        return reject_file, writer
+
+    def _rejected_lines(self):
+        """ Returns the set of the line numbers already in the reject file """
+        lines = set()
+        if not self.reject_path or not os.path.exists(self.reject_path):
+            return lines
+        with io.open(self.reject_path, encoding=self.encoding, newline="") as reject_file:
+            if self.format == "csv":
+                rejects = csv.DictReader(reject_file, delimiter=self.delimiter)
+            else:
+                rejects = (loads(line) for line in reject_file if line.strip())
+            for reject in rejects:
+                try:
+                    lines.add(int(reject.get(REJECT_LINE_COLUMN)))
+                except (AttributeError, TypeError, ValueError):
+                    continue
+        return lines
+
+    def _reject(self, reject_file, writer, line_number, row, error, rejected_lines=()):
+        logger.debug("Rejected line %s of %s: %s" % (line_number, self.path, error))
+        if reject_file is None or line_number in rejected_lines:
+            # Written before a crash
+            return
+        row = dict(row) if isinstance(row, dict) else {"_raw": row}
+        row[REJECT_LINE_COLUMN] = line_number
+        row[REJECT_ERROR_COLUMN] = str(error)
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            reject_file.write(dumps(row).decode("utf-8") + "\n")
+
+    # ------------ Import ------------
+
+    def run(self, restart=False):
+        """
+        Imports the file, resuming from the checkpoint if there is one
+
+        :param restart: (optional) ignore the checkpoint and import the whole file again
+        :return: A dict with the number of `rows` read, `imported` and `rejected`
+        """
+        checkpoint = None if restart else self.checkpoint()
+        stats = {"rows": 0, "imported": 0, "rejected": 0}
+        if checkpoint is not None:
+            stats = dict((key, checkpoint.get(key, 0)) for key in stats)
+            if checkpoint.get("done"):
+                logger.info("%s was already imported" % self.path)
+                return stats
+            logger.info("Resuming the import of %s after row %s" % (self.path, stats["rows"]))
+        skip = stats["rows"]
+        rejected_lines = self._rejected_lines() if checkpoint is not None else set()
+
+        rows = self.rows()
+        reject_file = writer = None
+        pending = deque()
+        try:
+            with ThreadPoolExecutor(max_workers=self.chunks_in_flight) as executor:
+                chunk = []
+                for line_number, row in rows:
+                    if reject_file is None and self.reject_path:
+                        # Opened once the CSV header was read
+                        reject_file, writer = self._open_rejects(append=checkpoint is not None)
+                    if skip:
+                        skip -= 1
+                        continue
+                    chunk.append((line_number, row))
+                    if len(chunk) >= self.chunk_size:
+                        pending.append(self._start_chunk(executor, chunk))
+                        chunk = []
+                        if len(pending) >= self.chunks_in_flight:
+                            self._finish_chunk(pending.popleft(), stats, reject_file, writer, rejected_lines)
+                if chunk:
+                    pending.append(self._start_chunk(executor, chunk))
+                while pending:
+                    self._finish_chunk(pending.popleft(), stats, reject_file, writer, rejected_lines)
+            self._save_checkpoint(stats, done=True)
+        finally:
+            for _, _, _, future in pending:
+                future.cancel()
+            rows.close()
+            if reject_file is not None:
+                reject_file.close()
+        logger.info("Imported %s of %s rows of %s into %s" % (
+            stats["imported"], stats["rows"], self.path, self.customObjectModel.__name__))
+        return stats
+
+    def _start_chunk(self, executor, chunk):
+        """
+        Converts the rows of a chunk and submits the records to the executor. Rows are converted here, in the thread
+        reading the file, as the column mapping is built while reading
+
+        :return: A tuple of the number of rows, the rows of each record, the conversion rejects and the Future of the
+                BatchResults
+        """
+        records = []
+        sources = {}
+        rejects = []
+        for line_number, row in chunk:
+            try:
+                record = self.to_record(row)
+            except ValueError as e:
+                rejects.append((line_number, row, e))
+                continue
+            records.append(record)
+            sources[id(record)] = (line_number, row)
+        if self.key:
+            future = executor.submit(self.connection.upsert_many, records, self.key, workers=self.workers)
+        else:
+            future = executor.submit(self.connection.create_many, records, workers=self.workers)
+        return len(chunk), sources, rejects, future
+
+    def _finish_chunk(self, started_chunk, stats, reject_file, writer, rejected_lines):
+        """
+        Waits for a chunk, writes its rejects and moves the checkpoint past it. Chunks are finished in file order, so
+        the checkpoint only covers rows of chunks that are done
+        """
+        rows, sources, rejects, future = started_chunk
+        for result in future.result():
+            if result.ok:
+                stats["imported"] += 1
+            else:
+                line_number, row = sources[id(result.eloqua_object)]
+                rejects.append((line_number, row, result.error))
+        for line_number, row, error in sorted(rejects, key=lambda reject: reject[0]):
+            self._reject(reject_file, writer, line_number, row, error, rejected_lines)
+            stats["rejected"] += 1
+        stats["rows"] += rows
+        if reject_file is not None:
+            reject_file.flush()
+        self._save_checkpoint(stats)
+        logger.debug("Imported %s rows of %s" % (stats["rows"], self.path))
+
+
+def import_custom_object_data(connection, customObjectModel, path, **kwargs):
+    """
+    Imports a CSV or NDJSON file into a custom object. See CustomObjectImport for the arguments
+
+        stats = import_custom_object_data(elq, DogOwner, "owners.csv", checkpoint_path="owners.checkpoint",
+                                          reject_path="owners.rejects.csv")
+
+    :return: A dict with the number of `rows` read, `imported` and `rejected`
+    """
+    return CustomObjectImport(connection, customObjectModel, path, **kwargs).run()
@@ -0,0 +1,370 @@
+import datetime
+import operator
+import threading
+from bisect import bisect_left, bisect_right
+
+from .eloqua import DataResponse
+from .importer import to_timestamp
+from .errors import *
+
+# Locks of a KeyIndex. Upserts of different keys sharing a lock wait for each other
+KEY_LOCK_STRIPES = 64
+
+
+def _sort_key(value):
+    """
+    Returns the float a sorted index orders a value by: numbers as they are, datetimes, dates and ISO 8601 strings as
+    unix timestamps. None if the value is missing or can not be converted
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.date):
+        return float(to_timestamp(value))
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return float(to_timestamp(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class _SortedIndex(object):
+    """
+    Sorted keys of one field with the records they belong to, kept in two parallel lists
+
+    Added keys wait in a list and are sorted in at once before the next read, so indexing many records sorts once.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.handles = []
+        self._added = []
+
+    def add(self, key, handle):
+        self._added.append((key, handle))
+
+    def _sort_added(self):
+        if not self._added:
+            return
+        # The sort is stable, so records with the same key stay in the order they were added
+        entries = sorted(list(zip(self.keys, self.handles)) + self._added, key=operator.itemgetter(0))
+        self.keys = [key for key, handle in entries]
+        self.handles = [handle for key, handle in entries]
+        self._added = []
+
+    def remove(self, key, handle):
+        self._sort_added()
+        position = bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.handles[position] == handle:
+                del self.keys[position]
+                del self.handles[position]
+                return
+            position += 1
+
+    def between(self, low, high):
+        self._sort_added()
+        start = 0 if low is None else bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else bisect_right(self.keys, high)
+        return self.handles[start:end]
+
+
+class IndexedCollection(object):
+    """
+    In memory collection of Eloqua objects with secondary indexes
+
+    Hash indexes find the records with a given field value in constant time, sorted indexes find the records with a
+    number or date field within a range. Records are always indexed by their Eloqua `id`.
+
+        owners = IndexedCollection(elq.get_list(DogOwner, fetch_all=True), hash_indexes=["DogName1", "Email1"],
+                                   sorted_indexes=["StartOfOwnership1"])
+        owners.first("Email1", "jane@example.com")
+        owners.range("StartOfOwnership1", low=1546300800)
+
+    Records changed after they were added are indexed again with update(). Adding a record with the id of a record of
+    the collection replaces that record.
+    """
+
+    def __init__(self, records=None, hash_indexes=(), sorted_indexes=()):
+        """
+        :param records: (optional) A DataResponse or an iterable of CustomObjectModel or Asset instances
+        :param hash_indexes: (optional) Fields to index for lookup() and first()
+        :param sorted_indexes: (optional) Number or date fields to index for range(). Values that are neither numbers
+                nor dates are left out of the index
+        """
+        self._records = {}
+        self._by_id = {}
+        self._indexed_values = {}
+        self._hash_indexes = {}
+        self._sorted_indexes = {}
+        for field in hash_indexes:
+            self._hash_indexes[field] = {}
+        for field in sorted_indexes:
+            self._sorted_indexes[field] = _SortedIndex()
+        if records is not None:
+            self.extend(records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(list(self._records.values()))
+
+    def __contains__(self, record):
+        return id(record) in self._records
+
+    def add_index(self, field, sorted=False):
+        """
+        Indexes a field of the records already in the collection and of those added later
+
+        :param field: Field name
+        :param sorted: (optional) add a sorted index for range() instead of a hash index
+        """
+        indexes = self._sorted_indexes if sorted else self._hash_indexes
+        if field in indexes:
+            return
+        indexes[field] = _SortedIndex() if sorted else {}
+        for handle, record in self._records.items():
+            value = getattr(record, field, None)
+            self._indexed_values[handle][field] = value
+            self._index_value(field, value, handle)
+
+    def _index_value(self, field, value, handle):
+        if field in self._hash_indexes and value is not None:
+            self._hash_indexes[field].setdefault(value, {})[handle] = None
+        if field in self._sorted_indexes:
+            key = _sort_key(value)
+            if key is not None:
+                self._sorted_indexes[field].add(key, handle)
+
+    def _unindex_value(self, field, value, handle):
+        if field in self._hash_indexes and value is not None:
+            handles = self._hash_indexes[field].get(value)
+            if handles is not None:
+                handles.pop(handle, None)
+                if not handles:
+                    del self._hash_indexes[field][value]
+        if field in self._sorted_indexes:
+            key = _sort_key(value)
+            if key is not None:
+                self._sorted_indexes[field].remove(key, handle)
+
+    def _fields(self):
+        return set(self._hash_indexes) | set(self._sorted_indexes)
+
+    def add(self, record):
+        """
+        Adds a record. A record of the collection with the same id is replaced
+
+        :param record: A CustomObjectModel or Asset instance
+        """
+        handle = id(record)
+        if handle in self._records:
+            return self.update(record)
+        record_id = getattr(record, "id", None)
+        if record_id is not None and str(record_id) in self._by_id:
+            self.remove(self._records[self._by_id[str(record_id)]])
+        self._records[handle] = record
+        if record_id is not None:
+            self._by_id[str(record_id)] = handle
+        values = {"id": record_id}
+        for field in self._fields():
+            values[field] = getattr(record, field, None)
+            self._index_value(field, values[field], handle)
+        self._indexed_values[handle] = values
+
+    def extend(self, records):
+        """
+        Adds many records
+
+        :param records: A DataResponse or an iterable of CustomObjectModel or Asset instances
+        """
+        if isinstance(records, DataResponse):
+            records = records.data or []
+        for record in records:
+            self.add(record)
+
+    def update(self, record):
+        """
+        Indexes a record again after its fields changed. Adds it if it is not in the collection
+
+        :param record: A CustomObjectModel or Asset instance
+        """
+        handle = id(record)
+        if handle not in self._records:
+            return self.add(record)
+        values = self._indexed_values[handle]
+        record_id = getattr(record, "id", None)
+        if record_id != values["id"]:
+            if values["id"] is not None and self._by_id.get(str(values["id"])) == handle:
+                del self._by_id[str(values["id"])]
+            if record_id is not None:
+                other = self._by_id.get(str(record_id))
+                if other is not None and other != handle:
+                    self.remove(self._records[other])
+                self._by_id[str(record_id)] = handle
+            values["id"] = record_id
+        for field in self._fields():
+            value = getattr(record, field, None)
+            if value != values.get(field):
+                self._unindex_value(field, values.get(field), handle)
+                self._index_value(field, value, handle)
+                values[field] = value
+
+    def remove(self, record):
+        """
+        Removes a record
+
+        :param record: A CustomObjectModel or Asset instance of the collection
+        """
+        handle = id(record)
+        if handle not in self._records:
+            raise EloquaInvalidUseageException("The record is not in the collection")
+        values = self._indexed_values.pop(handle)
+        for field in self._fields():
+            self._unindex_value(field, values.get(field), handle)
+        if values["id"] is not None and self._by_id.get(str(values["id"])) == handle:
+            del self._by_id[str(values["id"])]
+        del self._records[handle]
+
+    def get(self, record_id):
+        """ Returns the record with this Eloqua id, or None """
+        handle = self._by_id.get(str(record_id))
+        return self._records[handle] if handle is not None else None
+
+    def lookup(self, field, value):
+        """
+        Returns the records whose field equals value, in the order they were added
+
+        :param field: A field with a hash index
+        :param value: The value to look for
+        :return: A list of records
+        """
+        if field not in self._hash_indexes:
+            raise EloquaInvalidUseageException("%s has no hash index. Use add_index()" % field)
+        return [self._records[handle] for handle in self._hash_indexes[field].get(value, ())]
+
+    def first(self, field, value):
+        """ Returns the first record whose field equals value, or None. See lookup() """
+        records = self.lookup(field, value)
+        return records[0] if records else None
+
+    def values(self, field):
+        """ Returns the distinct values of a field with a hash index """
+        if field not in self._hash_indexes:
+            raise EloquaInvalidUseageException("%s has no hash index. Use add_index()" % field)
+        return list(self._hash_indexes[field])
+
+    def range(self, field, low=None, high=None):
+        """
+        Returns the records whose field is between low and high, both included, ordered by that field
+
+        :param field: A field with a sorted index
+        :param low: (optional) Smallest value: a number, a datetime or date, or an ISO 8601 string. No lower bound if
+                None
+        :param high: (optional) Largest value. No upper bound if None
+        :return: A list of records
+        """
+        if field not in self._sorted_indexes:
+            raise EloquaInvalidUseageException("%s has no sorted index. Use add_index(sorted=True)" % field)
+        bounds = []
+        for bound in (low, high):
+            key = _sort_key(bound) if bound is not None else None
+            if bound is not None and key is None:
+                raise EloquaInvalidUseageException("%r is not a number or a date to compare %s with" % (bound, field))
+            bounds.append(key)
+        return [self._records[handle] for handle in self._sorted_indexes[field].between(*bounds)]
+
+
+class KeyIndex(object):
+    """
+    Thread safe map of the values of a key field of a custom object to the ids of its records, used by
+    EloquaConnection.upsert()
+
+    The index is `complete` once it was loaded with every record of the custom object. A key missing from a complete
+    index is taken as not in Eloqua, without searching for it. Key values are compared as strings, like Eloqua returns
+    them, so 5 and "5" are the same key but "A@x.com" and "a@x.com" are different keys.
+
+    lock() returns the lock of a key value, so concurrent upserts of the same key run one after the other and do not
+    create duplicates. The locks are a fixed set shared by the key values with the same hash, so they do not grow with
+    the number of keys.
+    """
+
+    def __init__(self, key, complete=False, lock_stripes=KEY_LOCK_STRIPES):
+        """
+        :param key: Name of the key field
+        :param complete: (optional) the index holds every record of the custom object
+        :param lock_stripes: (optional) number of locks shared by the key values
+        """
+        self.key = key
+        self.complete = complete
+        self._ids = {}
+        self._keys = {}
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._lock = threading.Lock()
+        # Held while the index is loaded, so it is loaded once by concurrent upserts
+        self.load_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, value):
+        return self._normalize(value) in self._ids
+
+    @staticmethod
+    def _normalize(value):
+        """ Returns the key value as it is stored, a string. None for no value """
+        if value is None or value == "":
+            return None
+        return str(value)
+
+    def get(self, value):
+        """ Returns the record id of the key value, or None """
+        return self._ids.get(self._normalize(value))
+
+    def set(self, value, record_id):
+        """ Maps a key value to a record id, replacing the previous key of that record. An empty value unmaps it """
+        if record_id is None:
+            return
+        value = self._normalize(value)
+        if value is None:
+            return self.discard_id(record_id)
+        record_id = str(record_id)
+        with self._lock:
+            previous = self._keys.get(record_id)
+            if previous is not None and previous != value and self._ids.get(previous) == record_id:
+                del self._ids[previous]
+            self._ids[value] = record_id
+            self._keys[record_id] = value
+
+    def discard(self, value):
+        """ Forgets a key value """
+        value = self._normalize(value)
+        with self._lock:
+            record_id = self._ids.pop(value, None)
+            if record_id is not None and self._keys.get(record_id) == value:
+                del self._keys[record_id]
+
+    def discard_id(self, record_id):
+        """ Forgets the key value of a record id """
+        with self._lock:
+            value = self._keys.pop(str(record_id), None)
+            if value is not None and self._ids.get(value) == str(record_id):
+                del self._ids[value]
+
+    def add_records(self, records):
+        """
+        Indexes the key of records
+
+        :param records: A DataResponse or an iterable of CustomObjectModel instances
+        """
+        if isinstance(records, DataResponse):
+            records = records.data or []
+        for record in records:
+            self.set(getattr(record, self.key, None), getattr(record, "id", None))
+
+    def lock(self, value):
+        """ Returns the lock of a key value. Other key values may share it """
+        return self._locks[hash(self._normalize(value)) % len(self._locks)]
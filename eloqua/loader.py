@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .eloqua import Asset, CustomObjectModel
+from .errors import *
+
+logger = logging.getLogger("Eloqua")
+
+# Eloqua search matching one id, joined with ID_SET_SEPARATOR to fetch a batch of ids with one list request
+ID_SEARCH = "id='%s'"
+ID_SET_SEPARATOR = " OR "
+
+# Ids per list request. Each one adds to the url, which Eloqua limits
+DEFAULT_MAX_BATCH = 100
+
+
+class BatchLoader(object):
+    """
+    Coalesces the get() calls made within a short window into one list request per class
+
+        loader = BatchLoader(elq, window=0.005)
+        owner = loader.get(DogOwner, "12")                 # from any thread
+        owners = loader.get_many(DogOwner, ["12", "13", "14"])
+
+    Calls for the same class made within `window` seconds of the first one are sent as one get_list() with an id set
+    search, `id='12' OR id='13'`, and each caller gets its own record back. Ids the search does not return, or every id
+    of a batch whose list request failed, are fetched one by one with get(), so callers get the same record or
+    exception as with EloquaConnection.get(). Concurrent calls for an id that is already waiting or being fetched share
+    that call and get the same instance: do not change it without copying it first.
+
+    The loader is not a cache: once its batch is answered, the next get() of an id fetches it again.
+    """
+
+    def __init__(self, connection, window=0.005, max_batch=DEFAULT_MAX_BATCH, workers=4):
+        """
+        :param connection: EloquaConnection to use
+        :param window: (optional) seconds a batch waits for more ids after its first one
+        :param max_batch: (optional) ids per list request. A full batch is sent without waiting for the window
+        :param workers: (optional) number of batches fetched at the same time
+        """
+        self.connection = connection
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.coalesced = 0
+        self._pending = {}
+        self._deadlines = {}
+        # Full batches waiting for the dispatcher, as (objectClass, batch)
+        self._full = []
+        self._in_flight = {}
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._closed = False
+        self._dispatcher = threading.Thread(target=self._dispatch, name="EloquaBatchLoader", daemon=True)
+        self._dispatcher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """ Sends the waiting batches and stops the loader once they are answered """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def load(self, objectClass, data_id):
+        """
+        Queues an id for the next batch of its class
+
+        :param objectClass: An Asset class, CustomObjectModel etc
+        :param data_id: Id string "501" for example
+        :return: A Future of the instance of the objectClass
+        """
+        if not issubclass(objectClass, (Asset, CustomObjectModel)):
+            raise EloquaInvalidUseageException("%s is not a valid class to use with this method" % objectClass)
+        data_id = str(data_id)
+        key = (objectClass, data_id)
+        with self._condition:
+            if self._closed:
+                raise EloquaInvalidUseageException("The BatchLoader is closed")
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self._in_flight[key] = Future()
+            batch = self._pending.get(objectClass)
+            if batch is None:
+                batch = self._pending[objectClass] = OrderedDict()
+                self._deadlines[objectClass] = time.monotonic() + self.window
+            batch[data_id] = future
+            if len(batch) >= self.max_batch:
+                # Sent without waiting, the next ids start a new batch
+                self._full.append((objectClass, self._pending.pop(objectClass)))
+                del self._deadlines[objectClass]
+            self._condition.notify()
+        return future
+
+    def get(self, objectClass, data_id, timeout=None):
+        """
+        Gets an object through the next batch of its class. See EloquaConnection.get()
+
+        :param objectClass: An Asset class, CustomObjectModel etc
+        :param data_id: Id string "501" for example
+        :param timeout: (optional) seconds to wait for the batch
+        :return: An instance of the objectClass provided
+        """
+        return self.load(objectClass, data_id).result(timeout)
+
+    def get_many(self, objectClass, data_ids, timeout=None):
+        """
+        Gets many objects through batches
+
+        :return: A list of instances of the objectClass, in the order of data_ids
+        """
+        futures = [self.load(objectClass, data_id) for data_id in data_ids]
+        return [future.result(timeout) for future in futures]
+
+    def _dispatch(self):
+        """ Sends the batches whose window is over, until the loader is closed and every batch was sent """
+        while True:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    due = [objectClass for objectClass, deadline in self._deadlines.items()
+                           if deadline <= now or self._closed]
+                    if due or self._full or (self._closed and not self._pending):
+                        break
+                    timeout = min(self._deadlines.values()) - now if self._deadlines else None
+                    self._condition.wait(timeout)
+                batches = self._full
+                self._full = []
+                for objectClass in due:
+                    del self._deadlines[objectClass]
+                    batches.append((objectClass, self._pending.pop(objectClass)))
+                stop = self._closed and not self._pending
+            for objectClass, batch in batches:
+                self._executor.submit(self._fetch_batch, objectClass, batch)
+            if stop:
+                return
+
+    def _finish(self, objectClass, data_id, future, result=None, error=None):
+        with self._condition:
+            self._in_flight.pop((objectClass, data_id), None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _fetch_batch(self, objectClass, batch):
+        """ Fetches a batch with one list request, then the ids it did not return one by one """
+        with self._condition:
+            self.batches += 1
+        found = {}
+        try:
+            params = {
+                "search": ID_SET_SEPARATOR.join(ID_SEARCH % data_id for data_id in batch),
+                "count":  len(batch),
+                "depth":  "complete",
+            }
+            for eloqua_object in self.connection.get_list(objectClass, params).data or []:
+                found[str(eloqua_object.id)] = eloqua_object
+        except Exception as e:
+            logger.warning("Batch of %s %s failed, fetching them one by one: %s" % (
+                len(batch), objectClass.__name__, e))
+        for data_id, future in batch.items():
+            if data_id in found:
+                self._finish(objectClass, data_id, future, result=found[data_id])
+                continue
+            try:
+                self._finish(objectClass, data_id, future, result=self.connection.get(objectClass, data_id))
+            except Exception as e:
+                self._finish(objectClass, data_id, future, error=e)
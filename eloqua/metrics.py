@@ -0,0 +1,222 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def path_template(path):
+    """ Returns the path with its numeric ids replaced by {id}, for requests made without a path template """
+    return _ID_SEGMENT.sub("/{id}", path)
+
+
+class RequestEvent(object):
+    """
+    One request made by an EloquaConnection, passed to the hooks of the connection
+
+    `template` is the API path template of the request, like CUSTOM_OBJECT_DATA_GET_LIST_PATH, which groups the
+    requests of an endpoint whatever their ids. The times are in seconds: `network_time` from the first attempt to the
+    last response, retries included, `decode_time` spent decoding the JSON body and `hydrate_time` spent building
+    the model instances. `error` is the exception of a failed request.
+    """
+
+    def __init__(self, method, path, template=None, bytes_out=0, hooks=()):
+        # The hooks called for this request, as they were when it started
+        self.hooks = hooks
+        self.method = method.upper()
+        self.path = path
+        self.template = template or path_template(path)
+        self.bytes_out = bytes_out
+        self.bytes_in = 0
+        self.status = None
+        self.attempts = 0
+        self.network_time = 0.0
+        self.decode_time = 0.0
+        self.hydrate_time = 0.0
+        self.error = None
+        self.started = time.time()
+
+    @property
+    def total_time(self):
+        return self.network_time + self.decode_time + self.hydrate_time
+
+    def __repr__(self):
+        return "<RequestEvent %s %s %s %.3fs>" % (self.method, self.template, self.status, self.total_time)
+
+
+class RequestHook(object):
+    """
+    Base class of the hooks called around each request of an EloquaConnection. Override the methods you need
+
+        class SlowRequestLogger(RequestHook):
+            def after_request(self, event):
+                if event.total_time > 5:
+                    logger.warning("Slow request %s" % event)
+
+        elq.add_hook(SlowRequestLogger())
+
+    Hooks are called from the threads making the requests and should be quick and thread safe.
+    """
+
+    def before_request(self, event):
+        """ Called before the request is sent """
+
+    def after_request(self, event):
+        """ Called once the response was decoded and, for API methods returning models, hydrated """
+
+    def request_failed(self, event):
+        """ Called when the request failed, with the exception in event.error """
+
+
+class _EndpointMetrics(object):
+    """ Counters and latency histogram of one method and path template """
+
+    def __init__(self, buckets):
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.attempts = 0
+        self.network_time = 0.0
+        self.decode_time = 0.0
+        self.hydrate_time = 0.0
+        self.bucket_counts = [0] * (len(buckets) + 1)
+
+    def to_dict(self, buckets):
+        cumulative = []
+        count = 0
+        for bound, bucket_count in zip(list(buckets) + [float("inf")], self.bucket_counts):
+            count += bucket_count
+            cumulative.append((bound, count))
+        return {
+            "requests":     self.requests,
+            "errors":       self.errors,
+            "statuses":     dict(self.statuses),
+            "bytes_in":     self.bytes_in,
+            "bytes_out":    self.bytes_out,
+            "attempts":     self.attempts,
+            "network_time": self.network_time,
+            "decode_time":  self.decode_time,
+            "hydrate_time": self.hydrate_time,
+            "total_time":   self.network_time + self.decode_time + self.hydrate_time,
+            "buckets":      cumulative,
+        }
+
+
+class MetricsCollector(RequestHook):
+    """
+    Hook keeping counters and a latency histogram per method and path template
+
+        metrics = MetricsCollector()
+        elq = EloquaConnection(COMPANY, USERNAME, PASSWORD, hooks=[metrics])
+        ...
+        metrics.snapshot()[("GET", CUSTOM_OBJECT_DATA_GET_LIST_PATH)]["total_time"]
+        print(metrics.to_prometheus())
+
+    The histogram measures the total time of each request: network, decode and hydration.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix="eloqua"):
+        """
+        :param buckets: (optional) Upper bounds in seconds of the latency histogram buckets
+        :param prefix: (optional) Prefix of the Prometheus metric names
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _record(self, event, failed):
+        key = (event.method, event.template)
+        with self._lock:
+            metrics = self._endpoints.get(key)
+            if metrics is None:
+                metrics = self._endpoints[key] = _EndpointMetrics(self.buckets)
+            metrics.requests += 1
+            if failed:
+                metrics.errors += 1
+            # Requests that got no response, like timeouts, are counted with the status "none"
+            status = "none" if event.status is None else str(event.status)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.bytes_in += event.bytes_in
+            metrics.bytes_out += event.bytes_out
+            metrics.attempts += event.attempts
+            metrics.network_time += event.network_time
+            metrics.decode_time += event.decode_time
+            metrics.hydrate_time += event.hydrate_time
+            metrics.bucket_counts[bisect_left(self.buckets, event.total_time)] += 1
+
+    def after_request(self, event):
+        self._record(event, False)
+
+    def request_failed(self, event):
+        self._record(event, True)
+
+    def reset(self):
+        """ Drops every metric """
+        with self._lock:
+            self._endpoints.clear()
+
+    def snapshot(self):
+        """
+        Returns the metrics of each endpoint
+
+        :return: A dict of (method, path template) to a dict of requests, errors, statuses, bytes_in, bytes_out,
+                attempts, network_time, decode_time, hydrate_time, total_time and the cumulative histogram buckets
+        """
+        with self._lock:
+            return dict((key, metrics.to_dict(self.buckets)) for key, metrics in self._endpoints.items())
+
+    def to_prometheus(self):
+        """ Returns the metrics in the Prometheus text exposition format """
+        prefix = self.prefix
+        snapshot = self.snapshot()
+        lines = []
+
+        def labels(method, template, **extra):
+            pairs = [("method", method), ("path", template)] + sorted(extra.items())
+            return "{%s}" % ",".join('%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                                     for name, value in pairs)
+
+        lines.append("# HELP %s_requests_total Requests sent, by status" % prefix)
+        lines.append("# TYPE %s_requests_total counter" % prefix)
+        for (method, template), metrics in sorted(snapshot.items()):
+            for status, count in sorted(metrics["statuses"].items()):
+                lines.append("%s_requests_total%s %d" % (prefix, labels(method, template, status=status), count))
+
+        counters = (
+            ("request_errors_total", "errors", "Requests that failed"),
+            ("request_attempts_total", "attempts", "Attempts made, retries included"),
+            ("request_bytes_in_total", "bytes_in", "Bytes of the response bodies"),
+            ("request_bytes_out_total", "bytes_out", "Bytes of the request bodies"),
+        )
+        for name, field, help_text in counters:
+            lines.append("# HELP %s_%s %s" % (prefix, name, help_text))
+            lines.append("# TYPE %s_%s counter" % (prefix, name))
+            for (method, template), metrics in sorted(snapshot.items()):
+                lines.append("%s_%s%s %d" % (prefix, name, labels(method, template), metrics[field]))
+
+        lines.append("# HELP %s_request_phase_seconds_total Seconds spent in each phase of the requests" % prefix)
+        lines.append("# TYPE %s_request_phase_seconds_total counter" % prefix)
+        for (method, template), metrics in sorted(snapshot.items()):
+            for phase in ("network", "decode", "hydrate"):
+                lines.append("%s_request_phase_seconds_total%s %r" % (
+                    prefix, labels(method, template, phase=phase), metrics["%s_time" % phase]))
+
+        lines.append("# HELP %s_request_duration_seconds Total time of the requests" % prefix)
+        lines.append("# TYPE %s_request_duration_seconds histogram" % prefix)
+        for (method, template), metrics in sorted(snapshot.items()):
+            for bound, count in metrics["buckets"]:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append("%s_request_duration_seconds_bucket%s %d" % (
+                    prefix, labels(method, template, le=le), count))
+            lines.append("%s_request_duration_seconds_sum%s %r" % (
+                prefix, labels(method, template), metrics["total_time"]))
+            lines.append("%s_request_duration_seconds_count%s %d" % (
+                prefix, labels(method, template), metrics["requests"]))
+        return "\n".join(lines) + "\n"
@@ -36,4 +36,9 @@ LANDING_PAGE_UPDATE_PATH = "/api/REST/2.0/assets/landingPage/{id}"
 LANDING_PAGE_GET_PATH = "/api/REST/2.0/assets/landingPage/{id}"
 LANDING_PAGE_GET_LIST_PATH = "/api/REST/2.0/assets/landingPages"
 
-
+# Bulk API
+BULK_CUSTOM_OBJECT_EXPORT_CREATE_PATH = "/api/bulk/2.0/customObjects/{parent_id}/exports"
+BULK_EXPORT_DELETE_PATH = "/api/bulk/2.0{uri}"
+BULK_SYNC_CREATE_PATH = "/api/bulk/2.0/syncs"
+BULK_SYNC_GET_PATH = "/api/bulk/2.0{uri}"
+BULK_SYNC_DATA_PATH = "/api/bulk/2.0{uri}/data"
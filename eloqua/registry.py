@@ -0,0 +1,263 @@
+import http.cookiejar
+import logging
+import threading
+import time
+
+from .eloqua import EloquaConnection, DEFAULT_POOL_CONNECTIONS
+from .metrics import MetricsCollector
+from .errors import *
+
+logger = logging.getLogger("Eloqua")
+
+# Keep-alive connections of the session shared by every tenant, per Eloqua pod
+DEFAULT_SHARED_POOL_MAXSIZE = 50
+
+# Arguments of EloquaConnection keyed without the tenant, that can not be shared by the connections of the registry
+TENANT_ONLY_ARGUMENTS = ("schema_cache",)
+
+
+class TenantLimiter(object):
+    """
+    Caps the requests of one tenant: at most `max_concurrency` sent at the same time and `rate` per second on average,
+    with bursts of up to `burst` requests. Used as the limiter of an EloquaConnection, it is held while each attempt
+    of a request is sent, retries included, but not while a retry waits.
+
+    Thread safe. Keeps counts of the attempts sent, of the time spent waiting for the caps and of the highest
+    concurrency.
+    """
+
+    def __init__(self, max_concurrency=None, rate=None, burst=None):
+        """
+        :param max_concurrency: (optional) requests sent at the same time. None does not cap them
+        :param rate: (optional) requests per second. None does not cap them
+        :param burst: (optional) requests sent at once after an idle time. Defaults to the rate, at least 1
+        """
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst or max(1.0, rate or 1.0)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self.attempts = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def _take_token(self):
+        """ Waits for a token of the rate cap. Returns True if it had to wait """
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+                self._refilled = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            waited = True
+            time.sleep(delay)
+
+    def acquire(self):
+        """ Waits until a request of the tenant can be sent """
+        started = time.perf_counter()
+        waited = False
+        if self._semaphore is not None:
+            waited = not self._semaphore.acquire(blocking=False)
+            if waited:
+                self._semaphore.acquire()
+        if self.rate:
+            waited = self._take_token() or waited
+        with self._lock:
+            self.attempts += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            if waited:
+                self.waits += 1
+                self.wait_time += time.perf_counter() - started
+
+    def release(self):
+        """ Frees the place of a request that was sent """
+        with self._lock:
+            self.in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def stats(self):
+        """ Returns a dict of attempts, in_flight, peak_in_flight, waits and wait_time """
+        with self._lock:
+            return {
+                "attempts":       self.attempts,
+                "in_flight":      self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "waits":          self.waits,
+                "wait_time":      self.wait_time,
+            }
+
+
+class _Tenant(object):
+    """ Connection of a tenant with its limiter and metrics """
+
+    def __init__(self, connection, limiter, metrics, password):
+        self.connection = connection
+        self.limiter = limiter
+        self.metrics = metrics
+        self.password = password
+
+
+class ConnectionRegistry(object):
+    """
+    Thread safe registry of the EloquaConnection of many tenants (company and user) of one process
+
+    Connections are created on first use and cached. They share one `requests.Session`, so keep-alive connections to
+    the Eloqua pods are reused across tenants, and each tenant gets a TenantLimiter capping its concurrency and rate,
+    so a busy tenant can not starve the others, and a MetricsCollector:
+
+        registry = ConnectionRegistry(max_concurrency=4, rate=10)
+        elq = registry.connection("CompanyA", "api.user", password)
+        elq.get_list(Email)
+        registry.stats()[("CompanyA", "api.user")]["requests"]
+
+    The shared session refuses cookies, so no cookie set by Eloqua for one tenant is sent with the requests of another.
+    Credentials are sent with each request. A ResponseCache given to the registry is shared too, as its entries are
+    keyed on the tenant. Each tenant gets its own schema cache, a schema_cache can only be given to connection(). Set
+    the pool_maxsize at least as high as the sum of the max_concurrency of the tenants expected to be busy at the same
+    time.
+    """
+
+    def __init__(self, max_concurrency=8, rate=None, burst=None, pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_SHARED_POOL_MAXSIZE, session=None, **connection_kwargs):
+        """
+        :param max_concurrency: (optional) default requests a tenant sends at the same time. None does not cap them
+        :param rate: (optional) default requests per second of a tenant. None does not cap them
+        :param burst: (optional) default burst of requests of a tenant. See TenantLimiter
+        :param pool_connections: (optional) Number of per host connection pools of the shared session
+        :param pool_maxsize: (optional) Maximum number of keep-alive connections per host of the shared session
+        :param session: (optional) A `requests.Session` to share instead of creating one. It is not closed by close()
+        :param connection_kwargs: (optional) other arguments of every EloquaConnection, like timeout, retry_policy or
+                response_cache
+        """
+        for name in TENANT_ONLY_ARGUMENTS:
+            if name in connection_kwargs:
+                raise EloquaInvalidUseageException("%s can not be shared by tenants, pass it to connection()" % name)
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.connection_kwargs = connection_kwargs
+        if session is None:
+            session = EloquaConnection.create_session(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            self._owns_session = True
+        else:
+            self._owns_session = False
+        self.session = session
+        self._tenants = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._tenants)
+
+    def __contains__(self, tenant):
+        return tenant in self._tenants
+
+    def connection(self, company, username, password, max_concurrency=None, rate=None, burst=None, **kwargs):
+        """
+        Returns the connection of a tenant, creating it on first use. A new password replaces the connection
+
+        :param company: Company
+        :param username: Username
+        :param password: Password
+        :param max_concurrency: (optional) requests the tenant sends at the same time. Defaults to the registry's
+        :param rate: (optional) requests per second of the tenant. Defaults to the registry's
+        :param burst: (optional) burst of requests of the tenant. Defaults to the registry's
+        :param kwargs: (optional) other arguments of the EloquaConnection, like base_url, used when it is created
+
+        :return: The EloquaConnection of the tenant
+        """
+        key = (company, username)
+        with self._lock:
+            tenant = self._tenants.get(key)
+            if tenant is not None and tenant.password == password:
+                return tenant.connection
+            if tenant is not None:
+                logger.info("Password of %s\\%s changed, replacing its connection" % key)
+                tenant.connection.close()
+            limiter = TenantLimiter(max_concurrency if max_concurrency is not None else self.max_concurrency,
+                                    rate if rate is not None else self.rate,
+                                    burst if burst is not None else self.burst)
+            metrics = MetricsCollector()
+            connection_kwargs = dict(self.connection_kwargs, **kwargs)
+            connection_kwargs["hooks"] = list(connection_kwargs.get("hooks") or []) + [metrics]
+            connection = EloquaConnection(company, username, password, session=self.session, limiter=limiter,
+                                          **connection_kwargs)
+            self._tenants[key] = _Tenant(connection, limiter, metrics, password)
+            return connection
+
+    def get(self, company, username):
+        """ Returns the connection of a tenant, or None if it has none """
+        tenant = self._tenants.get((company, username))
+        return tenant.connection if tenant is not None else None
+
+    def remove(self, company, username):
+        """ Forgets the connection of a tenant """
+        with self._lock:
+            tenant = self._tenants.pop((company, username), None)
+        if tenant is not None:
+            tenant.connection.close()
+
+    def tenants(self):
+        """ Returns the (company, username) of every tenant """
+        return list(self._tenants)
+
+    def stats(self):
+        """
+        Returns the usage of each tenant
+
+        :return: A dict of (company, username) to a dict of attempts, in_flight, peak_in_flight, waits and wait_time
+                (the time spent waiting for the caps) from the limiter, and requests, errors, bytes_in, bytes_out and
+                network_time summed over the endpoints of the metrics of the tenant
+        """
+        with self._lock:
+            tenants = list(self._tenants.items())
+        stats = {}
+        for key, tenant in tenants:
+            tenant_stats = tenant.limiter.stats()
+            totals = dict((name, 0) for name in ("requests", "errors", "bytes_in", "bytes_out", "network_time"))
+            for endpoint in tenant.metrics.snapshot().values():
+                for name in totals:
+                    totals[name] += endpoint[name]
+            tenant_stats.update(totals)
+            stats[key] = tenant_stats
+        return stats
+
+    def metrics(self, company, username):
+        """ Returns the MetricsCollector of a tenant, with its metrics per endpoint. See eloqua.metrics """
+        tenant = self._tenants.get((company, username))
+        if tenant is None:
+            raise EloquaInvalidUseageException("%s\\%s has no connection in the registry" % (company, username))
+        return tenant.metrics
+
+    def close(self):
+        """ Closes every connection and the shared session """
+        with self._lock:
+            tenants = list(self._tenants.values())
+            self._tenants.clear()
+        for tenant in tenants:
+            tenant.connection.close()
+        if self._owns_session:
+            self.session.close()
@@ -0,0 +1,98 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+
+class RetryPolicy(object):
+    """
+    Describes when and how long to wait before a failed Eloqua request is sent again
+
+    Requests are retried when they fail with one of the `statuses` (throttling and transient gateway errors by default)
+    or when the connection fails. Only the `methods` considered idempotent are retried, POST is retried only when
+    `retry_post` is set. The wait doubles after each attempt with random jitter, starting from `backoff_factor` seconds
+    and capped at `max_backoff`. A Retry-After header sent by Eloqua is honored instead. No retry is made once
+    `max_attempts` requests were sent or when waiting would exceed `max_total_time` seconds since the first attempt.
+
+        elq = EloquaConnection(COMPANY, USERNAME, PASSWORD,
+                               retry_policy=RetryPolicy(max_attempts=8, max_total_time=600))
+    """
+
+    def __init__(self, max_attempts=5, backoff_factor=0.5, max_backoff=60, max_total_time=300,
+                 statuses=(429, 502, 503, 504), methods=("GET", "PUT", "DELETE"), retry_post=False):
+        """
+        :param max_attempts: (optional) Most requests sent for one call, the first one included
+        :param backoff_factor: (optional) Seconds to wait before the first retry. Doubles on each retry
+        :param max_backoff: (optional) Longest wait between two attempts
+        :param max_total_time: (optional) Seconds after the first attempt after which no retry is started
+        :param statuses: (optional) HTTP status codes that are retried
+        :param methods: (optional) HTTP methods that are retried
+        :param retry_post: (optional) Also retry POST requests. They may create duplicates if the first one got through
+        """
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_total_time = max_total_time
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.retry_post = retry_post
+
+    def allows(self, http_method, retry_post=None):
+        """
+        Returns True if requests with this method may be retried
+
+        :param http_method: HTTP method of the request
+        :param retry_post: (optional) Overrides the retry_post setting of the policy
+        """
+        http_method = http_method.upper()
+        if http_method == "POST":
+            return self.retry_post if retry_post is None else retry_post
+        return http_method in self.methods
+
+    def retries_status(self, status_code):
+        """ Returns True if a response with this status code is retried """
+        return status_code in self.statuses
+
+    @staticmethod
+    def retry_after(response):
+        """
+        Reads the Retry-After header of a response
+
+        :param response: HTTP Response object
+        :return: Seconds to wait, or None if the header is missing or invalid
+        """
+        if response is None:
+            return None
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def delay(self, attempt, started, response=None):
+        """
+        Returns how long to wait before the next attempt
+
+        :param attempt: Number of attempts made so far
+        :param started: time.time() of the first attempt
+        :param response: (optional) The failed response, to honor its Retry-After header
+
+        :return: Seconds to wait, or None if no more attempts should be made
+        """
+        if attempt >= self.max_attempts:
+            return None
+        wait = self.retry_after(response)
+        if wait is None:
+            backoff = min(self.max_backoff, self.backoff_factor * (2 ** (attempt - 1)))
+            wait = backoff / 2 + random.uniform(0, backoff / 2)
+        if time.time() + wait - started > self.max_total_time:
+            return None
+        return wait
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
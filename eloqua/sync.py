@@ -0,0 +1,246 @@
+import logging
+import os
+import re
+import sqlite3
+import time
+
+from .eloqua import CustomObjectModel, MAX_PAGE_SIZE
+from .codec import response_json
+from .columns import column_types
+from .paths import *
+from .errors import *
+
+logger = logging.getLogger("Eloqua")
+
+# Eloqua search selecting the records updated after a unix timestamp
+DELTA_SEARCH = "updatedAt>'%d'"
+# Eloqua search selecting the records with an id above the last one scanned
+ID_KEYSET_SEARCH = "id>'%d'"
+
+# SQLite column type of each column type of eloqua.columns.column_types()
+SQLITE_TYPES = {
+    "integer": "INTEGER",
+    "number":  "REAL",
+    "date":    "INTEGER",
+    "text":    "TEXT",
+}
+
+SYNC_STATE_TABLE = "eloqua_sync_state"
+
+
+def _quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+
+def _to_integer(value):
+    if value is None or value == "":
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_real(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+CONVERTERS = {
+    "integer": _to_integer,
+    "number":  _to_real,
+    "date":    _to_integer,
+    "text":    lambda value: value,
+}
+
+
+class CustomObjectMirror(object):
+    """
+    Local SQLite copy of the records of a custom object, kept up to date with incremental syncs
+
+    The table has an `id` primary key, the `name`, `createdAt` and `updatedAt` system fields and one column per field of
+    the CustomObjectModel. Number fields are stored as REAL and date fields as INTEGER unix timestamps, from the
+    FIELD_TYPES of the model. Other fields are TEXT.
+
+    The first sync loads every record. Later syncs only fetch the records whose `updatedAt` is after the highest one
+    already stored (the watermark), so they cost as many requests as there are changed records. Records deleted in
+    Eloqua do not show up in a delta, they are dropped by reconcile(), which compares the ids of the whole custom
+    object with the table:
+
+        mirror = CustomObjectMirror(elq, DogOwner, "~/eloqua.sqlite")
+        mirror.sync()                           # full load the first time, changes afterwards
+        mirror.sync(reconcile_every=7 * 86400)  # also drop deleted records once a week
+
+    The state of each table is kept in the eloqua_sync_state table of the same database.
+    """
+
+    def __init__(self, connection, customObjectModel, path, table=None, page_size=MAX_PAGE_SIZE, batch_size=1000):
+        """
+        :param connection: EloquaConnection to use
+        :param customObjectModel: CustomObjectModel subclass of the custom object to mirror
+        :param path: SQLite database file
+        :param table: (optional) Name of the table. Defaults to the class name
+        :param page_size: (optional) records per request, 1000 at most
+        :param batch_size: (optional) records written per transaction
+        """
+        if not issubclass(customObjectModel, CustomObjectModel):
+            raise EloquaInvalidUseageException("customObjectModel must be a subclass of CustomObjectModel")
+        self.connection = connection
+        self.customObjectModel = customObjectModel
+        self.path = os.path.expanduser(path)
+        self.table = table or re.sub(r"\W", "_", customObjectModel.__name__)
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.types = column_types(customObjectModel)
+        self.db = sqlite3.connect(self.path)
+        self._create_tables()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ Closes the database """
+        self.db.close()
+
+    def _create_tables(self):
+        columns = []
+        for name, column_type in self.types.items():
+            if name == "id":
+                columns.append("id INTEGER PRIMARY KEY")
+            else:
+                columns.append("%s %s" % (_quote(name), SQLITE_TYPES[column_type]))
+        with self.db:
+            self.db.execute("CREATE TABLE IF NOT EXISTS %s (%s)" % (_quote(self.table), ", ".join(columns)))
+            self.db.execute("CREATE INDEX IF NOT EXISTS %s ON %s (updatedAt)" % (
+                _quote("%s_updatedAt" % self.table), _quote(self.table)))
+            self.db.execute("CREATE TABLE IF NOT EXISTS %s (table_name TEXT PRIMARY KEY, parent_id TEXT, "
+                            "watermark INTEGER, synced_at REAL, reconciled_at REAL)" % SYNC_STATE_TABLE)
+            # Columns of fields added to the custom object since the table was created
+            existing = set(row[1] for row in self.db.execute("PRAGMA table_info(%s)" % _quote(self.table)))
+            for name, column_type in self.types.items():
+                if name not in existing:
+                    self.db.execute("ALTER TABLE %s ADD COLUMN %s %s" % (
+                        _quote(self.table), _quote(name), SQLITE_TYPES[column_type]))
+
+    def state(self):
+        """
+        Returns a dict with the watermark, synced_at and reconciled_at of the table, all None before the first sync
+        """
+        row = self.db.execute("SELECT watermark, synced_at, reconciled_at FROM %s WHERE table_name = ?" %
+                              SYNC_STATE_TABLE, (self.table,)).fetchone()
+        return dict(zip(("watermark", "synced_at", "reconciled_at"), row or (None, None, None)))
+
+    def _save_state(self, **values):
+        self.db.execute("INSERT OR IGNORE INTO %s (table_name, parent_id) VALUES (?, ?)" % SYNC_STATE_TABLE,
+                        (self.table, str(self.customObjectModel.PARENT_ID)))
+        for key, value in values.items():
+            self.db.execute("UPDATE %s SET %s = ? WHERE table_name = ?" % (SYNC_STATE_TABLE, key), (value, self.table))
+
+    def reset(self):
+        """ Empties the table and forgets the watermark, so the next sync loads every record again """
+        with self.db:
+            self.db.execute("DELETE FROM %s" % _quote(self.table))
+            self.db.execute("DELETE FROM %s WHERE table_name = ?" % SYNC_STATE_TABLE, (self.table,))
+
+    def _row(self, record):
+        return tuple(CONVERTERS[column_type](getattr(record, name, None)) for name, column_type in self.types.items())
+
+    def _upsert(self, rows):
+        statement = "INSERT OR REPLACE INTO %s (%s) VALUES (%s)" % (
+            _quote(self.table), ", ".join(_quote(name) for name in self.types), ", ".join("?" * len(self.types)))
+        with self.db:
+            self.db.executemany(statement, rows)
+
+    def sync(self, full=False, reconcile=False, reconcile_every=None):
+        """
+        Fetches the records updated since the last sync and writes them to the table
+
+        Records are written in transactions of batch_size records. The watermark is only saved once every record was
+        written, so an interrupted sync fetches the same changes again the next time.
+
+        :param full: (optional) fetch every record instead of the changes since the watermark
+        :param reconcile: (optional) also drop the records deleted in Eloqua. See reconcile()
+        :param reconcile_every: (optional) reconcile when the last reconciliation is older than this many seconds
+
+        :return: A dict with the number of records `upserted` and `deleted` and the new `watermark`
+        """
+        state = self.state()
+        watermark = None if full else state["watermark"]
+        params = {"depth": "complete"}
+        if watermark is not None:
+            # A second earlier than the watermark, so records updated in the same second as the last one are not missed
+            params["search"] = DELTA_SEARCH % (watermark - 1)
+
+        started = time.time()
+        upserted = 0
+        rows = []
+        highest = watermark
+        updated_at = list(self.types).index("updatedAt")
+        for record in self.connection.iter_list(self.customObjectModel, params, page_size=self.page_size):
+            row = self._row(record)
+            rows.append(row)
+            if row[updated_at] is not None and (highest is None or row[updated_at] > highest):
+                highest = row[updated_at]
+            if len(rows) >= self.batch_size:
+                self._upsert(rows)
+                upserted += len(rows)
+                rows = []
+        if rows:
+            self._upsert(rows)
+            upserted += len(rows)
+        with self.db:
+            self._save_state(watermark=highest, synced_at=started)
+        logger.debug("Synced %s records of %s into %s" % (upserted, self.customObjectModel.__name__, self.table))
+
+        deleted = 0
+        reconciled_at = state["reconciled_at"]
+        if reconcile or (reconcile_every is not None and
+                         (reconciled_at is None or started - reconciled_at >= reconcile_every)):
+            deleted = self.reconcile()
+        return {"upserted": upserted, "deleted": deleted, "watermark": highest}
+
+    def remote_ids(self):
+        """
+        Returns the set of the ids of every record of the custom object in Eloqua, fetched with minimal depth
+
+        The records are scanned in id order from the last id seen rather than by page number, so records deleted while
+        the scan runs do not shift the later ones onto pages already read, which would leave them out.
+        """
+        path = CUSTOM_OBJECT_DATA_GET_LIST_PATH.format(parent_id=self.customObjectModel.PARENT_ID)
+        count = min(self.page_size, MAX_PAGE_SIZE)
+        ids = set()
+        last_id = 0
+        while True:
+            resp = self.connection.request(path, "GET", {"depth": "minimal", "count": count, "orderBy": "id ASC",
+                                                         "search": ID_KEYSET_SEARCH % last_id})
+            payload = response_json(resp)
+            page_ids = [int(element['id']) for element in payload.get('elements') or []]
+            ids.update(page_ids)
+            if not page_ids or len(page_ids) < (payload.get('pageSize') or count):
+                return ids
+            last_id = max(page_ids)
+
+    def reconcile(self):
+        """
+        Deletes the rows of the records that no longer exist in Eloqua
+
+        :return: Number of rows deleted
+        """
+        started = time.time()
+        remote = self.remote_ids()
+        local = set(row[0] for row in self.db.execute("SELECT id FROM %s" % _quote(self.table)))
+        gone = local - remote
+        with self.db:
+            self.db.executemany("DELETE FROM %s WHERE id = ?" % _quote(self.table),
+                                ((record_id,) for record_id in gone))
+            self._save_state(reconciled_at=started)
+        if gone:
+            logger.debug("Deleted %s records of %s gone from Eloqua" % (len(gone), self.table))
+        return len(gone)
@@ -0,0 +1,99 @@
+import weakref
+
+
+class RecordView(object):
+    """
+    Read only view of one element of a decoded list response, returned by get_list(lazy=True) and
+    get_custom_object_data(lazy=True)
+
+    A view keeps a reference to its element of the payload and copies nothing. Custom object fields are found in
+    `fieldValues` through the ID_FIELD_MAP of the model when they are read, other attributes are read from the element.
+    Views are much cheaper to build than model instances when most records are thrown away after a look at a field or
+    two:
+
+        corgis = [view.to_model() for view in elq.get_list(DogOwner, {"count": 1000}, lazy=True).data
+                  if view.Breed1 == "Corgi"]
+
+    Call to_model() to get an instance that can be changed and written back with update().
+    """
+    __slots__ = ("model", "element", "_field_values")
+
+    def __init__(self, model, element):
+        """
+        :param model: CustomObjectModel subclass or Asset class of the element
+        :param element: One element of the decoded response
+        """
+        self.model = model
+        self.element = element
+        self._field_values = None
+
+    @classmethod
+    def from_list(cls, model, payload):
+        """ Returns a list of views of the elements of a decoded list response """
+        return [cls(model, element) for element in payload.get('elements') or ()]
+
+    def _field_value(self, name):
+        field_ids = _field_ids(self.model)
+        if name not in field_ids:
+            raise KeyError(name)
+        field_id = field_ids[name]
+        if self._field_values is None:
+            # The first field read scans fieldValues, which is cheaper than indexing it for records read once
+            self._field_values = False
+            for field in self.element.get('fieldValues') or ():
+                if field['id'] == field_id:
+                    return field.get('value')
+            return None
+        if self._field_values is False:
+            self._field_values = dict((field['id'], field.get('value'))
+                                      for field in self.element.get('fieldValues') or ())
+        return self._field_values.get(field_id)
+
+    def __getattr__(self, name):
+        # Only called for names that are not set. A slot is not set yet on a view being built by copy or pickle, which
+        # look up special methods like __setstate__ before restoring the slots
+        if name in _INTERNAL_NAMES or (name.startswith("__") and name.endswith("__")):
+            raise AttributeError("%s object has no attribute %s" % (type(self).__name__, name))
+        try:
+            return self._field_value(name)
+        except KeyError:
+            pass
+        element = self.element
+        if name in element:
+            return element[name]
+        default = getattr(self.model, name, _MISSING)
+        if default is _MISSING or callable(default):
+            raise AttributeError("%s view has no attribute %s" % (self.model.__name__, name))
+        # Class attributes of the model, like FIELDS or the None default of a field missing from the element
+        return default
+
+    def get(self, name, default=None):
+        """ Returns an attribute, or default when the record has none """
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def to_model(self):
+        """ Returns an instance of the model built from the element, as get_list() would have returned it """
+        return self.model(self.element)
+
+    def __repr__(self):
+        return "<%s view %s>" % (self.model.__name__, self.element.get('id'))
+
+
+_MISSING = object()
+
+# Slots of RecordView, never looked up in the element or the model
+_INTERNAL_NAMES = frozenset(RecordView.__slots__)
+
+# Field name to field id of each model seen by _field_ids()
+_FIELD_IDS = weakref.WeakKeyDictionary()
+
+
+def _field_ids(model):
+    """ Returns a dict of the field names of a model to their field ids. Empty for Assets """
+    field_ids = _FIELD_IDS.get(model)
+    if field_ids is None:
+        field_ids = dict((field_name, field_id) for field_id, field_name in (getattr(model, "ID_FIELD_MAP", None)
+                                                                            or {}).items())
+        _FIELD_IDS[model] = field_ids
+    return field_ids
@@ -0,0 +1,246 @@
+"""
+Benchmarks of the connector against the local stand-in server in test/server.py
+
+    python -m test.benchmark                     # run and compare with test/benchmark_baseline.json
+    python -m test.benchmark --save-baseline     # run and store the results as the new baseline
+    python -m test.benchmark --output results.json --records 50000 --latency 0.01
+
+Each benchmark reports a throughput in records per second, the best of `--repeat` runs. The results are printed as a
+table and written as JSON to `--output`. A benchmark more than `--tolerance` slower than the baseline is reported as a
+regression, and the exit status is 1 when there is one. A baseline run with other options is not compared with, the
+exit status is 2.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from eloqua.eloqua import EloquaConnection
+from eloqua.codec import dumps, get_json_codec, response_json
+from eloqua.retry import RetryPolicy
+
+from .server import StandInServer, CUSTOM_OBJECT_ID
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+# Options stored with the results, a baseline is only compared with results run with the same ones
+RUN_OPTIONS = ("records", "width", "writes", "latency", "throttle_every", "workers", "repeat")
+
+BENCHMARKS = []
+
+
+def benchmark(function):
+    """ Registers a benchmark. It gets the context and returns the number of records it processed """
+    BENCHMARKS.append(function)
+    return function
+
+
+class Context(object):
+    """ What the benchmarks share: the server, a connection and the models """
+
+    def __init__(self, server, connection, options):
+        self.server = server
+        self.connection = connection
+        self.options = options
+        self.model = server.model()
+        self.compact_model = server.model(compact=True, class_name="CompactStandInRecord")
+        resp = connection.request("/api/REST/2.0/data/customObject/%s/instances" % CUSTOM_OBJECT_ID, "GET",
+                                  {"count": 1000, "page": 1})
+        self.page = response_json(resp)
+        self.created = []
+
+
+@benchmark
+def get_list_paging(context):
+    """ Reads every record one page after the other """
+    return sum(1 for _ in context.connection.iter_list(context.model, prefetch=0))
+
+
+@benchmark
+def get_list_fetch_all(context):
+    """ Reads every record with the pages fetched concurrently """
+    return len(context.connection.get_list(context.model, fetch_all=True, workers=context.options.workers).data)
+
+
+@benchmark
+def from_list_hydration(context):
+    """ Builds model instances from a decoded page """
+    records = 0
+    while records < context.options.records:
+        records += len(context.model.from_list(context.page))
+    return records
+
+
+@benchmark
+def from_list_hydration_compact(context):
+    """ Builds compact model instances from a decoded page """
+    records = 0
+    while records < context.options.records:
+        records += len(context.compact_model.from_list(context.page))
+    return records
+
+
+@benchmark
+def to_create_json_serialization(context):
+    """ Serializes records to request bodies """
+    instances = context.model.from_list(context.page)
+    records = 0
+    while records < context.options.records:
+        for instance in instances:
+            dumps(instance.to_create_json())
+        records += len(instances)
+    return records
+
+
+@benchmark
+def create_many_throughput(context):
+    """ Creates records concurrently """
+    model = context.model
+    instances = []
+    for number in range(context.options.writes):
+        instance = model()
+        for field_name in model.FIELDS:
+            setattr(instance, field_name, "%s %d" % (field_name, number))
+        instances.append(instance)
+    results = context.connection.create_many(instances, workers=context.options.workers)
+    context.created = [result.result for result in results if result.ok]
+    return len(context.created)
+
+
+@benchmark
+def update_many_throughput(context):
+    """ Updates the records created by create_many_throughput concurrently """
+    field_name = context.model.FIELDS[0]
+    for instance in context.created:
+        setattr(instance, field_name, "%s updated %s" % (field_name, time.time()))
+    results = context.connection.update_many(context.created, workers=context.options.workers)
+    return sum(1 for result in results if result.ok)
+
+
+def run(options):
+    """
+    Runs the benchmarks
+
+    :return: A dict of benchmark name to a dict of value and unit
+    """
+    results = {}
+    server = StandInServer(records=options.records, width=options.width, latency=options.latency,
+                           throttle_every=options.throttle_every)
+    # The server answers from its own process, so its work does not slow down the client being measured
+    server.start(process=True)
+    try:
+        retry_policy = RetryPolicy(backoff_factor=0.01, retry_post=True)
+        with EloquaConnection("company", "user", "password", base_url=server.url, retry_policy=retry_policy,
+                              pool_maxsize=max(10, options.workers)) as connection:
+            context = Context(server, connection, options)
+            for function in BENCHMARKS:
+                if options.only and function.__name__ not in options.only:
+                    continue
+                best = 0.0
+                for _ in range(options.repeat):
+                    started = time.perf_counter()
+                    records = function(context)
+                    elapsed = time.perf_counter() - started
+                    best = max(best, records / elapsed if elapsed else 0.0)
+                results[function.__name__] = {"value": round(best, 1), "unit": "records/s"}
+    finally:
+        server.stop()
+    return results
+
+
+def option_differences(options, baseline_options):
+    """ Returns a dict of the run options that differ from the baseline's, to a (value, baseline value) tuple """
+    return dict((key, (options.get(key), baseline_options.get(key))) for key in RUN_OPTIONS
+                if options.get(key) != baseline_options.get(key))
+
+
+def compare(results, options, baseline, tolerance):
+    """
+    Compares results with a baseline report. Throughputs measured with other records, latency, workers etc. can not be
+    compared, so a baseline run with other options is refused
+
+    :param results: dict of benchmark name to result
+    :param options: dict of the run options of the results
+    :param baseline: baseline report with its `results` and `options`
+    :param tolerance: slowdown reported as a regression
+
+    :return: A dict of benchmark name to the ratio of the result to the baseline, and the names of the regressions
+    """
+    differences = option_differences(options, baseline.get("options") or {})
+    if differences:
+        raise ValueError("The baseline was run with other options: %s" % ", ".join(
+            "%s=%s (baseline %s)" % (key, value, baseline_value)
+            for key, (value, baseline_value) in sorted(differences.items())))
+    ratios = {}
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get("results", {}).get(name, {}).get("value")
+        if not expected:
+            continue
+        ratios[name] = result["value"] / expected
+        if ratios[name] < 1 - tolerance:
+            regressions.append(name)
+    return ratios, regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=20000, help="records of the custom object")
+    parser.add_argument("--width", type=int, default=10, help="fields of the custom object")
+    parser.add_argument("--writes", type=int, default=2000, help="records created and updated by the write benchmarks")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the server waits before each answer")
+    parser.add_argument("--throttle-every", type=int, default=0, help="answer every nth request with a 429")
+    parser.add_argument("--workers", type=int, default=8, help="threads of the concurrent benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each benchmark, the best one is kept")
+    parser.add_argument("--only", nargs="*", help="names of the benchmarks to run")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON file of the baseline results")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slowdown reported as a regression")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    results = run(options)
+    report = {
+        "results":  results,
+        "options":  dict((key, getattr(options, key)) for key in RUN_OPTIONS),
+        "python":   platform.python_version(),
+        "platform": platform.platform(),
+        "codec":    get_json_codec().name,
+    }
+
+    ratios, regressions = {}, []
+    refused = False
+    if os.path.exists(options.baseline) and not options.save_baseline:
+        with open(options.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        try:
+            ratios, regressions = compare(results, report["options"], baseline, options.tolerance)
+        except ValueError as e:
+            sys.stderr.write("Not compared with %s. %s\n" % (options.baseline, e))
+            refused = True
+    report["baseline_ratios"] = dict((name, round(ratio, 3)) for name, ratio in ratios.items())
+    report["regressions"] = regressions
+
+    for name, result in results.items():
+        ratio = " %6.2fx baseline" % ratios[name] if name in ratios else ""
+        flag = "  REGRESSION" if name in regressions else ""
+        sys.stderr.write("%-32s %14.1f %s%s%s\n" % (name, result["value"], result["unit"], ratio, flag))
+
+    if options.output:
+        with open(options.output, "w") as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+    if options.save_baseline:
+        with open(options.baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+    if refused:
+        return 2
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
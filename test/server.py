@@ -0,0 +1,452 @@
+"""
+Local stand-in for the Eloqua REST API, used by the offline tests and the benchmarks
+
+It serves the login url, the asset endpoints (emails, landing pages, forms, custom objects), the custom object data
+endpoints and the Bulk API exports of eloqua/paths.py from memory. Latency, the largest page returned, the number of
+fields of the custom object and throttling with 429 responses are configurable:
+
+    with StandInServer(records=10000, width=20, latency=0.005, throttle_every=50) as server:
+        elq = EloquaConnection("company", "user", "password", base_url=server.url)
+        DogOwner = server.model()
+        elq.get_list(DogOwner, fetch_all=True)
+
+Custom object data searches support `Field='value'`, `updatedAt>'timestamp'`, `id>=n`, `id<n` (joined with AND) and
+`id=1 OR id=2`.
+"""
+import json
+import multiprocessing
+import re
+import threading
+import time
+import unittest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from eloqua.eloqua import EloquaConnection, CustomObjectModel, CompactCustomObjectModel
+
+CUSTOM_OBJECT_ID = "1000"
+FIRST_FIELD_ID = 2000
+# Data types given to the fields of the custom object in turn
+FIELD_DATA_TYPES = ("text", "number", "date")
+CREATED_AT = 1500000000
+
+ASSET_TYPES = {
+    "email":        "Email",
+    "landingPage":  "LandingPage",
+    "form":         "Form",
+    "customObject": "CustomObject",
+}
+
+_ASSET_PATH = re.compile(r"^/api/REST/2\.0/assets/(email|landingPage|form|customObject)(?:/(\d+))?$")
+_ASSET_LIST_PATH = re.compile(r"^/api/REST/2\.0/assets/(emails|landingPages|forms|customObjects)$")
+_DATA_PATH = re.compile(r"^/api/REST/2\.0/data/customObject/(\d+)/instance(?:/(\d+))?$")
+_DATA_LIST_PATH = re.compile(r"^/api/REST/2\.0/data/customObject/(\d+)/instances$")
+_BULK_EXPORTS_PATH = re.compile(r"^/api/bulk/2\.0/customObjects/(\d+)/exports$")
+_BULK_EXPORT_PATH = re.compile(r"^/api/bulk/2\.0(/customObjects/\d+/exports/\d+)$")
+_BULK_SYNC_PATH = re.compile(r"^/api/bulk/2\.0(/syncs/\d+)(/data)?$")
+_BULK_STATEMENT = re.compile(r"^\{\{CustomObject\[\d+\]\.(?:Field\[(\d+)\]|(Id|CreatedAt|UpdatedAt))\}\}$")
+_SEARCH_TERM = re.compile(r"^(\w+)\s*(>=|<=|!=|=|>|<)\s*'?(.*?)'?$")
+
+
+class StandInServer(object):
+    """ In memory Eloqua REST API served on a local port """
+
+    def __init__(self, records=0, width=5, latency=0.0, max_page_size=1000, throttle_every=0, retry_after=0,
+                 default_depth=None, host="127.0.0.1", port=0):
+        """
+        :param records: (optional) Number of custom object records to create
+        :param width: (optional) Number of fields of the custom object
+        :param latency: (optional) Seconds each request waits before it is answered
+        :param max_page_size: (optional) Largest page returned by list endpoints
+        :param throttle_every: (optional) Answer every nth request with a 429. 0 never throttles
+        :param retry_after: (optional) Retry-After header of the 429 responses, in seconds
+        :param default_depth: (optional) depth of the list requests that set none. Eloqua's is "minimal", which leaves
+                out fieldValues. None answers them with every field
+        :param host: (optional) Host to listen on
+        :param port: (optional) Port to listen on. 0 picks a free port
+        """
+        self.latency = latency
+        self.max_page_size = max_page_size
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.default_depth = default_depth
+        self.requests = 0
+        self.throttled = 0
+        # TCP connections accepted, to check that clients keep them alive
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.fields = [{
+            "type":        "CustomObjectField",
+            "id":          str(FIRST_FIELD_ID + index),
+            "name":        "Field%d" % (index + 1),
+            "internalName": "Field%d" % (index + 1),
+            "dataType":    FIELD_DATA_TYPES[index % len(FIELD_DATA_TYPES)],
+        } for index in range(width)]
+        self.assets = dict((name, {}) for name in ASSET_TYPES)
+        self.assets["customObject"][CUSTOM_OBJECT_ID] = {
+            "type":   "CustomObject",
+            "id":     CUSTOM_OBJECT_ID,
+            "name":   "StandIn_Custom_Object",
+            "depth":  "complete",
+            "fields": self.fields,
+        }
+        self.data = {CUSTOM_OBJECT_ID: {}}
+        # Bulk API export definitions and syncs by uri
+        self.exports = {}
+        self.syncs = {}
+        self.next_id = 1
+        self.seed(records)
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stand_in = self
+        self._thread = None
+        self._process = None
+
+    @property
+    def url(self):
+        return "http://%s:%d" % self._httpd.server_address[:2]
+
+    @property
+    def login_url(self):
+        return self.url + "/id"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self, process=False):
+        """
+        Serves requests in a background thread
+
+        :param process: (optional) serve from a child process instead, so the server does not share the GIL with the
+                client being measured. Changes the child makes to the records and counters are not seen by this one
+        """
+        if process:
+            self._process = multiprocessing.get_context("fork").Process(target=self._httpd.serve_forever, daemon=True)
+            self._process.start()
+        else:
+            # A short poll interval so stop() returns quickly between tests
+            self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={"poll_interval": 0.05},
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stops serving and closes the port """
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+        else:
+            self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _new_id(self):
+        with self.lock:
+            record_id = str(self.next_id)
+            self.next_id += 1
+            return record_id
+
+    def field_value(self, field, record_number):
+        """ Returns the value a seeded record has in a field """
+        if field["dataType"] == "number":
+            return str(record_number % 100)
+        if field["dataType"] == "date":
+            return str(CREATED_AT + record_number * 60)
+        return "%s value %d" % (field["name"], record_number)
+
+    def seed(self, records):
+        """ Adds records to the custom object """
+        records_of_object = self.data[CUSTOM_OBJECT_ID]
+        for _ in range(records):
+            record_id = self._new_id()
+            number = int(record_id)
+            records_of_object[record_id] = {
+                "type":        "CustomObjectData",
+                "id":          record_id,
+                "name":        "Record %s" % record_id,
+                "createdAt":   str(CREATED_AT),
+                "updatedAt":   str(CREATED_AT + number),
+                "fieldValues": [{"type": "FieldValue", "id": field["id"], "value": self.field_value(field, number)}
+                                for field in self.fields],
+            }
+
+    def model(self, compact=False, class_name="StandInRecord"):
+        """ Returns a CustomObjectModel subclass for the custom object of the server """
+        field_names = [field["name"] for field in self.fields]
+        attributes = {
+            "CDO_NAME":     "StandIn_Custom_Object",
+            "PARENT_ID":    CUSTOM_OBJECT_ID,
+            "FIELDS":       field_names,
+            "ID_FIELD_MAP": dict((field["id"], field["name"]) for field in self.fields),
+            "FIELD_TYPES":  dict((field["name"], field["dataType"]) for field in self.fields),
+            "__module__":   __name__,
+        }
+        if compact:
+            attributes["__slots__"] = CompactCustomObjectModel.slots_for(field_names)
+            attributes["KEEP_RAW_DATA"] = False
+            return type(class_name, (CompactCustomObjectModel,), attributes)
+        for field_name in field_names:
+            attributes[field_name] = None
+        return type(class_name, (CustomObjectModel,), attributes)
+
+    # ------------ Request handling ------------
+
+    def matches(self, record, search):
+        """ Returns True if the record matches an Eloqua search expression """
+        if not search:
+            return True
+        alternatives = re.split(r"\s+OR\s+", search)
+        return any(all(self._term_matches(record, term) for term in re.split(r"\s+AND\s+", part))
+                   for part in alternatives)
+
+    def _term_matches(self, record, term):
+        match = _SEARCH_TERM.match(term.strip())
+        if not match:
+            return True
+        name, operator, value = match.groups()
+        if name in ("id", "createdAt", "updatedAt"):
+            actual = record.get(name)
+        else:
+            field_ids = dict((field["name"], field["id"]) for field in self.fields)
+            values = dict((field["id"], field.get("value")) for field in record.get("fieldValues", ()))
+            actual = values.get(field_ids.get(name))
+        if operator in ("=", "!="):
+            return (str(actual) == value) == (operator == "=")
+        try:
+            actual, value = float(actual), float(value)
+        except (TypeError, ValueError):
+            return False
+        return {">": actual > value, "<": actual < value, ">=": actual >= value, "<=": actual <= value}[operator]
+
+    def page(self, elements, query, depth_fields=None):
+        count = min(int(query.get("count", self.max_page_size)), self.max_page_size)
+        page = int(query.get("page", 1))
+        selected = elements[(page - 1) * count:page * count]
+        if query.get("depth", self.default_depth) == "minimal" and depth_fields:
+            selected = [dict((key, element.get(key)) for key in depth_fields if key in element)
+                        for element in selected]
+        return {"elements": selected, "page": page, "pageSize": count, "total": len(elements)}
+
+    def handle(self, method, path, query, body):
+        """
+        Answers a request
+
+        :return: (status, body, headers)
+        """
+        with self.lock:
+            self.requests += 1
+            throttle = self.throttle_every and self.requests % self.throttle_every == 0
+            if throttle:
+                self.throttled += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if throttle:
+            return 429, {"failures": [{"type": "Throttled"}]}, {"Retry-After": str(self.retry_after)}
+
+        if path == "/id":
+            return 200, {"urls": {"base": self.url}}, None
+
+        match = _DATA_LIST_PATH.match(path)
+        if match and method == "GET":
+            records = self.data.get(match.group(1))
+            if records is None:
+                return 404, None, None
+            search = query.get("search")
+            with self.lock:
+                elements = [record for record in records.values() if self.matches(record, search)]
+            elements.sort(key=lambda record: int(record["id"]))
+            return 200, self.page(elements, query, ("type", "id", "name", "createdAt", "updatedAt")), None
+
+        match = _DATA_PATH.match(path)
+        if match:
+            records = self.data.get(match.group(1))
+            record_id = match.group(2)
+            if records is None:
+                return 404, None, None
+            if method == "POST" and record_id is None:
+                record = dict(body or {})
+                record.update({"type": "CustomObjectData", "id": self._new_id(), "createdAt": str(int(time.time())),
+                               "updatedAt": str(int(time.time()))})
+                record.setdefault("fieldValues", [])
+                with self.lock:
+                    records[record["id"]] = record
+                return 201, record, None
+            with self.lock:
+                record = records.get(record_id)
+                if record is None:
+                    return 404, None, None
+                if method == "GET":
+                    return 200, record, None
+                if method == "PUT":
+                    values = dict((field["id"], field) for field in record["fieldValues"])
+                    for field in (body or {}).get("fieldValues", ()):
+                        values[field["id"]] = dict(field, type="FieldValue")
+                    record["fieldValues"] = list(values.values())
+                    for key in ("name", "description"):
+                        if key in (body or {}):
+                            record[key] = body[key]
+                    record["updatedAt"] = str(int(time.time()))
+                    return 200, record, None
+                if method == "DELETE":
+                    del records[record_id]
+                    return 200, None, None
+
+        match = _ASSET_LIST_PATH.match(path)
+        if match and method == "GET":
+            kind = match.group(1)[:-1]
+            search = query.get("search")
+            elements = sorted(self.assets[kind].values(), key=lambda asset: int(asset["id"]))
+            if search and search.startswith("name="):
+                elements = [asset for asset in elements if asset["name"] == search[len("name="):].strip("'")]
+            return 200, self.page(elements, query, ("type", "id", "name")), None
+
+        match = _ASSET_PATH.match(path)
+        if match:
+            kind, asset_id = match.groups()
+            assets = self.assets[kind]
+            if method == "POST" and asset_id is None:
+                asset = dict(body or {})
+                asset.update({"type": ASSET_TYPES[kind], "id": self._new_id(), "createdAt": str(int(time.time())),
+                              "updatedAt": str(int(time.time()))})
+                if kind == "customObject":
+                    asset["fields"] = [dict(field, id=self._new_id()) for field in asset.get("fields", ())]
+                    self.data[asset["id"]] = {}
+                assets[asset["id"]] = asset
+                return 201, asset, None
+            asset = assets.get(asset_id)
+            if asset is None:
+                return 404, None, None
+            if method == "GET":
+                if query.get("depth") == "minimal":
+                    # Eloqua tells the depth of the asset in the response
+                    asset = dict((key, asset[key]) for key in ("type", "id", "name", "createdAt", "updatedAt")
+                                 if key in asset)
+                    asset["depth"] = "minimal"
+                return 200, asset, None
+            if method == "PUT":
+                asset = dict(body or {}, id=asset_id, type=ASSET_TYPES[kind], updatedAt=str(int(time.time())))
+                assets[asset_id] = asset
+                return 200, asset, None
+            if method == "DELETE":
+                del assets[asset_id]
+                self.data.pop(asset_id, None)
+                return 200, None, None
+
+        return self.handle_bulk(method, path, query, body)
+
+    def handle_bulk(self, method, path, query, body):
+        """ Answers the Bulk API export requests. Syncs succeed at once """
+        match = _BULK_EXPORTS_PATH.match(path)
+        if match and method == "POST":
+            if match.group(1) not in self.data:
+                return 404, None, None
+            uri = "/customObjects/%s/exports/%s" % (match.group(1), self._new_id())
+            self.exports[uri] = dict(body or {}, uri=uri, parent_id=match.group(1))
+            return 201, self.exports[uri], None
+
+        match = _BULK_EXPORT_PATH.match(path)
+        if match and method == "DELETE":
+            if self.exports.pop(match.group(1), None) is None:
+                return 404, None, None
+            return 204, None, None
+
+        if path == "/api/bulk/2.0/syncs" and method == "POST":
+            export_uri = (body or {}).get("syncedInstanceUri")
+            if export_uri not in self.exports:
+                return 400, None, None
+            uri = "/syncs/%s" % self._new_id()
+            self.syncs[uri] = export_uri
+            return 201, {"uri": uri, "syncedInstanceUri": export_uri, "status": "pending"}, None
+
+        match = _BULK_SYNC_PATH.match(path)
+        if match and method == "GET":
+            uri, data = match.groups()
+            export = self.exports.get(self.syncs.get(uri))
+            if export is None:
+                return 404, None, None
+            if not data:
+                return 200, {"uri": uri, "syncedInstanceUri": export["uri"], "status": "success"}, None
+            with self.lock:
+                records = sorted(self.data[export["parent_id"]].values(), key=lambda record: int(record["id"]))
+            offset, limit = int(query.get("offset", 0)), int(query.get("limit", 1000))
+            items = [self._bulk_item(record, export["fields"]) for record in records[offset:offset + limit]]
+            return 200, {"items": items, "totalResults": len(records), "hasMore": offset + limit < len(records),
+                         "offset": offset, "limit": limit}, None
+
+        return 404, None, None
+
+    @staticmethod
+    def _bulk_item(record, fields):
+        values = dict((field["id"], field.get("value")) for field in record.get("fieldValues", ()))
+        meta = {"Id": record["id"], "CreatedAt": record.get("createdAt"), "UpdatedAt": record.get("updatedAt")}
+        item = {}
+        for name, statement in fields.items():
+            match = _BULK_STATEMENT.match(statement)
+            if match:
+                item[name] = values.get(match.group(1)) if match.group(1) else meta[match.group(2)]
+        return item
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Answers are written in small chunks, without Nagle they are not held back waiting for the client ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        stand_in = self.server.stand_in
+        with stand_in.lock:
+            stand_in.connections += 1
+
+    def _handle(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        body = json.loads(raw_body) if raw_body else None
+        query = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+        status, payload, headers = self.server.stand_in.handle(self.command, url.path, query, body)
+        content = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+
+class StandInTestCase(unittest.TestCase):
+    """
+    Test case with a StandInServer started for each test and a connection to it in `self.elq`
+
+    The server answers list requests without a depth like Eloqua does, without fieldValues. Set `server_options` to
+    change the other StandInServer arguments.
+    """
+    server_options = {}
+
+    def setUp(self):
+        self.server = self.start_server()
+        self.elq = self.connect()
+
+    def start_server(self, **options):
+        """ Starts a StandInServer that is stopped after the test """
+        server_options = dict({"records": 10, "default_depth": "minimal"}, **self.server_options)
+        server_options.update(options)
+        server = StandInServer(**server_options)
+        server.start()
+        self.addCleanup(server.stop)
+        return server
+
+    def connect(self, company="company", server=None, **kwargs):
+        """ Returns an EloquaConnection to a server, closed after the test """
+        connection = EloquaConnection(company, "user", "password", base_url=(server or self.server).url, **kwargs)
+        self.addCleanup(connection.close)
+        return connection
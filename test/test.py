@@ -129,6 +129,13 @@ class TestCustomObject(TestCase):
 
         existing_pooch_number = len(existing_pooches)
 
+        # Iterate over every page
+        iterated_pooches = list(self.elq.iter_list(DogOwner, {
+            "search": "DogName1='Poochy Poo'"
+        }, page_size=1))
+
+        self.assertEqual(existing_pooch_number, len(iterated_pooches))
+
         # Delete Records
         self.elq.delete(dog_owner_1)
 
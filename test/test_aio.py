@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+
+from eloqua.aio import AsyncEloquaConnection
+from eloqua.errors import EloquaRequestError
+from eloqua.retry import RetryPolicy
+from .server import StandInTestCase, CUSTOM_OBJECT_ID
+
+
+class TestAsyncConnection(StandInTestCase):
+    server_options = {"records": 25, "max_page_size": 10}
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+
+    def run_with(self, coroutine_function, **kwargs):
+        """ Runs coroutine_function(elq) with an AsyncEloquaConnection to the stand-in """
+        async def run():
+            async with AsyncEloquaConnection("company", "user", "password", base_url=self.server.url,
+                                             **kwargs) as elq:
+                return await coroutine_function(elq)
+        return asyncio.run(run())
+
+    def count_in_flight(self):
+        """ Records the most requests the stand-in answers at the same time in `self.most_in_flight` """
+        handle = self.server.handle
+        lock = threading.Lock()
+        in_flight = [0]
+        self.most_in_flight = 0
+
+        def counting(method, path, query, body):
+            with lock:
+                in_flight[0] += 1
+                self.most_in_flight = max(self.most_in_flight, in_flight[0])
+            try:
+                return handle(method, path, query, body)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        self.server.handle = counting
+
+    def test_get(self):
+        record = self.run_with(lambda elq: elq.get(self.model, "7"))
+        self.assertEqual((record.id, record.Field1), ("7", "Field1 value 7"))
+
+    def test_fetch_all(self):
+        response = self.run_with(lambda elq: elq.get_list(self.model, {"depth": "complete"}, fetch_all=True))
+        self.assertEqual([record.id for record in response.data], [str(number) for number in range(1, 26)])
+        self.assertEqual(response.errors, {})
+
+    def test_iter_list_pages_by_served_page_size(self):
+        async def collect(elq):
+            return [record async for record in elq.iter_list(self.model, page_size=1000)]
+        records = self.run_with(collect)
+        self.assertEqual([record.id for record in records], [str(number) for number in range(1, 26)])
+        self.assertEqual(records[24].Field1, "Field1 value 25")
+
+    def test_create_update_delete(self):
+        async def round_trip(elq):
+            record = self.model()
+            record.Field1 = "created"
+            record = await elq.create(record)
+            record.Field1 = "updated"
+            await elq.update(record)
+            self.assertIsNone(await elq.update(record))
+            updated = await elq.get(self.model, record.id)
+            await elq.delete(record)
+            return record.id, updated.Field1
+        record_id, value = self.run_with(round_trip)
+        self.assertEqual(value, "updated")
+        self.assertNotIn(record_id, self.server.data[CUSTOM_OBJECT_ID])
+
+    def test_max_in_flight(self):
+        self.server.latency = 0.05
+        self.count_in_flight()
+
+        async def get_many(elq):
+            return await asyncio.gather(*[elq.get(self.model, str(number)) for number in range(1, 13)])
+        started = time.time()
+        records = self.run_with(get_many, max_in_flight=4)
+        self.assertEqual(len(records), 12)
+        self.assertEqual(self.most_in_flight, 4)
+        # Three rounds of four, not twelve requests one after the other
+        self.assertLess(time.time() - started, 0.45)
+
+    def test_throttled_requests_are_retried(self):
+        self.server.throttle_every = 2
+        policy = RetryPolicy(max_attempts=3, backoff_factor=0.01)
+        records = self.run_with(lambda elq: asyncio.gather(*[elq.get(self.model, "1") for _ in range(4)]),
+                                retry_policy=policy)
+        self.assertEqual(len(records), 4)
+        self.assertGreater(self.server.throttled, 0)
+
+    def test_errors(self):
+        with self.assertRaises(EloquaRequestError) as raised:
+            self.run_with(lambda elq: elq.get(self.model, "999"))
+        self.assertEqual(raised.exception.error_code, 404)
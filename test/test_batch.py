@@ -0,0 +1,44 @@
+from eloqua.errors import EloquaRequestErrorNotFound
+from .server import StandInTestCase, CUSTOM_OBJECT_ID
+
+
+class TestBatchOperations(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+
+    def new_records(self, count):
+        records = []
+        for number in range(count):
+            record = self.model()
+            record.Field1 = "batch %d" % number
+            records.append(record)
+        return records
+
+    def test_create_many(self):
+        results = self.elq.create_many(self.new_records(12), workers=4)
+        self.assertEqual([result.result.Field1 for result in results], ["batch %d" % number for number in range(12)])
+        self.assertEqual(len(self.server.data[CUSTOM_OBJECT_ID]), 22)
+
+    def test_failure_does_not_stop_the_batch(self):
+        records = [self.elq.get(self.model, record_id) for record_id in ("1", "2", "3")]
+        self.elq.delete(records[1])
+        results = self.elq.delete_many(records, workers=2)
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertIsInstance(results[1].error, EloquaRequestErrorNotFound)
+        self.assertEqual(len(self.server.data[CUSTOM_OBJECT_ID]), 7)
+
+    def test_record_that_can_not_be_encoded(self):
+        records = self.new_records(5)
+        records[2].Field3 = object()
+        results = self.elq.create_many(records, workers=2)
+        self.assertEqual([result.ok for result in results], [True, True, False, True, True])
+        self.assertIsInstance(results[2].error, TypeError)
+        self.assertEqual(results[4].result.Field1, "batch 4")
+        self.assertEqual(len(self.server.data[CUSTOM_OBJECT_ID]), 14)
+
+    def test_unordered_results(self):
+        results = self.elq.create_many(self.new_records(6), workers=3, ordered=False)
+        self.assertEqual(sorted(result.result.Field1 for result in results),
+                         sorted("batch %d" % number for number in range(6)))
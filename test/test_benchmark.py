@@ -0,0 +1,33 @@
+import unittest
+
+from .benchmark import compare, option_differences
+
+OPTIONS = {"records": 20000, "width": 10, "writes": 2000, "latency": 0.0, "throttle_every": 0, "workers": 8,
+           "repeat": 3}
+
+
+class TestCompare(unittest.TestCase):
+
+    def setUp(self):
+        self.baseline = {"options": dict(OPTIONS), "results": {
+            "fast": {"value": 1000.0, "unit": "records/s"},
+            "slow": {"value": 1000.0, "unit": "records/s"},
+        }}
+
+    def test_regressions(self):
+        results = {"fast": {"value": 1100.0}, "slow": {"value": 500.0}, "new": {"value": 1.0}}
+        ratios, regressions = compare(results, OPTIONS, self.baseline, 0.25)
+        self.assertEqual(ratios, {"fast": 1.1, "slow": 0.5})
+        self.assertEqual(regressions, ["slow"])
+
+    def test_other_options_are_refused(self):
+        options = dict(OPTIONS, records=500, latency=0.01)
+        self.assertEqual(option_differences(options, OPTIONS), {"records": (500, 20000), "latency": (0.01, 0.0)})
+        with self.assertRaises(ValueError) as raised:
+            compare({"fast": {"value": 100000.0}}, options, self.baseline, 0.25)
+        self.assertIn("records=500 (baseline 20000)", str(raised.exception))
+
+    def test_baseline_without_options_is_refused(self):
+        del self.baseline["options"]
+        with self.assertRaises(ValueError):
+            compare({"fast": {"value": 1000.0}}, OPTIONS, self.baseline, 0.25)
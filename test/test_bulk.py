@@ -0,0 +1,49 @@
+from eloqua.bulk import CustomObjectExport, export_custom_object_data
+from eloqua.errors import EloquaRequestError
+from eloqua.paths import BULK_SYNC_CREATE_PATH
+from .server import StandInTestCase
+
+
+class TestBulkExport(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+
+    def test_export_records(self):
+        records = list(export_custom_object_data(self.elq, self.model, page_size=4))
+        self.assertEqual([record.id for record in records], [str(number) for number in range(1, 11)])
+        self.assertEqual(records[2].Field1, "Field1 value 3")
+        self.assertEqual(self.server.exports, {})
+
+    def test_definition_is_deleted_when_the_sync_fails(self):
+        handle = self.server.handle
+
+        def fail_sync(method, path, query, body):
+            if path == BULK_SYNC_CREATE_PATH:
+                return 500, None, None
+            return handle(method, path, query, body)
+
+        self.server.handle = fail_sync
+        export = CustomObjectExport(self.elq, self.model)
+        with self.assertRaises(EloquaRequestError):
+            export.start()
+        self.assertIsNone(export.export_uri)
+        self.assertEqual(self.server.exports, {})
+
+    def test_sync_error_is_raised_when_the_cleanup_fails(self):
+        handle = self.server.handle
+
+        def fail_sync_and_delete(method, path, query, body):
+            if path == BULK_SYNC_CREATE_PATH:
+                return 500, None, None
+            if method == "DELETE":
+                return 503, None, None
+            return handle(method, path, query, body)
+
+        self.server.handle = fail_sync_and_delete
+        export = CustomObjectExport(self.connect(retry_policy=None), self.model)
+        with self.assertLogs("Eloqua", "WARNING"):
+            with self.assertRaises(EloquaRequestError) as raised:
+                export.start()
+        self.assertEqual(raised.exception.error_code, 500)
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from eloqua.cache import ResponseCache, TTLCache
+from .server import StandInTestCase
+
+
+class TestResponseCache(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = ResponseCache(max_size=100, ttl=60)
+        self.elq = self.connect(response_cache=self.cache)
+        self.model = self.server.model()
+
+    def test_get_reads_through(self):
+        first = self.elq.get(self.model, "1")
+        requests = self.server.requests
+        second = self.elq.get(self.model, "1")
+        self.assertEqual(self.server.requests, requests)
+        self.assertEqual(second.Field1, first.Field1)
+        self.assertIsNot(second, first)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_params_are_part_of_the_key(self):
+        self.elq.get_list(self.model, {"count": 2})
+        self.elq.get_list(self.model, {"count": 3})
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_update_invalidates(self):
+        record = self.elq.get(self.model, "1")
+        self.elq.get_list(self.model, {"depth": "complete"})
+        record.Field1 = "changed"
+        self.elq.update(record)
+        self.assertEqual(self.elq.get(self.model, "1").Field1, "changed")
+        listed = self.elq.get_list(self.model, {"depth": "complete"}).data
+        self.assertEqual(listed[0].Field1, "changed")
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_create_and_delete_invalidate_the_list(self):
+        total = self.elq.get_list(self.model).total
+        created = self.elq.create(self.model({"fieldValues": [{"id": "2000", "value": "new"}]}))
+        self.assertEqual(self.elq.get_list(self.model).total, total + 1)
+        self.elq.delete(created)
+        self.assertEqual(self.elq.get_list(self.model).total, total)
+
+    def test_shared_cache_keeps_connections_apart(self):
+        other_server = self.start_server(records=1)
+        other_server.data["1000"]["1"]["name"] = "Other record 1"
+        other = self.connect(company="other", server=other_server, response_cache=self.cache)
+        self.assertEqual(self.elq.get(self.model, "1").name, "Record 1")
+        self.assertEqual(other.get(self.model, "1").name, "Other record 1")
+        same_server = self.connect(company="other", response_cache=self.cache)
+        self.assertEqual(same_server.get(self.model, "1").name, "Record 1")
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_sqlite_cache_keeps_connections_apart(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "responses.sqlite")
+        other_server = self.start_server(records=1)
+        other_server.data["1000"]["1"]["name"] = "Other record 1"
+        first = self.connect(response_cache=ResponseCache(path=path))
+        second = self.connect(server=other_server, response_cache=ResponseCache(path=path))
+        self.assertEqual(first.get(self.model, "1").name, "Record 1")
+        self.assertEqual(second.get(self.model, "1").name, "Other record 1")
+        record = second.get(self.model, "1")
+        record.Field1 = "changed"
+        second.update(record)
+        self.assertEqual(first.response_cache.stats()["size"], 1)
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_expiry_and_size(self):
+        cache = TTLCache(ttl=60, max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("d", 4, ttl=-1)
+        self.assertIsNone(cache.get("d"))
@@ -0,0 +1,60 @@
+import json
+
+from requests import Response
+
+from eloqua.codec import JsonCodec, CODECS, set_json_codec, get_json_codec, dumps, loads, response_json
+from .server import StandInTestCase
+
+
+class TestCodec(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(set_json_codec, get_json_codec())
+        self.decoded = 0
+
+        def counting_loads(data):
+            self.decoded += 1
+            return json.loads(data)
+
+        self.counting = JsonCodec("counting", counting_loads, json.dumps)
+
+    def test_set_by_name(self):
+        set_json_codec("json")
+        self.assertIs(get_json_codec(), CODECS["json"])
+        with self.assertRaises(ValueError):
+            set_json_codec("yaml")
+        self.assertIs(get_json_codec(), CODECS["json"])
+
+    def test_round_trip(self):
+        for name in CODECS:
+            set_json_codec(name)
+            data = dumps({"id": "1", "fieldValues": [{"value": "é"}]})
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(loads(data), {"id": "1", "fieldValues": [{"value": "é"}]})
+
+    def test_str_dumps_are_encoded(self):
+        set_json_codec(self.counting)
+        self.assertEqual(dumps({"name": "é"}), json.dumps({"name": "é"}).encode("utf-8"))
+
+    def test_response_is_decoded_once(self):
+        set_json_codec(self.counting)
+        response = Response()
+        response._content = b'{"id": "1"}'
+        self.assertEqual(response_json(response), {"id": "1"})
+        self.assertIs(response_json(response), response_json(response))
+        self.assertEqual(self.decoded, 1)
+
+    def test_empty_body(self):
+        response = Response()
+        response._content = b""
+        self.assertIsNone(response_json(response))
+
+    def test_connection_uses_the_codec(self):
+        set_json_codec(self.counting)
+        model = self.server.model()
+        record = self.elq.get(model, "3")
+        self.assertEqual(record.Field1, "Field1 value 3")
+        self.assertEqual(self.decoded, 1)
+        self.elq.get_list(model, {"depth": "complete"})
+        self.assertEqual(self.decoded, 2)
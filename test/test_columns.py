@@ -0,0 +1,48 @@
+import math
+import unittest
+from array import array
+from unittest import mock
+
+from eloqua import columns
+from .server import StandInTestCase
+
+
+class TestColumns(StandInTestCase):
+
+    def fetch_columns(self):
+        return self.elq.get_list(self.server.model(), {"depth": "complete", "count": 3}, fetch_all=True,
+                                 columnar=True).to_columns()
+
+    def test_get_list_columns(self):
+        data = self.fetch_columns()
+        self.assertEqual(list(data["id"]), list(range(1, 11)))
+        self.assertEqual(data["Field1"][0], "Field1 value 1")
+        self.assertEqual(float(data["Field2"][4]), 5.0)
+
+    def test_get_list_columns_without_numpy(self):
+        with mock.patch.object(columns, "numpy", None):
+            data = self.fetch_columns()
+        self.assertEqual(data["id"], array('q', range(1, 11)))
+        self.assertEqual(data["Field2"][4], 5.0)
+
+
+@mock.patch.object(columns, "numpy", None)
+class TestColumnsWithoutNumpy(unittest.TestCase):
+
+    def test_to_column(self):
+        self.assertEqual(columns.to_column(["1", "2"], "integer"), array('q', [1, 2]))
+        floats = columns.to_column(["1", None], "integer")
+        self.assertEqual(floats.typecode, 'd')
+        self.assertTrue(math.isnan(floats[1]))
+
+    def test_concat_integer_pages_with_missing_values(self):
+        pages = [{"id": columns.to_column(["1", "2"], "integer")}, {"id": columns.to_column(["3", ""], "integer")},
+                 {"id": columns.to_column(["5"], "integer")}]
+        joined = columns.concat_columns(pages)["id"]
+        self.assertEqual(joined.typecode, 'd')
+        self.assertEqual(list(joined[:3]) + list(joined[4:]), [1.0, 2.0, 3.0, 5.0])
+        self.assertTrue(math.isnan(joined[3]))
+
+    def test_concat_same_types(self):
+        pages = [{"id": array('q', [1]), "name": ["a"]}, {"id": array('q', [2]), "name": ["b"]}]
+        self.assertEqual(columns.concat_columns(pages), {"id": array('q', [1, 2]), "name": ["a", "b"]})
@@ -0,0 +1,38 @@
+from unittest import mock
+
+from eloqua.eloqua import EloquaConnection
+from .server import StandInTestCase
+
+
+class TestSession(StandInTestCase):
+
+    def test_connections_are_kept_alive(self):
+        model = self.server.model()
+        for record_id in ("1", "2", "3", "1"):
+            self.elq.get(model, record_id)
+        self.elq.get_list(model)
+        self.assertEqual(self.server.requests, 5)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_close_closes_its_own_session(self):
+        elq = self.connect()
+        with mock.patch.object(elq.session, "close") as close:
+            elq.close()
+        close.assert_called_once_with()
+
+    def test_close_leaves_a_given_session_open(self):
+        session = EloquaConnection.create_session(pool_maxsize=4)
+        self.addCleanup(session.close)
+        with mock.patch.object(session, "close") as close:
+            with self.connect(session=session) as elq:
+                elq.get(self.server.model(), "1")
+            self.assertIs(elq.session, session)
+        close.assert_not_called()
+
+    def test_connections_share_a_session(self):
+        session = EloquaConnection.create_session()
+        self.addCleanup(session.close)
+        model = self.server.model()
+        self.connect(session=session).get(model, "1")
+        self.connect(company="other", session=session).get(model, "2")
+        self.assertEqual(self.server.connections, 1)
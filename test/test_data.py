@@ -58,6 +58,8 @@ class DogOwner(CustomObjectModel):
         "6044": "DogColor1",
         "6045": "DogName1"
     }
+    FIELD_TYPES = {"DogBreed1": "text", "StartOfOwnership1": "date", "AgeAtStartOfOwnership1": "number",
+                   "DogColor1": "text", "DogName1": "text"}
     META_FIELDS = ["type", "id", "createdAt", "createdBy", "depth", "description", "folderId", "name", "updatedAt",
                    "updatedBy"]
     DogBreed1 = None
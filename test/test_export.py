@@ -0,0 +1,73 @@
+import json
+import os
+import shutil
+import tempfile
+
+from eloqua.eloqua import CustomObjectModel
+from eloqua.errors import EloquaInvalidUseageException
+from eloqua.export import PartitionedExport
+from .server import StandInTestCase, CUSTOM_OBJECT_ID
+
+
+class ExportedRecord(CustomObjectModel):
+    """ Model of the stand-in custom object, defined in a module so the worker processes can import it """
+    CDO_NAME = "StandIn_Custom_Object"
+    PARENT_ID = CUSTOM_OBJECT_ID
+    FIELDS = ["Field1", "Field2", "Field3", "Field4", "Field5"]
+    ID_FIELD_MAP = {"2000": "Field1", "2001": "Field2", "2002": "Field3", "2003": "Field4", "2004": "Field5"}
+    FIELD_TYPES = {"Field1": "text", "Field2": "number", "Field3": "date", "Field4": "text", "Field5": "number"}
+    Field1 = None
+    Field2 = None
+    Field3 = None
+    Field4 = None
+    Field5 = None
+
+
+class TestPartitionedExport(StandInTestCase):
+    server_options = {"records": 30, "max_page_size": 4}
+
+    def test_plan(self):
+        export = PartitionedExport(self.elq, ExportedRecord, processes=2, partitions=3)
+        self.assertEqual(export.probe(), {"total": 30, "low": 1, "high": 30})
+        partitions = export.plan()
+        self.assertEqual([(partition.low, partition.high) for partition in partitions],
+                         [(None, 11), (11, 21), (21, None)])
+        self.assertEqual(partitions[1].params(), {"depth": "complete", "search": "id>='11' AND id<'21'"})
+
+    def test_plan_with_bounds(self):
+        export = PartitionedExport(self.elq, ExportedRecord, partitions=2, low=5, high=14, search="Field2='3'")
+        self.assertEqual([(partition.low, partition.high) for partition in export.plan()], [(5, 10), (10, 15)])
+        self.assertEqual(export.plan()[0].params()["search"], "Field2='3' AND id>='5' AND id<'10'")
+
+    def test_updated_at_bounds(self):
+        with self.assertRaises(EloquaInvalidUseageException):
+            PartitionedExport(self.elq, ExportedRecord, field="updatedAt")
+        probe = PartitionedExport(self.elq, ExportedRecord, field="updatedAt", low=0).probe()
+        self.assertEqual(probe["low"], 0)
+        self.assertGreater(probe["high"], 0)
+
+    def test_runtime_models_are_refused(self):
+        with self.assertRaises(EloquaInvalidUseageException):
+            PartitionedExport(self.elq, self.server.model())
+
+    def test_write(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        export = PartitionedExport(self.elq, ExportedRecord, processes=2, partitions=3)
+        written = export.write(directory)
+        self.assertEqual([result["records"] for result in written], [10, 10, 10])
+        rows = []
+        for result in written:
+            self.assertTrue(os.path.exists(result["path"]))
+            with open(result["path"]) as partition_file:
+                rows.extend(json.loads(line) for line in partition_file)
+        self.assertEqual(sorted(int(row["id"]) for row in rows), list(range(1, 31)))
+        self.assertIn("Field1 value 7", [row["Field1"] for row in rows])
+
+    def test_iter_records(self):
+        export = PartitionedExport(self.elq, ExportedRecord, processes=2, partitions=3)
+        records = list(export.iter_records(chunk_size=4))
+        self.assertTrue(all(isinstance(record, ExportedRecord) for record in records))
+        self.assertEqual(sorted(int(record.id) for record in records), list(range(1, 31)))
+        rows = list(export.iter_records(raw=True))
+        self.assertEqual(sorted(row["Field1"] for row in rows)[:2], ["Field1 value 1", "Field1 value 10"])
@@ -0,0 +1,51 @@
+import time
+
+from eloqua.errors import EloquaRequestError
+from .server import StandInTestCase
+
+
+class TestFetchAll(StandInTestCase):
+    server_options = {"records": 45, "max_page_size": 10}
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+
+    def fail_page(self, page, times):
+        handle = self.server.handle
+        failures = [times]
+
+        def failing(method, path, query, body):
+            if query.get("page") == str(page) and failures[0]:
+                failures[0] -= 1
+                return 500, None, None
+            return handle(method, path, query, body)
+
+        self.server.handle = failing
+
+    def test_every_page_in_order(self):
+        response = self.elq.get_list(self.model, {"depth": "complete"}, fetch_all=True, workers=4)
+        self.assertEqual([record.id for record in response.data], [str(number) for number in range(1, 46)])
+        self.assertEqual(response.data[44].Field1, "Field1 value 45")
+        self.assertEqual((response.total, response.page_size, response.errors), (45, 10, {}))
+
+    def test_pages_are_fetched_concurrently(self):
+        self.server.latency = 0.1
+        started = time.time()
+        response = self.elq.get_list(self.model, fetch_all=True, workers=4)
+        self.assertEqual(len(response.data), 45)
+        # The first page, then the four others at once
+        self.assertLess(time.time() - started, 0.45)
+
+    def test_failed_page_is_retried(self):
+        self.fail_page(3, times=1)
+        response = self.elq.get_list(self.model, fetch_all=True, page_retries=1)
+        self.assertEqual(len(response.data), 45)
+        self.assertEqual(response.errors, {})
+
+    def test_missing_pages_are_reported(self):
+        self.fail_page(3, times=10)
+        response = self.elq.get_list(self.model, fetch_all=True, page_retries=1)
+        self.assertEqual(len(response.data), 35)
+        self.assertEqual(list(response.errors), [3])
+        self.assertIsInstance(response.errors[3], EloquaRequestError)
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from eloqua.importer import CustomObjectImport, to_timestamp
+from .server import StandInTestCase, CUSTOM_OBJECT_ID
+
+# 2019-06-27T00:00:00Z
+JUNE_27 = 1561593600
+
+
+class TestToTimestamp(unittest.TestCase):
+
+    def test_dates(self):
+        self.assertEqual(to_timestamp("2019-06-27"), JUNE_27)
+        self.assertEqual(to_timestamp("2019-06-27T02:00:00+02:00"), JUNE_27)
+        self.assertEqual(to_timestamp("2019-06-27T00:00:00Z"), JUNE_27)
+        self.assertEqual(to_timestamp("27/06/2019", "%d/%m/%Y"), JUNE_27)
+
+    def test_timestamps(self):
+        self.assertEqual(to_timestamp(JUNE_27), JUNE_27)
+        self.assertEqual(to_timestamp(str(JUNE_27)), JUNE_27)
+        self.assertEqual(to_timestamp("1561593600.5"), JUNE_27)
+        self.assertIsNone(to_timestamp(""))
+
+    def test_compact_dates(self):
+        self.assertEqual(to_timestamp("20190627"), JUNE_27)
+        self.assertEqual(to_timestamp("27062019", "%d%m%Y"), JUNE_27)
+        with self.assertRaises(ValueError):
+            to_timestamp("20191327")
+
+
+class TestImport(StandInTestCase):
+    server_options = {"records": 0}
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.checkpoint_path = self.path("import.checkpoint")
+        self.reject_path = self.path("import.rejects.csv")
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write_csv(self, rows):
+        path = self.path("import.csv")
+        with io.open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["Field1", "Field2", "Field3", "Unknown"])
+            writer.writerows(rows)
+        return path
+
+    def stored(self):
+        values = {}
+        for record in self.server.data[CUSTOM_OBJECT_ID].values():
+            fields = dict((field["id"], field["value"]) for field in record["fieldValues"])
+            values[fields["2000"]] = (fields.get("2001"), fields.get("2002"))
+        return values
+
+    def rejects(self):
+        with io.open(self.reject_path, newline="") as reject_file:
+            return list(csv.DictReader(reject_file))
+
+    def importer(self, path, **kwargs):
+        return CustomObjectImport(self.elq, self.model, path, checkpoint_path=self.checkpoint_path,
+                                  reject_path=self.reject_path, **kwargs)
+
+    def test_import(self):
+        path = self.write_csv([
+            ["a", "1", "2019-06-27", "x"],
+            ["b", "not a number", "", "x"],
+            ["c", "3", "20190627", "x"],
+            ["d", "", str(JUNE_27), "x"],
+        ])
+        with self.assertLogs("Eloqua", "WARNING"):
+            stats = self.importer(path, chunk_size=3).run()
+        self.assertEqual(stats, {"rows": 4, "imported": 3, "rejected": 1})
+        self.assertEqual(self.stored(), {"a": ("1", JUNE_27), "c": ("3", JUNE_27), "d": (None, JUNE_27)})
+        rejects = self.rejects()
+        self.assertEqual([(reject["Field1"], reject["_line"]) for reject in rejects], [("b", "3")])
+        self.assertIn("Field2", rejects[0]["_error"])
+        self.assertEqual(self.importer(path).run(), stats)
+        self.assertEqual(len(self.stored()), 3)
+
+    def test_chunks_are_sent_concurrently(self):
+        path = self.write_csv([["row %d" % number, str(number), "", ""] for number in range(12)])
+        self.server.latency = 0.05
+        handle = self.server.handle
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def counting(method, path, query, body):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            try:
+                return handle(method, path, query, body)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+        self.server.handle = counting
+        with self.assertLogs("Eloqua", "WARNING"):
+            stats = self.importer(path, chunk_size=2, workers=1, chunks_in_flight=3).run()
+        self.assertEqual(stats["imported"], 12)
+        self.assertEqual(in_flight[1], 3)
+
+    def test_resume_with_a_key_does_not_duplicate(self):
+        path = self.write_csv([
+            ["a", "1", "", ""],
+            ["b", "2", "", ""],
+            ["c", "bad", "", ""],
+            ["d", "4", "", ""],
+        ])
+        with self.assertLogs("Eloqua", "WARNING"):
+            self.importer(path, chunk_size=2, key="Field1").run()
+        # As if the import crashed after the first chunk while the second one was sent
+        with io.open(self.checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        checkpoint.update(rows=2, imported=2, rejected=0, done=False)
+        with io.open(self.checkpoint_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+
+        with self.assertLogs("Eloqua", "WARNING"):
+            stats = self.importer(path, chunk_size=2, key="Field1").run()
+        self.assertEqual(stats, {"rows": 4, "imported": 3, "rejected": 1})
+        self.assertEqual(sorted(self.stored()), ["a", "b", "d"])
+        self.assertEqual([reject["_line"] for reject in self.rejects()], ["4"])
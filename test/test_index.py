@@ -0,0 +1,62 @@
+import datetime
+import unittest
+
+from eloqua.errors import EloquaInvalidUseageException
+from eloqua.index import IndexedCollection
+from .server import StandInTestCase, CREATED_AT
+
+
+class Record(object):
+    def __init__(self, id, when):
+        self.id = id
+        self.when = when
+
+
+class TestIndexedCollection(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.collection = IndexedCollection(self.elq.get_list(self.server.model(), {"depth": "complete"}),
+                                            hash_indexes=["Field1"], sorted_indexes=["updatedAt", "Field3"])
+
+    def ids(self, records):
+        return [record.id for record in records]
+
+    def test_lookup(self):
+        self.assertEqual(self.collection.first("Field1", "Field1 value 4").id, "4")
+        self.assertEqual(self.collection.lookup("Field1", "missing"), [])
+
+    def test_range_with_numbers_and_dates(self):
+        self.assertEqual(self.ids(self.collection.range("updatedAt", CREATED_AT + 3, CREATED_AT + 5)), ["3", "4", "5"])
+        eighth = datetime.datetime.fromtimestamp(CREATED_AT + 8 * 60, datetime.timezone.utc)
+        self.assertEqual(self.ids(self.collection.range("Field3", low=eighth)), ["8", "9", "10"])
+        self.assertEqual(self.ids(self.collection.range("Field3", high=eighth.date())), [])
+        self.assertEqual(self.ids(self.collection.range("Field3", high=eighth.isoformat())),
+                         ["1", "2", "3", "4", "5", "6", "7", "8"])
+        naive = eighth.replace(tzinfo=None).isoformat()
+        self.assertEqual(self.ids(self.collection.range("Field3", low=naive)), ["8", "9", "10"])
+
+    def test_range_with_invalid_bound(self):
+        with self.assertRaises(EloquaInvalidUseageException):
+            self.collection.range("updatedAt", low="yesterday")
+
+    def test_update_and_remove(self):
+        record = self.collection.get("2")
+        record.updatedAt = str(CREATED_AT + 100)
+        self.collection.update(record)
+        self.collection.remove(self.collection.get("3"))
+        self.assertEqual(self.ids(self.collection.range("updatedAt", low=CREATED_AT + 2)),
+                         ["4", "5", "6", "7", "8", "9", "10", "2"])
+
+
+class TestSortedIndex(unittest.TestCase):
+
+    def test_equal_keys_keep_their_order(self):
+        records = [Record(str(number), number % 3) for number in range(30)]
+        collection = IndexedCollection(records, sorted_indexes=["when"])
+        self.assertEqual([record.id for record in collection.range("when", 1, 1)],
+                         [str(number) for number in range(1, 30, 3)])
+        collection.add(Record("new", 1))
+        collection.remove(records[1])
+        self.assertEqual([record.id for record in collection.range("when", 1, 1)],
+                         [str(number) for number in range(4, 30, 3)] + ["new"])
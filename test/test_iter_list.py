@@ -0,0 +1,50 @@
+from .server import StandInTestCase
+
+
+class TestIterList(StandInTestCase):
+    server_options = {"records": 25, "max_page_size": 10}
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+        self.counts = []
+        handle = self.server.handle
+
+        def record_count(method, path, query, body):
+            self.counts.append(query.get("count"))
+            return handle(method, path, query, body)
+
+        self.server.handle = record_count
+
+    def test_every_record_with_smaller_server_pages(self):
+        records = list(self.elq.iter_list(self.model, page_size=20))
+        self.assertEqual([record.id for record in records], [str(number) for number in range(1, 26)])
+        self.assertEqual(records[24].Field1, "Field1 value 25")
+
+    def test_without_prefetch(self):
+        records = list(self.elq.iter_list(self.model, page_size=10, prefetch=0))
+        self.assertEqual(len(records), 25)
+        self.assertEqual(len(self.counts), 3)
+
+    def test_page_size_is_clamped(self):
+        self.assertEqual(len(list(self.elq.iter_list(self.model, page_size=5000))), 25)
+        self.assertEqual(set(self.counts), {"1000"})
+
+    def test_first_page_and_search(self):
+        records = list(self.elq.iter_list(self.model, {"page": 2, "search": "id>='3'"}, page_size=10))
+        self.assertEqual([record.id for record in records], [str(number) for number in range(13, 26)])
+
+    def test_depth_given_or_projected(self):
+        minimal = list(self.elq.iter_list(self.model, {"depth": "minimal"}))
+        self.assertIsNone(minimal[0].Field1)
+        projected = list(self.elq.iter_list(self.model, fields=["id", "Field2"]))
+        self.assertEqual(projected[0].Field2, "1")
+        self.assertIsNone(projected[0].Field1)
+
+    def test_empty(self):
+        self.assertEqual(list(self.elq.iter_list(self.model, {"search": "id>'100'"})), [])
+
+    def test_stops_early(self):
+        records = self.elq.iter_list(self.model, page_size=10)
+        self.assertEqual(next(records).id, "1")
+        records.close()
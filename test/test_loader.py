@@ -0,0 +1,86 @@
+import threading
+
+from eloqua.errors import EloquaInvalidUseageException, EloquaRequestErrorNotFound
+from eloqua.loader import BatchLoader
+from .server import StandInTestCase, _DATA_LIST_PATH
+
+
+class TestBatchLoader(StandInTestCase):
+    server_options = {"records": 30}
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+        self.elq = self.connect(retry_policy=None)
+        self.loader = BatchLoader(self.elq, window=0.05)
+        self.addCleanup(self.loader.close)
+        self.requests = []
+        handle = self.server.handle
+
+        def recording(method, path, query, body):
+            self.requests.append((path, query))
+            return handle(method, path, query, body)
+
+        self.server.handle = recording
+
+    def list_requests(self):
+        return [query for path, query in self.requests if _DATA_LIST_PATH.match(path)]
+
+    def test_one_request_per_batch(self):
+        records = self.loader.get_many(self.model, ["3", "12", 7])
+        self.assertEqual([(record.id, record.Field1) for record in records],
+                         [("3", "Field1 value 3"), ("12", "Field1 value 12"), ("7", "Field1 value 7")])
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.list_requests()[0]["search"], "id='3' OR id='12' OR id='7'")
+
+    def test_calls_from_threads_are_coalesced(self):
+        results = {}
+
+        def get(number):
+            results[number] = self.loader.get(self.model, str(number % 5 + 1))
+
+        threads = [threading.Thread(target=get, args=(number,)) for number in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.loader.coalesced, 15)
+        self.assertIs(results[0], results[5])
+        self.assertEqual(results[3].id, "4")
+
+    def test_full_batches_are_sent_at_once(self):
+        loader = BatchLoader(self.elq, window=10, max_batch=10)
+        self.addCleanup(loader.close)
+        records = loader.get_many(self.model, range(1, 21), timeout=5)
+        self.assertEqual([record.id for record in records], [str(number) for number in range(1, 21)])
+        self.assertEqual(loader.batches, 2)
+
+    def test_missing_ids_are_fetched_one_by_one(self):
+        futures = [self.loader.load(self.model, data_id) for data_id in ("2", "999")]
+        self.assertEqual(futures[0].result().id, "2")
+        with self.assertRaises(EloquaRequestErrorNotFound):
+            futures[1].result()
+        self.assertEqual(len(self.requests), 2)
+
+    def test_failed_batch_falls_back_to_get(self):
+        handle = self.server.handle
+
+        def failing_list(method, path, query, body):
+            if _DATA_LIST_PATH.match(path):
+                self.requests.append((path, query))
+                return 500, None, None
+            return handle(method, path, query, body)
+
+        self.server.handle = failing_list
+        with self.assertLogs("Eloqua", "WARNING"):
+            records = self.loader.get_many(self.model, ["4", "5"])
+        self.assertEqual([record.Field1 for record in records], ["Field1 value 4", "Field1 value 5"])
+        self.assertEqual(len(self.requests), 3)
+
+    def test_closed_loader(self):
+        self.loader.close()
+        with self.assertRaises(EloquaInvalidUseageException):
+            self.loader.get(self.model, "1")
+        with self.assertRaises(EloquaInvalidUseageException):
+            BatchLoader(self.elq).load(dict, "1")
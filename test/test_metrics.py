@@ -0,0 +1,104 @@
+from eloqua.codec import set_json_codec, get_json_codec, JsonCodec
+from eloqua.errors import EloquaRequestError
+from eloqua.metrics import MetricsCollector, RequestHook, path_template
+from eloqua.paths import CUSTOM_OBJECT_DATA_GET_PATH, CUSTOM_OBJECT_DATA_GET_LIST_PATH
+from .server import StandInTestCase
+
+
+class RecordingHook(RequestHook):
+
+    def __init__(self):
+        self.calls = []
+
+    def before_request(self, event):
+        self.calls.append(("before", event.template))
+
+    def after_request(self, event):
+        self.calls.append(("after", event.template))
+
+    def request_failed(self, event):
+        self.calls.append(("failed", type(event.error).__name__))
+
+
+class TestMetrics(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+        self.metrics = MetricsCollector()
+        self.hook = RecordingHook()
+        self.elq = self.connect(hooks=[self.metrics, self.hook], retry_policy=None)
+
+    def test_path_template(self):
+        self.assertEqual(path_template("/api/REST/2.0/data/customObject/12/instance/345"),
+                         "/api/REST/2.0/data/customObject/{id}/instance/{id}")
+
+    def test_requests_are_grouped_by_template(self):
+        for record_id in ("1", "2", "3"):
+            self.elq.get(self.model, record_id)
+        self.elq.get_list(self.model, {"depth": "complete"})
+        snapshot = self.metrics.snapshot()
+        single = snapshot[("GET", CUSTOM_OBJECT_DATA_GET_PATH)]
+        self.assertEqual((single["requests"], single["errors"], single["statuses"]), (3, 0, {"200": 3}))
+        self.assertGreater(single["bytes_in"], 0)
+        self.assertGreater(single["decode_time"], 0)
+        self.assertGreater(single["hydrate_time"], 0)
+        self.assertEqual(single["buckets"][-1], (float("inf"), 3))
+        self.assertEqual(snapshot[("GET", CUSTOM_OBJECT_DATA_GET_LIST_PATH)]["requests"], 1)
+        self.assertEqual(self.hook.calls[:2], [("before", CUSTOM_OBJECT_DATA_GET_PATH),
+                                               ("after", CUSTOM_OBJECT_DATA_GET_PATH)])
+
+    def test_failed_request(self):
+        with self.assertRaises(EloquaRequestError):
+            self.elq.get(self.model, "999")
+        metrics = self.metrics.snapshot()[("GET", CUSTOM_OBJECT_DATA_GET_PATH)]
+        self.assertEqual((metrics["requests"], metrics["errors"], metrics["statuses"]), (1, 1, {"404": 1}))
+        self.assertEqual(self.hook.calls[-1], ("failed", "EloquaRequestErrorNotFound"))
+
+    def test_failed_decoding_is_reported(self):
+        self.addCleanup(set_json_codec, get_json_codec())
+
+        def broken_loads(data):
+            raise ValueError("Not JSON")
+
+        set_json_codec(JsonCodec("broken", broken_loads, get_json_codec().dumps))
+        for call in (lambda: self.elq.get(self.model, "1"), lambda: self.elq.get_list(self.model)):
+            with self.assertRaises(ValueError):
+                call()
+        self.assertEqual([call for call in self.hook.calls if call[0] != "before"],
+                         [("failed", "ValueError"), ("failed", "ValueError")])
+        self.assertEqual(self.metrics.snapshot()[("GET", CUSTOM_OBJECT_DATA_GET_PATH)]["errors"], 1)
+
+    def test_failed_hydration_is_reported(self):
+        handle = self.server.handle
+
+        def not_a_record(method, path, query, body):
+            status, payload, headers = handle(method, path, query, body)
+            return status, {"elements": "not a list"} if method == "GET" else payload, headers
+
+        self.server.handle = not_a_record
+        with self.assertRaises(Exception):
+            self.elq.get_list(self.model, {"depth": "complete"})
+        self.assertEqual(len(self.hook.calls), 2)
+        self.assertEqual(self.hook.calls[1][0], "failed")
+
+    def test_failed_create_is_reported(self):
+        handle = self.server.handle
+
+        def broken_create(method, path, query, body):
+            status, payload, headers = handle(method, path, query, body)
+            return status, ["not", "a", "record"] if method == "POST" else payload, headers
+
+        self.server.handle = broken_create
+        with self.assertRaises(Exception):
+            self.elq.create(self.model())
+        self.assertEqual(len(self.hook.calls), 2)
+        self.assertEqual(self.hook.calls[1][0], "failed")
+
+    def test_prometheus(self):
+        self.elq.get(self.model, "1")
+        text = self.metrics.to_prometheus()
+        self.assertIn('eloqua_requests_total{method="GET",path="%s",status="200"} 1' % CUSTOM_OBJECT_DATA_GET_PATH,
+                      text)
+        self.assertIn('eloqua_request_duration_seconds_count{method="GET",path="%s"} 1' % CUSTOM_OBJECT_DATA_GET_PATH,
+                      text)
@@ -0,0 +1,70 @@
+from .server import StandInTestCase
+
+
+class TestChangeTracking(StandInTestCase):
+    compact = False
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model(compact=self.compact)
+
+    def test_fields_are_read(self):
+        record = self.elq.get(self.model, "3")
+        self.assertEqual(record.id, "3")
+        self.assertEqual(record.Field1, "Field1 value 3")
+        self.assertEqual(record.Field2, "3")
+        self.assertFalse(record.has_changes())
+
+    def test_update_sends_changed_fields_only(self):
+        record = self.elq.get(self.model, "3")
+        record.Field2 = "42"
+        self.assertEqual(record.changed_fields(), {"Field2": "42"})
+        self.assertEqual(record.to_update_json()["fieldValues"], [{"id": "2001", "value": "42"}])
+        self.elq.update(record)
+        self.assertFalse(record.has_changes())
+        self.assertEqual(self.elq.get(self.model, "3").Field2, "42")
+
+    def test_update_without_changes_sends_nothing(self):
+        record = self.elq.get(self.model, "3")
+        requests = self.server.requests
+        self.assertIsNone(self.elq.update(record))
+        self.assertEqual(self.server.requests, requests)
+
+    def test_cleared_field_is_sent_empty(self):
+        record = self.elq.get(self.model, "3")
+        record.Field1 = None
+        self.assertEqual(record.to_update_json()["fieldValues"], [{"id": "2000", "value": ""}])
+
+    def test_new_record_sends_set_fields(self):
+        record = self.model()
+        record.Field1 = "new"
+        self.assertEqual(record.to_create_json()["fieldValues"], [{"id": "2000", "value": "new"}])
+        created = self.elq.create(record)
+        self.assertEqual(created.Field1, "new")
+        self.assertIsNone(created.Field2)
+
+
+class TestCompactChangeTracking(TestChangeTracking):
+    compact = True
+
+    def test_slots(self):
+        record = self.elq.get(self.model, "3")
+        self.assertFalse(hasattr(record, "__dict__"))
+        self.assertIsNone(record.RAW_DATA)
+        with self.assertRaises(AttributeError):
+            record.NotAField = 1
+
+
+class TestOneFieldCompactModel(StandInTestCase):
+    server_options = {"width": 1}
+
+    def test_one_field(self):
+        model = self.server.model(compact=True)
+        record = self.elq.get(model, "2")
+        self.assertEqual(record.Field1, "Field1 value 2")
+        record.Field1 = "changed"
+        self.assertEqual(record.to_update_json()["fieldValues"], [{"id": "2000", "value": "changed"}])
+        self.elq.update(record)
+        new_record = model()
+        new_record.Field1 = "new"
+        self.assertEqual(self.elq.create(new_record).Field1, "new")
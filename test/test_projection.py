@@ -0,0 +1,58 @@
+from eloqua.eloqua import Email
+from eloqua.errors import EloquaInvalidUseageException
+from .server import StandInTestCase, CUSTOM_OBJECT_ID
+
+
+class TestProjection(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+        self.server.assets["email"]["500"] = {"type": "Email", "id": "500", "name": "Welcome",
+                                              "htmlContent": {"html": "<p>Hello</p>"}}
+        self.depths = []
+        handle = self.server.handle
+
+        def recording(method, path, query, body):
+            self.depths.append(query.get("depth"))
+            return handle(method, path, query, body)
+
+        self.server.handle = recording
+
+    def test_record_fields(self):
+        record = self.elq.get(self.model, "3", fields=["Field1"])
+        self.assertEqual(self.depths, ["complete"])
+        self.assertEqual((record.Field1, record.Field2), ("Field1 value 3", None))
+        record.Field1 = "changed"
+        self.elq.update(record)
+        values = dict((field["id"], field["value"]) for field in self.server.data[CUSTOM_OBJECT_ID]["3"]["fieldValues"])
+        self.assertEqual((values["2000"], values["2001"]), ("changed", "3"))
+
+    def test_system_fields_are_listed_at_minimal_depth(self):
+        records = self.elq.get_list(self.model, fields=["id", "updatedAt"]).data
+        self.assertEqual(self.depths, ["minimal"])
+        self.assertEqual([record.id for record in records], [str(number) for number in range(1, 11)])
+        with self.assertRaises(EloquaInvalidUseageException):
+            self.elq.get_list(self.model, fields=["NotAField"])
+
+    def test_projected_asset_can_not_be_updated(self):
+        email = self.elq.get(Email, "500", fields=["name"])
+        self.assertEqual((self.depths, email.depth), (["minimal"], "minimal"))
+        email.name = "Renamed"
+        with self.assertRaises(EloquaInvalidUseageException):
+            self.elq.update(email)
+        self.assertEqual(self.server.assets["email"]["500"]["htmlContent"], {"html": "<p>Hello</p>"})
+
+    def test_listed_asset_can_not_be_updated(self):
+        email = self.elq.get_list(Email).data[0]
+        self.assertEqual(email.depth, "minimal")
+        email.name = "Renamed"
+        with self.assertRaises(EloquaInvalidUseageException):
+            self.elq.update(email)
+
+    def test_complete_asset_is_updated(self):
+        email = self.elq.get(Email, "500", params={"depth": "complete"})
+        email.name = "Renamed"
+        self.elq.update(email)
+        stored = self.server.assets["email"]["500"]
+        self.assertEqual((stored["name"], stored["htmlContent"]), ("Renamed", {"html": "<p>Hello</p>"}))
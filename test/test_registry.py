@@ -0,0 +1,86 @@
+import threading
+import time
+import unittest
+
+from eloqua.cache import ResponseCache, TTLCache
+from eloqua.errors import EloquaInvalidUseageException
+from eloqua.registry import ConnectionRegistry, TenantLimiter
+from .server import StandInTestCase
+
+
+class TestConnectionRegistry(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.registry = ConnectionRegistry(max_concurrency=2)
+        self.addCleanup(self.registry.close)
+        self.model = self.server.model()
+
+    def test_connections_are_cached_per_tenant(self):
+        first = self.registry.connection("CompanyA", "user", "password", base_url=self.server.url)
+        self.assertIs(self.registry.connection("CompanyA", "user", "password"), first)
+        second = self.registry.connection("CompanyB", "user", "password", base_url=self.server.url)
+        self.assertIsNot(second, first)
+        self.assertIs(second.session, first.session)
+        self.assertIsNot(second.limiter, first.limiter)
+        self.assertEqual(sorted(self.registry.tenants()), [("CompanyA", "user"), ("CompanyB", "user")])
+
+    def test_new_password_replaces_the_connection(self):
+        first = self.registry.connection("CompanyA", "user", "password", base_url=self.server.url)
+        second = self.registry.connection("CompanyA", "user", "changed", base_url=self.server.url)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.password, "changed")
+
+    def test_stats_per_tenant(self):
+        elq = self.registry.connection("CompanyA", "user", "password", base_url=self.server.url)
+        self.registry.connection("CompanyB", "user", "password", base_url=self.server.url)
+        elq.get(self.model, "1")
+        elq.get(self.model, "2")
+        stats = self.registry.stats()
+        self.assertEqual(stats[("CompanyA", "user")]["requests"], 2)
+        self.assertEqual(stats[("CompanyA", "user")]["attempts"], 2)
+        self.assertEqual(stats[("CompanyB", "user")]["requests"], 0)
+
+    def test_concurrency_is_capped(self):
+        self.server.latency = 0.05
+        elq = self.registry.connection("CompanyA", "user", "password", base_url=self.server.url)
+        threads = [threading.Thread(target=elq.get, args=(self.model, "1")) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.registry.stats()[("CompanyA", "user")]["peak_in_flight"], 2)
+
+    def test_shared_response_cache_keeps_tenants_apart(self):
+        cache = ResponseCache()
+        registry = ConnectionRegistry(response_cache=cache)
+        self.addCleanup(registry.close)
+        other_server = self.start_server()
+        other_server.data["1000"]["1"]["name"] = "Other record 1"
+        tenant_a = registry.connection("CompanyA", "user", "password", base_url=self.server.url)
+        tenant_b = registry.connection("CompanyB", "user", "password", base_url=other_server.url)
+        self.assertEqual(tenant_a.get(self.model, "1").name, "Record 1")
+        self.assertEqual(tenant_b.get(self.model, "1").name, "Other record 1")
+        self.assertEqual(tenant_a.get(self.model, "1").name, "Record 1")
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_schema_caches_are_not_shared(self):
+        with self.assertRaises(EloquaInvalidUseageException):
+            ConnectionRegistry(schema_cache=TTLCache())
+        tenant_a = self.registry.connection("CompanyA", "user", "password", base_url=self.server.url)
+        tenant_b = self.registry.connection("CompanyB", "user", "password", base_url=self.server.url,
+                                            schema_cache=TTLCache())
+        self.assertIsNot(tenant_a.schema_cache, tenant_b.schema_cache)
+
+
+class TestTenantLimiter(unittest.TestCase):
+
+    def test_rate(self):
+        limiter = TenantLimiter(rate=20, burst=1)
+        started = time.monotonic()
+        for _ in range(5):
+            with limiter:
+                pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.19)
+        self.assertEqual(limiter.stats()["attempts"], 5)
+        self.assertEqual(limiter.stats()["in_flight"], 0)
@@ -0,0 +1,75 @@
+import time
+import unittest
+
+from eloqua.paths import CUSTOM_OBJECT_DATA_GET_PATH
+from eloqua.errors import EloquaRequestError
+from eloqua.retry import RetryPolicy
+from .server import StandInTestCase, CUSTOM_OBJECT_ID
+
+FAST_RETRIES = RetryPolicy(max_attempts=3, backoff_factor=0.01)
+
+
+class TestRetry(StandInTestCase):
+    server_options = {"throttle_every": 2}
+
+    def record_path(self, record_id="1"):
+        return CUSTOM_OBJECT_DATA_GET_PATH.format(parent_id=CUSTOM_OBJECT_ID, id=record_id)
+
+    def test_throttled_get_is_retried(self):
+        elq = self.connect(retry_policy=FAST_RETRIES)
+        self.assertEqual(elq.request(self.record_path(), "GET").attempts, 1)
+        response = elq.request(self.record_path(), "GET")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.attempts, 2)
+        self.assertEqual(self.server.throttled, 1)
+
+    def test_retries_stop_after_max_attempts(self):
+        self.server.throttle_every = 1
+        elq = self.connect(retry_policy=FAST_RETRIES)
+        with self.assertRaises(EloquaRequestError) as raised:
+            elq.request(self.record_path(), "GET")
+        self.assertEqual(raised.exception.error_code, 429)
+        self.assertEqual(raised.exception.attempts, 3)
+
+    def test_post_is_not_retried(self):
+        self.server.throttle_every = 1
+        elq = self.connect(retry_policy=FAST_RETRIES)
+        with self.assertRaises(EloquaRequestError) as raised:
+            elq.create(self.server.model()({"fieldValues": []}))
+        self.assertEqual(raised.exception.attempts, 1)
+
+    def test_retry_after_is_honored(self):
+        self.server.retry_after = 1
+        elq = self.connect(retry_policy=FAST_RETRIES)
+        elq.request(self.record_path(), "GET")
+        started = time.time()
+        elq.request(self.record_path(), "GET")
+        self.assertGreaterEqual(time.time() - started, 1)
+
+    def test_no_retry_policy(self):
+        elq = self.connect(retry_policy=None)
+        elq.request(self.record_path(), "GET")
+        with self.assertRaises(EloquaRequestError):
+            elq.request(self.record_path(), "GET")
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_delay_grows_and_stops(self):
+        policy = RetryPolicy(max_attempts=4, backoff_factor=1, max_backoff=3)
+        started = time.time()
+        self.assertTrue(0.5 <= policy.delay(1, started) <= 1)
+        self.assertTrue(1 <= policy.delay(2, started) <= 2)
+        self.assertTrue(1.5 <= policy.delay(3, started) <= 3)
+        self.assertIsNone(policy.delay(4, started))
+
+    def test_max_total_time(self):
+        policy = RetryPolicy(backoff_factor=10, max_total_time=1)
+        self.assertIsNone(policy.delay(1, time.time()))
+
+    def test_allows(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.allows("get"))
+        self.assertFalse(policy.allows("POST"))
+        self.assertTrue(policy.allows("POST", retry_post=True))
+        self.assertTrue(RetryPolicy(retry_post=True).allows("post"))
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+
+from eloqua.sync import CustomObjectMirror
+from .server import StandInTestCase, CUSTOM_OBJECT_ID, CREATED_AT
+
+
+class TestMirror(StandInTestCase):
+    server_options = {"records": 25, "max_page_size": 10}
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.mirror = CustomObjectMirror(self.elq, self.model, os.path.join(directory, "mirror.sqlite"))
+        self.addCleanup(self.mirror.close)
+
+    def ids(self):
+        return [row[0] for row in self.mirror.db.execute("SELECT id FROM StandInRecord ORDER BY id")]
+
+    def test_full_load(self):
+        result = self.mirror.sync()
+        self.assertEqual(result, {"upserted": 25, "deleted": 0, "watermark": CREATED_AT + 25})
+        self.assertEqual(self.ids(), list(range(1, 26)))
+        row = self.mirror.db.execute("SELECT Field1, Field2, Field3 FROM StandInRecord WHERE id = 3").fetchone()
+        self.assertEqual(row, ("Field1 value 3", 3.0, CREATED_AT + 180))
+
+    def test_delta_fetches_changed_records(self):
+        self.mirror.sync()
+        record = self.elq.get(self.model, "4")
+        record.Field1 = "changed"
+        self.elq.update(record)
+        result = self.mirror.sync()
+        self.assertLess(result["upserted"], 25)
+        self.assertEqual(self.mirror.db.execute("SELECT Field1 FROM StandInRecord WHERE id = 4").fetchone(),
+                         ("changed",))
+
+    def test_reconcile_drops_deleted_records(self):
+        self.mirror.sync()
+        for record_id in ("3", "17"):
+            del self.server.data[CUSTOM_OBJECT_ID][record_id]
+        self.assertEqual(self.mirror.reconcile(), 2)
+        self.assertEqual(self.ids(), [number for number in range(1, 26) if number not in (3, 17)])
+        self.assertIsNotNone(self.mirror.state()["reconciled_at"])
+
+    def test_records_deleted_during_the_scan(self):
+        self.mirror.sync()
+        handle = self.server.handle
+        scanned = []
+
+        def delete_after_first_page(method, path, query, body):
+            answer = handle(method, path, query, body)
+            scanned.append(query)
+            if len(scanned) == 1:
+                # Records of the page just read are deleted in Eloqua before the next page is asked for
+                for record_id in ("1", "2", "3"):
+                    del self.server.data[CUSTOM_OBJECT_ID][record_id]
+            return answer
+
+        self.server.handle = delete_after_first_page
+        self.mirror.reconcile()
+        self.assertEqual(self.ids(), list(range(1, 26)))
+        self.server.handle = handle
+        self.assertEqual(self.mirror.reconcile(), 3)
+        self.assertEqual(self.ids(), list(range(4, 26)))
@@ -0,0 +1,72 @@
+from eloqua.errors import EloquaInvalidUseageException
+from .server import StandInTestCase, CUSTOM_OBJECT_ID
+
+
+class TestUpsert(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.model = self.server.model()
+
+    def record(self, key, value):
+        record = self.model()
+        record.Field1 = key
+        record.Field2 = value
+        return record
+
+    def stored(self):
+        return self.server.data[CUSTOM_OBJECT_ID]
+
+    def test_upsert_without_preload_searches_the_key(self):
+        updated = self.elq.upsert(self.record("Field1 value 4", "77"), key="Field1", preload=False)
+        self.assertEqual(updated.id, "4")
+        self.assertEqual(len(self.stored()), 10)
+        created = self.elq.upsert(self.record("unknown", "1"), key="Field1", preload=False)
+        self.assertEqual(len(self.stored()), 11)
+        self.assertEqual(self.elq.key_index(self.model, "Field1", preload=False).get("unknown"), created.id)
+
+    def test_upsert_with_preload(self):
+        index = self.elq.key_index(self.model, "Field1")
+        self.assertTrue(index.complete)
+        self.assertEqual(len(index), 10)
+        self.assertEqual(index.get("Field1 value 7"), "7")
+        requests = self.server.requests
+        updated = self.elq.upsert(self.record("Field1 value 7", "77"), key="Field1")
+        self.assertEqual(updated.id, "7")
+        self.assertEqual(self.server.requests, requests + 1)
+        self.assertEqual(len(self.stored()), 10)
+        self.elq.upsert(self.record("unknown", "1"), key="Field1")
+        self.assertEqual(len(self.stored()), 11)
+
+    def test_key_locks_are_bounded(self):
+        index = self.elq.key_index(self.model, "Field1", preload=False)
+        locks = set(id(index.lock("key %d" % number)) for number in range(10000))
+        self.assertLessEqual(len(locks), 64)
+        self.assertIs(index.lock("key 1"), index.lock("key 1"))
+
+    def test_upsert_many_does_not_create_duplicates(self):
+        records = [self.record("key %d" % (number % 5), str(number)) for number in range(20)]
+        for preload in (False, True):
+            results = self.elq.upsert_many(records, key="Field1", workers=8, preload=preload)
+            self.assertTrue(all(result.ok for result in results))
+            self.assertEqual(len(self.stored()), 15)
+
+    def test_keys_are_compared_as_strings(self):
+        record = self.record("Field1 value 4", "0")
+        record.Field2 = 4
+        self.assertEqual(self.elq.upsert(record, key="Field2").id, "4")
+        index = self.elq.key_index(self.model, "Field2")
+        self.assertIn(4, index)
+        self.assertIs(index.lock(4), index.lock("4"))
+        index.discard(4)
+        self.assertNotIn("4", index)
+        self.assertEqual(len(self.stored()), 10)
+
+    def test_key_with_a_quote(self):
+        record = self.record("O'Brien", "1")
+        with self.assertRaises(EloquaInvalidUseageException):
+            self.elq.upsert(record, key="Field1", preload=False)
+        self.assertEqual(len(self.stored()), 10)
+        created = self.elq.upsert(record, key="Field1")
+        self.assertEqual(self.elq.upsert(self.record("O'Brien", "2"), key="Field1").id, created.id)
+        self.assertEqual(len(self.stored()), 11)
@@ -0,0 +1,60 @@
+import copy
+import pickle
+
+from eloqua.eloqua import CustomObjectModel
+from eloqua.views import RecordView
+from .server import StandInTestCase, CUSTOM_OBJECT_ID
+
+
+class ViewedRecord(CustomObjectModel):
+    """ Model of the stand-in custom object, defined in a module so views of it can be pickled """
+    PARENT_ID = CUSTOM_OBJECT_ID
+    FIELDS = ["Field1", "Field2", "Field3", "Field4", "Field5"]
+    ID_FIELD_MAP = {"2000": "Field1", "2001": "Field2", "2002": "Field3", "2003": "Field4", "2004": "Field5"}
+    FIELD_TYPES = {"Field1": "text", "Field2": "number", "Field3": "date", "Field4": "text", "Field5": "number"}
+    Field1 = None
+    Field2 = None
+    Field3 = None
+    Field4 = None
+    Field5 = None
+
+
+class TestRecordView(StandInTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.views = self.elq.get_list(ViewedRecord, {"depth": "complete"}, lazy=True).data
+
+    def test_fields(self):
+        view = self.views[2]
+        self.assertIsInstance(view, RecordView)
+        self.assertEqual((view.id, view.name), ("3", "Record 3"))
+        self.assertEqual((view.Field1, view.Field2, view.Field1), ("Field1 value 3", "3", "Field1 value 3"))
+        self.assertEqual(view.FIELDS, ViewedRecord.FIELDS)
+        self.assertEqual(view.get("description", "none"), "none")
+        with self.assertRaises(AttributeError):
+            view.not_a_field
+
+    def test_minimal_depth(self):
+        view = self.elq.get_list(ViewedRecord, lazy=True).data[0]
+        self.assertIsNone(view.Field1)
+        self.assertEqual(view.id, "1")
+
+    def test_to_model(self):
+        record = self.views[4].to_model()
+        self.assertIsInstance(record, ViewedRecord)
+        self.assertEqual(record.Field1, "Field1 value 5")
+        self.assertFalse(record.has_changes())
+
+    def test_copy_and_pickle(self):
+        view = self.views[1]
+        view.Field2
+        for other in (copy.copy(view), copy.deepcopy(view), pickle.loads(pickle.dumps(view))):
+            self.assertIs(other.model, ViewedRecord)
+            self.assertEqual((other.id, other.Field1, other.Field2), ("2", "Field1 value 2", "2"))
+
+    def test_unset_slots(self):
+        view = RecordView.__new__(RecordView)
+        for name in ("model", "element", "_field_values", "__setstate__"):
+            with self.assertRaises(AttributeError):
+                getattr(view, name)